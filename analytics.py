@@ -0,0 +1,286 @@
+import io
+import datetime
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+import schema
+import table_cache
+
+_lock = threading.RLock()
+
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return None if pd.isna(value) else value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(schema.to_text(value)[:10])
+    except ValueError:
+        return None
+
+
+def _week(day):
+    # Weeks are labelled by their Monday
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+
+def _month(day):
+    return day.strftime('%Y-%m')
+
+
+def _months_between(start, end):
+    # 'YYYY-MM' strings -> whole months from start to end
+    return (int(end[:4]) - int(start[:4])) * 12 + int(end[5:7]) - int(start[5:7])
+
+
+class Rollup(table_cache.DerivedView):
+    # Sums over one table maintained row by row: every row adds amounts to
+    # (series, bucket) cells, so a changed row is subtracted and added back
+
+    def __init__(self, key, columns, cells_of):
+        super().__init__()
+        self.key = key
+        self.columns = columns
+        self.cells_of = cells_of
+        self.version = 0  # bumped on every change, for caching what is drawn from it
+        self.rows = {}
+        self.series = {}
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.series = {}
+        columns = [c for c in self.columns if c in frame.columns]
+        keys = frame[self.key].astype(str)
+        for key, values in zip(keys, zip(*(frame[c].tolist() for c in columns))):
+            self._add(key, dict(zip(columns, values)))
+        self.version += 1
+
+    def _add(self, key, row):
+        row = {c: row.get(c) for c in self.columns}
+        self.rows[key] = row
+        for (series, bucket), amount in self.cells_of(row):
+            counts = self.series.get(series)
+            if counts is None:
+                counts = self.series[series] = Counter()
+            counts[bucket] += amount
+
+    def _remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return None
+        for (series, bucket), amount in self.cells_of(row):
+            counts = self.series[series]
+            counts[bucket] -= amount
+            if not counts[bucket]:
+                del counts[bucket]
+        return row
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._add(key, op['row'])
+            elif op['op'] == 'update':
+                old = self._remove(key)
+                if old is not None:
+                    self._add(key, {**old, **{c: v for c, v in op['changes'].items() if c in self.columns}})
+            elif op['op'] == 'delete':
+                self._remove(key)
+        self.version += 1
+
+    def get(self, series):
+        return self.series.get(series, Counter())
+
+
+def _task_cells(row):
+    created = _day(row.get('created_date'))
+    if created:
+        yield ('created_day', created.isoformat()), 1
+        yield ('created_week', _week(created)), 1
+    completed = _day(row.get('completed_date'))
+    if schema.to_text(row.get('status')).lower() != 'completed' or completed is None:
+        return
+    yield ('completed_day', completed.isoformat()), 1
+    yield ('completed_week', _week(completed)), 1
+    if created:
+        group = (schema.to_text(row.get('domain')).lower(), schema.to_text(row.get('priority')).lower())
+        yield ('latency_days', group), (completed - created).days
+        yield ('latency_count', group), 1
+    assignee = schema.to_text(row.get('assigned_to')).strip()
+    if assignee:
+        # A volunteer counts as active in a month if they completed a task in it
+        yield ('activity', (assignee, _month(completed))), 1
+
+
+def _attendance_cells(row):
+    event_id = schema.to_text(row.get('event_id'))
+    status = schema.to_text(row.get('status')).lower()
+    yield ('registered', event_id), 1
+    if status == 'attended':
+        yield ('attended', event_id), 1
+    elif status == 'no-show':
+        yield ('no_show', event_id), 1
+
+
+def _user_cells(row):
+    joined = _day(row.get('join_date'))
+    if schema.to_text(row.get('role')).lower() == 'volunteer' and joined is not None:
+        yield ('joined', _month(joined)), 1
+
+
+_rollups = {name: table_cache.derive(name, rollup, _lock) for name, rollup in {
+    'tasks': Rollup('task_id', ['created_date', 'completed_date', 'status', 'domain', 'priority', 'assigned_to'],
+                    _task_cells),
+    'attendance': Rollup('record_id', ['event_id', 'status'], _attendance_cells),
+    'users': Rollup('user_id', ['role', 'join_date'], _user_cells),
+}.items()}
+
+
+_charts = {}  # chart name -> (rollup versions, PNG bytes)
+
+
+class Analytics:
+    # Read-side views over the rollups; nothing here scans the tables
+
+    def __init__(self, users, tasks, attendance):
+        self.users = users
+        self.tasks = tasks
+        self.attendance = attendance
+
+    def throughput(self, period='week', last=None):
+        """Tasks created and completed per 'day' or 'week', oldest first (optionally the last n)."""
+        created = self.tasks.get(f'created_{period}')
+        completed = self.tasks.get(f'completed_{period}')
+        index = sorted(set(created) | set(completed))
+        if last:
+            index = index[-last:]
+        return pd.DataFrame({
+            period: index,
+            'created': [created.get(i, 0) for i in index],
+            'completed': [completed.get(i, 0) for i in index],
+        })
+
+    def completion_latency(self):
+        """Completed tasks and mean days from creation to completion per domain and priority."""
+        days = self.tasks.get('latency_days')
+        counts = self.tasks.get('latency_count')
+        groups = sorted(counts)
+        return pd.DataFrame({
+            'domain': [g[0] for g in groups],
+            'priority': [g[1] for g in groups],
+            'completed': [counts[g] for g in groups],
+            'mean_days': [round(days.get(g, 0) / counts[g], 1) for g in groups],
+        })
+
+    def attendance_rates(self, titles=None):
+        """Registrations, attended and no-shows per event with the attended share."""
+        registered = self.attendance.get('registered')
+        attended = self.attendance.get('attended')
+        no_show = self.attendance.get('no_show')
+        events = sorted(registered)
+        frame = pd.DataFrame({
+            'event_id': events,
+            'registered': [registered[e] for e in events],
+            'attended': [attended.get(e, 0) for e in events],
+            'no_show': [no_show.get(e, 0) for e in events],
+        })
+        frame['rate'] = (frame['attended'] / frame['registered'].where(frame['registered'] > 0)).fillna(0).round(3)
+        if titles is not None:
+            frame.insert(1, 'title', frame['event_id'].map(titles))
+        return frame.sort_values('registered', ascending=False, ignore_index=True)
+
+    def retention(self, max_months=12):
+        """Share of each join-month cohort of volunteers active (completed a task) n months after joining."""
+        joined = self.users.get('joined')
+        active = {}
+        for (user_id, month), count in self.tasks.get('activity').items():
+            row = self.users.rows.get(user_id)
+            # The cohorts count volunteers only, so admins' activity is left out too
+            if not count or row is None or schema.to_text(row.get('role')).lower() != 'volunteer':
+                continue
+            start = _day(row.get('join_date'))
+            if start is None:
+                continue
+            offset = _months_between(_month(start), month)
+            if 0 <= offset <= max_months:
+                active.setdefault((_month(start), offset), set()).add(user_id)
+        cohorts = sorted(joined)
+        table = pd.DataFrame(np.nan, index=pd.Index(cohorts, name='cohort'), columns=range(max_months + 1))
+        for (cohort, offset), members in active.items():
+            table.at[cohort, offset] = len(members) / joined[cohort]
+        table.insert(0, 'volunteers', [joined[c] for c in cohorts])
+        return table
+
+    def chart(self, name, **options):
+        """PNG of one of the charts below, redrawn only when its rollups have changed."""
+        versions = (self.users.version, self.tasks.version, self.attendance.version, tuple(sorted(options.items())))
+        with _lock:
+            cached = _charts.get(name)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+        # Figure rather than pyplot: pyplot keeps global state and is not thread-safe
+        figure = Figure(figsize=(8, 3.5), tight_layout=True)
+        CHARTS[name](self, figure.add_subplot(), **options)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', dpi=100)
+        with _lock:
+            _charts[name] = (versions, buffer.getvalue())
+        return buffer.getvalue()
+
+
+def _draw_throughput(analytics, ax, period='week', last=26):
+    frame = analytics.throughput(period, last)
+    x = np.arange(len(frame))
+    ax.bar(x - 0.2, frame['created'], width=0.4, label='Created')
+    ax.bar(x + 0.2, frame['completed'], width=0.4, label='Completed')
+    step = max(1, len(frame) // 8)
+    ax.set_xticks(x[::step], frame[period][::step], rotation=30, ha='right', fontsize=8)
+    ax.set_ylabel('Tasks')
+    ax.legend()
+
+
+def _draw_latency(analytics, ax):
+    frame = analytics.completion_latency()
+    if frame.empty:
+        return
+    pivot = frame.pivot(index='domain', columns='priority', values='mean_days')
+    pivot.plot.barh(ax=ax)
+    ax.set_xlabel('Mean days to complete')
+    ax.set_ylabel('')
+
+
+def _draw_attendance(analytics, ax, top=15):
+    frame = analytics.attendance_rates().head(top).iloc[::-1]
+    ax.barh(frame['event_id'], frame['registered'], label='Registered', color='lightgray')
+    ax.barh(frame['event_id'], frame['attended'], label='Attended')
+    ax.set_xlabel('Participants')
+    ax.tick_params(axis='y', labelsize=8)
+    ax.legend()
+
+
+def _draw_retention(analytics, ax, last=12):
+    table = analytics.retention().drop(columns='volunteers').tail(last)
+    image = ax.imshow(table.to_numpy(dtype=float), aspect='auto', cmap='Blues', vmin=0, vmax=1)
+    ax.set_yticks(range(len(table)), table.index, fontsize=8)
+    ax.set_xlabel('Months since joining')
+    ax.figure.colorbar(image, ax=ax, label='Active share')
+
+
+CHARTS = {
+    'throughput': _draw_throughput,
+    'latency': _draw_latency,
+    'attendance': _draw_attendance,
+    'retention': _draw_retention,
+}
+
+
+def analytics(users, tasks, attendance):
+    with _lock:
+        return Analytics(_rollups['users'].sync(users), _rollups['tasks'].sync(tasks),
+                         _rollups['attendance'].sync(attendance))
@@ -0,0 +1,241 @@
+import hmac
+import time
+import secrets
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+# scrypt cost: 128 * N * R bytes (16 MiB) and roughly 50 ms of CPU per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+# Imports hash at a token cost (2 KiB, about 0.1 ms) so a roster lands in seconds; each
+# password is rehashed at the full cost on that user's first login
+BULK_SCRYPT_N = 2 ** 4
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Hashing runs on a small pool so a burst of logins is bounded in CPU and memory
+# and cannot tie up every script thread; callers beyond the queue limit are turned away
+HASH_WORKERS = 4
+MAX_QUEUED_HASHES = 32
+# Imports hash on their own threads, fewer than the login pool's, which stand aside
+# while any login is hashing
+BULK_HASH_WORKERS = HASH_WORKERS - 1
+BULK_HASH_BATCH = 250  # passwords per task, about 25 ms of hashing
+
+# Failed attempts allowed before throttling, and seconds to earn one attempt back
+USER_ATTEMPTS = 5
+USER_REFILL_SECONDS = 60
+IP_ATTEMPTS = 20
+IP_REFILL_SECONDS = 15
+MAX_BUCKETS = 100_000
+
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='auth-hash')
+_slots = threading.BoundedSemaphore(HASH_WORKERS + MAX_QUEUED_HASHES)
+_bulk_pool = ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS, thread_name_prefix='auth-bulk-hash')
+_logins = threading.Condition()
+_logins_hashing = 0  # _run calls in flight; bulk hashing waits for this to reach 0
+_lock = threading.Lock()
+_credentials = None
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts; retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+def _scrypt(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=HASH_BYTES)
+
+
+def _hash(password, salt=None, n=SCRYPT_N):
+    salt = salt if salt is not None else secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, n)
+    return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def _is_legacy(stored):
+    # Unsalted SHA-256 hex digests written before scrypt was introduced
+    return len(stored) == 64 and not stored.startswith('scrypt$')
+
+
+def _verify(password, stored):
+    # Returns (matches, needs rehash); comparisons are constant-time
+    stored = str(stored)
+    if _is_legacy(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored.lower()), True
+    try:
+        scheme, n, r, p, salt, digest = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        salt, digest = bytes.fromhex(salt), bytes.fromhex(digest)
+    except ValueError:
+        return False, False
+    if scheme != 'scrypt':
+        return False, False
+    matches = hmac.compare_digest(_scrypt(password, salt, n, r, p), digest)
+    return matches, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def _run(fn, *args):
+    global _logins_hashing
+    if not _slots.acquire(timeout=5):
+        raise LoginThrottled(retry_after=5)
+    with _logins:
+        _logins_hashing += 1
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        with _logins:
+            _logins_hashing -= 1
+            _logins.notify_all()
+        _slots.release()
+
+
+def _bulk_hash(passwords):
+    with _logins:
+        _logins.wait_for(lambda: _logins_hashing == 0)
+    return [_hash(password, n=BULK_SCRYPT_N) for password in passwords]
+
+
+def hash_password(password, salt=None):
+    """Salted scrypt hash of password, as stored in the users table.
+
+    salt (SALT_BYTES bytes) defaults to a random one; pass it only where the output
+    has to be reproducible, such as synthetic data.
+    """
+    return _run(_hash, password, salt)
+
+
+def hash_passwords(passwords, progress=None):
+    """Hash passwords for an import behind any logins; calls progress(n) as they finish.
+
+    Uses the cheap BULK_SCRYPT_N on BULK_HASH_WORKERS threads; authenticate
+    rehashes each at the full cost on the user's first login.
+    """
+    passwords = [str(p) for p in passwords]
+    batches = [passwords[i:i + BULK_HASH_BATCH] for i in range(0, len(passwords), BULK_HASH_BATCH)]
+    hashes = []
+    for digests in _bulk_pool.map(_bulk_hash, batches):
+        hashes.extend(digests)
+        if progress is not None:
+            progress(len(hashes))
+    return hashes
+
+
+# A hash of a random password, so unknown usernames cost the same as wrong passwords
+_DUMMY_HASH = _hash(secrets.token_hex(16))
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_seconds):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.refill_seconds)
+        self.updated = now
+
+    def retry_after(self, now):
+        # Seconds until one token is available (0 if there is one now)
+        self._refill(now)
+        return 0 if self.tokens >= 1 else int((1 - self.tokens) * self.refill_seconds) + 1
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens = max(0.0, self.tokens - 1)
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Throttle:
+    # Token buckets keyed by (kind, value); a missing bucket counts as full
+
+    def __init__(self):
+        self.limits = {'user': (USER_ATTEMPTS, USER_REFILL_SECONDS), 'ip': (IP_ATTEMPTS, IP_REFILL_SECONDS)}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(*self.limits[key[0]])
+        return bucket
+
+    def retry_after(self, keys):
+        now = time.monotonic()
+        with self.lock:
+            return max((self.buckets[k].retry_after(now) for k in keys if k in self.buckets), default=0)
+
+    def fail(self, keys):
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                self._bucket(key).take(now)
+            if len(self.buckets) > MAX_BUCKETS:
+                # Buckets that have refilled carry no state
+                self.buckets = {k: b for k, b in self.buckets.items() if not b.full(now)}
+
+    def reset(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+
+throttle = Throttle()
+
+
+class Credentials:
+    # username -> row position in a (possibly projected) users frame
+
+    def __init__(self, users):
+        self.users = users
+        self.by_username = dict(zip(users['username'].astype(str), range(len(users))))
+
+    def row(self, username):
+        pos = self.by_username.get(username)
+        return None if pos is None else self.users.iloc[pos]
+
+
+def _credentials_for(users):
+    global _credentials
+    with _lock:
+        if _credentials is None or _credentials.users is not users:
+            _credentials = Credentials(users)
+        return _credentials
+
+
+def authenticate(users, username, password, client_ip=None):
+    """Check a login against users (needs user_id, username, password, role).
+
+    Returns the user's row, or None for a wrong username or password. Raises
+    LoginThrottled while the username or client IP has run out of failed attempts.
+    Legacy SHA-256 hashes, and scrypt hashes at another cost (such as an import's
+    BULK_SCRYPT_N), are replaced with a full-cost hash on a successful login.
+    """
+    keys = [('user', username)] + ([('ip', client_ip)] if client_ip else [])
+    retry_after = throttle.retry_after(keys)
+    if retry_after:
+        raise LoginThrottled(retry_after)
+
+    user = _credentials_for(users).row(username)
+    matches, needs_rehash = _run(_verify, password, _DUMMY_HASH if user is None else user['password'])
+    if user is None or not matches:
+        throttle.fail(keys)
+        return None
+
+    throttle.reset(('user', username))
+    if needs_rehash:
+        try:
+            storage.update('users', user['user_id'], {'password': hash_password(password)})
+        except LoginThrottled:
+            pass  # the hash pool is full; the login stands and a later one rehashes
+    return user
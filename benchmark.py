@@ -0,0 +1,232 @@
+"""Time the NGO_Manager data paths outside Streamlit on synthetic data.
+
+    python benchmark.py --users 50000 --output results.json
+    python benchmark.py --users 50000 --compare results.json
+    python benchmark.py --users 50000 --format arrow
+
+Results are written as JSON (median/min seconds per case) so runs can be
+compared; --compare prints the ratio against an earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import statistics
+
+import numpy as np
+import pandas as pd
+
+import storage
+import formats
+import table_cache
+import indexes
+import matching
+import schema
+import synthetic_data
+
+PAGE_SIZE = 20  # same as main.PAGE_SIZE
+
+CASES = {}
+
+
+def case(name, repeat=5):
+    def register(fn):
+        CASES[name] = (fn, repeat)
+        return fn
+    return register
+
+
+def _tables():
+    # Tables the synthetic data directory has (it has no notifications, for one)
+    return [name for name in storage.TABLES if storage.table_exists(name)]
+
+
+def _fresh_indexes():
+    # Drop every per-version structure so the next call rebuilds it
+    indexes._user_index = None
+    indexes._relations.clear()
+    indexes._date_indexes.clear()
+    matching._matrix = None
+    matching._workload = None
+    matching._aligned_workload = None
+
+
+@case('load_cold', repeat=3)
+def bench_load_cold():
+    for name in _tables():
+        storage.load_table(name)
+
+
+@case('load_cold_projected', repeat=3)
+def bench_load_cold_projected():
+    # What the login page reads
+    storage.load_table('users', ['user_id', 'username', 'password', 'role'])
+
+
+@case('load_cached', repeat=20)
+def bench_load_cached():
+    for name in _tables():
+        table_cache.get_table(name)
+
+
+@case('index_build', repeat=3)
+def bench_index_build():
+    _fresh_indexes()
+    users = table_cache.get_table('users')
+    events = table_cache.get_table('events')
+    indexes.user_index(users)
+    indexes.user_domains(users)
+    indexes.user_skills(users)
+    indexes.event_participants(events)
+    indexes.date_index(events, 'date')
+
+
+@case('filter_members', repeat=10)
+def bench_filter_members():
+    # Domain + status + search filters as in show_members
+    users = table_cache.get_table('users')
+    filtered = indexes.user_domains(users).rows('technology')
+    filtered = filtered[filtered['status'].str.lower() == 'active']
+    filtered[filtered['name'].str.contains('12', case=False, na=False) |
+             filtered['email'].str.contains('12', case=False, na=False)]
+
+
+@case('filter_events_month', repeat=10)
+def bench_filter_events_month():
+    # "This Month" time filter as in show_events
+    events = table_cache.get_table('events')
+    today = datetime.date.today()
+    start = datetime.date(today.year, today.month, 1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    indexes.date_index(events, 'date').rows_between(start, end)
+
+
+@case('volunteer_events', repeat=20)
+def bench_volunteer_events():
+    events = table_cache.get_table('events')
+    users = table_cache.get_table('users')
+    indexes.event_participants(events).rows(users['user_id'].iat[len(users) // 2])
+
+
+@case('match_cold', repeat=3)
+def bench_match_cold():
+    _fresh_indexes()
+    matching.rank_volunteers(table_cache.get_table('users'), table_cache.get_table('tasks'), 'technology')
+
+
+@case('match_warm', repeat=20)
+def bench_match_warm():
+    matching.rank_volunteers(table_cache.get_table('users'), table_cache.get_table('tasks'), 'technology')
+
+
+@case('batch_assign', repeat=1)
+def bench_batch_assign():
+    matching.assign_unassigned(table_cache.get_table('users'), table_cache.get_table('tasks'))
+
+
+@case('render_prep_tasks', repeat=10)
+def bench_render_prep_tasks():
+    # Sort, take the first page and resolve assignee names as in show_tasks_admin
+    tasks = table_cache.get_table('tasks')
+    lookup = indexes.user_index(table_cache.get_table('users'))
+    page = tasks.sort_values(['due_date', 'priority'], ascending=[True, False], kind='stable').iloc[:PAGE_SIZE]
+    [lookup.name(user_id) for user_id in page['assigned_to']]
+
+
+@case('write_update', repeat=20)
+def bench_write_update():
+    tasks = table_cache.get_table('tasks')
+    task_id = tasks['task_id'].iat[np.random.randint(len(tasks))]
+    storage.update('tasks', task_id, {'status': 'in progress'})
+
+
+@case('write_insert', repeat=20)
+def bench_write_insert():
+    storage.insert('ideas', {
+        'idea_id': f"bench{time.perf_counter_ns()}", 'title': 'Benchmark idea', 'description': '',
+        'submitted_by': '', 'status': 'under review',
+        'submission_date': datetime.date.today().strftime('%Y-%m-%d'), 'comments': '',
+    })
+
+
+def run(sizes, seed=0, selected=None, fmt='csv'):
+    data_dir = tempfile.mkdtemp(prefix='ngo_bench_')
+    previous_dir = storage.DATA_DIR
+    try:
+        synthetic_data.write(synthetic_data.generate(sizes, seed=seed), data_dir)
+        storage.DATA_DIR = data_dir
+        if fmt != 'csv':
+            storage.migrate(fmt)
+        table_cache.invalidate()
+        _fresh_indexes()
+        results = {}
+        for name, (fn, repeat) in CASES.items():
+            if selected and name not in selected:
+                continue
+            fn()  # warm-up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            results[name] = {'median_s': statistics.median(timings), 'min_s': min(timings), 'runs': repeat}
+            print(f"{name:24s} median {results[name]['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+        memory = schema.memory_report({name: table_cache.get_table(name) for name in _tables()})
+    finally:
+        storage.DATA_DIR = previous_dir
+        table_cache.invalidate()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return {
+        'meta': {
+            'sizes': sizes,
+            'seed': seed,
+            'format': fmt,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'results': results,
+        'memory': memory.to_dict('records'),
+    }
+
+
+def compare(current, baseline):
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before:
+            ratio = result['median_s'] / before['median_s'] if before['median_s'] else float('inf')
+            print(f"{name:24s} {before['median_s'] * 1000:10.2f} ms -> {result['median_s'] * 1000:10.2f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, size in synthetic_data.DEFAULT_SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=size)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', default='csv', choices=sorted(formats.EXTENSIONS), help="table file format")
+    parser.add_argument('--only', nargs='*', help="run only these cases")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    sizes = {name: getattr(args, name) for name in synthetic_data.DEFAULT_SIZES}
+    current = run(sizes, seed=args.seed, selected=args.only, fmt=args.format)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as f:
+            compare(current, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
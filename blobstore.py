@@ -0,0 +1,99 @@
+import os
+import re
+import base64
+import hashlib
+import shutil
+
+import storage
+
+BLOB_DIR = os.path.join('public', 'uploads', 'blobs')
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_digest(value):
+    return isinstance(value, str) and bool(_DIGEST_RE.match(value))
+
+
+def blob_path(digest):
+    # Fan out on the first two hex characters so no directory gets huge
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _store(tmp_path, digest):
+    path = blob_path(digest)
+    if os.path.exists(path):
+        # Same content already stored
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def put_blob(data):
+    """Store bytes and return their SHA-256 hex digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    if os.path.exists(blob_path(digest)):
+        return digest
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_DIR, f'.{digest}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    return _store(tmp_path, digest)
+
+
+def put_stream(stream):
+    """Store a file-like object chunk by chunk without holding it in memory."""
+    if hasattr(stream, 'seekable') and stream.seekable():
+        stream.seek(0)
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    tmp_path = os.path.join(BLOB_DIR, f'.upload-{os.getpid()}-{id(stream)}.tmp')
+    with open(tmp_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            f.write(chunk)
+    return _store(tmp_path, hasher.hexdigest())
+
+
+def has_blob(digest):
+    return is_digest(digest) and os.path.exists(blob_path(digest))
+
+
+def open_blob(digest):
+    if not is_digest(digest):
+        raise KeyError(digest)
+    return open(blob_path(digest), 'rb')
+
+
+def read_blob(digest):
+    with open_blob(digest) as f:
+        return f.read()
+
+
+def copy_blob(digest, destination):
+    with open_blob(digest) as src:
+        shutil.copyfileobj(src, destination, CHUNK_SIZE)
+
+
+def migrate_inline_images():
+    """Move base64 images still stored inline in users.aadhar_image into the blob store."""
+    users = storage.load_table('users')
+    if 'aadhar_image' not in users.columns:
+        return 0
+    images = users['aadhar_image']
+    inline = images.notna() & (images.astype(str) != '') & ~images.astype(str).str.fullmatch(_DIGEST_RE.pattern)
+    ops = []
+    for user_id, encoded in zip(users.loc[inline, 'user_id'], images[inline]):
+        try:
+            data = base64.b64decode(str(encoded), validate=True)
+        except ValueError:
+            continue
+        ops.append(storage.update_op(user_id, {'aadhar_image': put_blob(data)}))
+    if ops:
+        storage.commit('users', ops)
+        # Rewrite the base file and the history now so the inline payloads are actually dropped from disk
+        storage.scrub_history('users', ['aadhar_image'])
+    return len(ops)
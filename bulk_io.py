@@ -0,0 +1,223 @@
+import os
+import uuid
+import datetime
+import threading
+
+import pandas as pd
+
+import storage
+import table_cache
+import indexes
+import auth
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = None
+    pq = None
+
+CHUNK_SIZE = 5000
+
+USER_COLUMNS = ['user_id', 'username', 'password', 'role', 'name', 'email', 'phone', 'skills', 'domains',
+                'availability', 'aadhar_verified', 'aadhar_image', 'status', 'join_date', 'birthday']
+REQUIRED_IMPORT_COLUMNS = ['username', 'password', 'name', 'email']
+
+# Columns left out of exports unless asked for explicitly
+PRIVATE_COLUMNS = {'users': ['password', 'aadhar_image']}
+
+
+def _is_parquet(source):
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return str(name).lower().endswith('.parquet')
+
+
+def read_chunks(source, chunksize=CHUNK_SIZE):
+    """Yield DataFrame chunks of a CSV or Parquet file (path or file-like) as strings."""
+    if _is_parquet(source):
+        if pq is None:
+            raise RuntimeError("Parquet import needs pyarrow installed")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas().fillna('').astype(str)
+    else:
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            yield chunk
+
+
+def _normalise_list(column):
+    return column.fillna('').astype(str).str.lower().str.split(',').map(
+        lambda parts: ','.join(p.strip() for p in parts if p.strip()))
+
+
+def _new_user_id(role, taken):
+    while True:
+        user_id = f"{role[:3]}{uuid.uuid4().hex[:6]}"
+        if user_id not in taken:
+            taken.add(user_id)
+            return user_id
+
+
+def import_users(source, chunksize=CHUNK_SIZE, progress=None):
+    """Stream a roster into the users table as a single commit.
+
+    Rows are validated and de-duplicated on username and email against both the
+    existing table and earlier rows of the same file. Returns a report dict with
+    the number of imported and skipped rows and a list of (row number, reason).
+    Passwords are hashed behind any logins at the cheap bulk cost and upgraded
+    on each user's first login (see auth.hash_passwords); progress(n) is called
+    with the running count.
+    """
+    users = table_cache.get_table('users')
+    lookup = indexes.user_index(users)
+    seen_usernames = set()
+    seen_emails = set()
+    taken_ids = set(lookup.by_id)
+    today = datetime.date.today().strftime('%Y-%m-%d')
+    ops = []
+    numbers_of = {}  # username -> row number, for rows taken by someone else while hashing
+    errors = []
+    row_number = 0
+
+    for chunk in read_chunks(source, chunksize):
+        chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+        missing = [c for c in REQUIRED_IMPORT_COLUMNS if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        for column in USER_COLUMNS:
+            if column not in chunk.columns:
+                chunk[column] = ''
+        chunk = chunk.fillna('')
+
+        numbers = range(row_number + 2, row_number + 2 + len(chunk))  # +2: header line, 1-based
+        row_number += len(chunk)
+
+        usernames = chunk['username'].astype(str).str.strip()
+        emails = chunk['email'].astype(str).str.strip()
+        keep = []
+        for number, username, email, password, name in zip(numbers, usernames, emails,
+                                                           chunk['password'], chunk['name']):
+            email_key = email.lower()
+            if not username or not password or not name:
+                errors.append((number, "missing username, password or name"))
+            elif '@' not in email:
+                errors.append((number, f"invalid email '{email}'"))
+            elif lookup.has_username(username) or username in seen_usernames:
+                errors.append((number, f"duplicate username '{username}'"))
+            elif lookup.has_email(email) or email_key in seen_emails:
+                errors.append((number, f"duplicate email '{email}'"))
+            else:
+                seen_usernames.add(username)
+                seen_emails.add(email_key)
+                numbers_of[username] = number
+                keep.append(True)
+                continue
+            keep.append(False)
+
+        rows = chunk[keep].copy()
+        if rows.empty:
+            continue
+        rows['username'] = usernames[keep]
+        rows['email'] = emails[keep]
+        hashed = len(ops)
+        rows['password'] = auth.hash_passwords(
+            rows['password'], None if progress is None else lambda n: progress(hashed + n))
+        roles = rows['role'].astype(str).str.strip().str.lower()
+        rows['role'] = roles.where(roles.isin(['admin', 'volunteer']), 'volunteer')
+        for column in ('skills', 'domains', 'availability'):
+            rows[column] = _normalise_list(rows[column])
+        rows['aadhar_verified'] = False
+        rows['aadhar_image'] = ''
+        statuses = rows['status'].astype(str).str.strip().str.lower()
+        rows['status'] = statuses.where(statuses.isin(['active', 'inactive']), 'active')
+        rows['join_date'] = rows['join_date'].where(rows['join_date'] != '', today)
+        rows['user_id'] = [_new_user_id(role, taken_ids) for role in rows['role']]
+        # Column lists rather than to_dict('records'): far quicker on Arrow-backed strings
+        values = zip(*(rows[c].tolist() for c in USER_COLUMNS))
+        ops.extend(storage.insert_op('users', dict(zip(USER_COLUMNS, row))) for row in values)
+
+    if ops:
+        with storage._file_lock('users'):
+            # Hashing takes a while: check again for usernames and emails registered meanwhile
+            lookup = indexes.user_index(table_cache.get_table('users'))
+            fresh = []
+            for op in ops:
+                username, email = op['row']['username'], op['row']['email']
+                if lookup.has_username(username):
+                    errors.append((numbers_of[username], f"duplicate username '{username}'"))
+                elif lookup.has_email(email):
+                    errors.append((numbers_of[username], f"duplicate email '{email}'"))
+                else:
+                    fresh.append(op)
+            ops = fresh
+            if ops:
+                storage.commit('users', ops)
+                # Fold the import into users.csv right away rather than replaying it on every
+                # load; the cached frame already has the commit written through
+                storage.checkpoint('users', table_cache.get_table('users'))
+    return {'imported': len(ops), 'skipped': len(errors), 'errors': errors}
+
+
+class ImportJob:
+    # import_users on a background thread, so a page can start a long import and
+    # poll it: hashed/total while it runs, then report (or error)
+
+    def __init__(self, source, actor=None, chunksize=CHUNK_SIZE):
+        self.total = None
+        self.hashed = 0
+        self.report = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(source, actor, chunksize),
+                                        name='import-users', daemon=True)
+        self._thread.start()
+
+    def _progress(self, hashed):
+        self.hashed = hashed
+
+    def _run(self, source, actor, chunksize):
+        storage.set_actor(actor)
+        try:
+            self.total = sum(len(chunk) for chunk in read_chunks(source, chunksize))
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            self.report = import_users(source, chunksize, self._progress)
+        except Exception as e:
+            # Kept for the page to show; the thread would otherwise die with it unseen
+            self.error = e
+
+    def finished(self):
+        return not self._thread.is_alive()
+
+
+def export_table(name, destination, fmt='csv', columns=None, chunksize=CHUNK_SIZE):
+    """Write a table to a path or binary file object chunk by chunk."""
+    frame = table_cache.get_table(name)
+    if columns is None:
+        private = PRIVATE_COLUMNS.get(name, []) + [storage.VERSION_COLUMN]
+        columns = [c for c in frame.columns if c not in private]
+    frame = frame[columns]
+
+    if fmt == 'parquet':
+        if pq is None:
+            raise RuntimeError("Parquet export needs pyarrow installed")
+        writer = None
+        try:
+            for start in range(0, max(len(frame), 1), chunksize):
+                table = pa.Table.from_pandas(frame.iloc[start:start + chunksize].fillna('').astype(str),
+                                             preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(destination, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return len(frame)
+
+    close = isinstance(destination, (str, os.PathLike))
+    f = open(destination, 'wb') if close else destination
+    try:
+        for start in range(0, max(len(frame), 1), chunksize):
+            f.write(frame.iloc[start:start + chunksize].to_csv(index=False, header=start == 0).encode())
+    finally:
+        if close:
+            f.close()
+    return len(frame)
@@ -0,0 +1,134 @@
+"""Replay and inspect the append-only change log of the tables.
+
+Every commit is a numbered record (seq, time, actor, ops) appended to
+data/<table>.wal. Checkpoints seal the log into data/log/<table>/ segments
+named by their first and last seq, and every few segments keep a snapshot of
+the base file, so a table can be rebuilt as of any seq from the nearest
+snapshot before it, back to the oldest snapshot kept. Derived views (indexes, dashboard aggregates, per-user
+projections) are keyed on the table frames and rebuild themselves from the
+rebuilt tables.
+
+    python changelog.py verify                          # rebuild every table and compare
+    python changelog.py rebuild --table tasks --write   # replace the base file with the rebuild
+    python changelog.py rebuild --table tasks --until 1200 --out tasks_1200.csv
+    python changelog.py history --table tasks --key task0001
+"""
+import sys
+import argparse
+
+import storage
+import schema
+import formats
+
+
+def _transactions(path):
+    return storage._scan_log(path)[0]
+
+
+def records(name, after=0, until=None):
+    """Yield the table's committed transactions with after < seq <= until, oldest first."""
+    for first, last, path in storage.segments(name):
+        if last <= after or (until is not None and first > until):
+            continue
+        for txn in _transactions(path):
+            if txn['seq'] > after and (until is None or txn['seq'] <= until):
+                yield txn
+    for txn in storage._read_wal(name):
+        seq = txn.get('seq')
+        if seq is not None and seq > after and (until is None or seq <= until):
+            yield txn
+
+
+def _batches(name, after, until):
+    # Sealed segments are replayed one at a time, as their checkpoints applied them
+    for first, last, path in storage.segments(name):
+        if last <= after or (until is not None and first > until):
+            continue
+        yield [t for t in _transactions(path) if t['seq'] > after and (until is None or t['seq'] <= until)]
+    yield [t for t in storage._read_wal(name)
+           if t.get('seq') is not None and t['seq'] > after and (until is None or t['seq'] <= until)]
+
+
+def rebuild(name, until=None):
+    """The table as of seq until (default: the latest commit), from snapshot and log alone."""
+    taken = [s for s in storage.snapshots(name) if until is None or s[0] <= until]
+    if not taken:
+        if storage.segments(name):
+            raise RuntimeError(f"No snapshot of {name} old enough to rebuild from")
+        # Nothing sealed yet: the base file is the only snapshot there is
+        if until is not None:
+            raise RuntimeError(f"{name} has no history before its write-ahead log")
+        return storage.load_table(name)
+    seq, path, fmt = taken[-1]
+    frame = formats.read(path, fmt, name)
+    key = storage.TABLES[name]
+    for batch in _batches(name, seq, until):
+        frame = storage._replay(frame, key, batch)
+    return schema.apply(name, frame)
+
+
+def history(name, key):
+    """Every change to one row as a list of dicts: seq, ts, actor, op and the row/changes."""
+    key = str(key)
+    changes = []
+    for txn in records(name):
+        for op in txn['ops']:
+            if op['key'] == key:
+                changes.append({'seq': txn['seq'], 'ts': txn.get('ts'), 'actor': txn.get('actor'),
+                                'op': op['op'], 'values': op.get('row') or op.get('changes') or {}})
+    return changes
+
+
+def _same(a, b, key):
+    a = a.sort_values(key, ignore_index=True)
+    b = b.sort_values(key, ignore_index=True)
+    return list(a.columns) == list(b.columns) and a.astype(str).equals(b.astype(str))
+
+
+def verify(name):
+    # The rebuild from snapshot + log matches what storage loads from base + log
+    return _same(rebuild(name), storage.load_table(name), storage.TABLES[name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild', 'verify', 'history'])
+    parser.add_argument('--data', default=storage.DATA_DIR, help="directory holding the table files")
+    parser.add_argument('--table', choices=sorted(storage.TABLES), help="default: every table")
+    parser.add_argument('--until', type=int, help="rebuild as of this seq")
+    parser.add_argument('--out', help="write the rebuilt table to this .csv/.arrow/.parquet file")
+    parser.add_argument('--write', action='store_true', help="replace the base file with the rebuild")
+    parser.add_argument('--key', help="row key for history")
+    args = parser.parse_args()
+
+    storage.DATA_DIR = args.data
+    names = [args.table] if args.table else [name for name in storage.TABLES if storage.table_exists(name)]
+
+    if args.command == 'history':
+        if not (args.table and args.key):
+            parser.error("history needs --table and --key")
+        for change in history(args.table, args.key):
+            print(f"{change['seq']:>8} {change['ts']} {change['actor'] or '-':>12} {change['op']:6} {change['values']}")
+    elif args.command == 'verify':
+        failed = [name for name in names if not verify(name)]
+        for name in names:
+            print(f"{name}: {'MISMATCH' if name in failed else 'ok'}")
+        sys.exit(1 if failed else 0)
+    else:
+        if args.write and args.until is not None:
+            parser.error("--write replaces the live table; it cannot be combined with --until")
+        if args.out and len(names) > 1:
+            parser.error("--out needs --table")
+        for name in names:
+            with storage._file_lock(name):
+                frame = rebuild(name, args.until)
+                if args.write:
+                    storage.checkpoint(name, frame)
+            if args.out:
+                fmt = next((f for f, ext in formats.EXTENSIONS.items() if args.out.endswith(ext)), 'csv')
+                formats.write(args.out, fmt, frame)
+            print(f"{name}: {len(frame)} rows")
+
+
+if __name__ == '__main__':
+    main()
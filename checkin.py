@@ -0,0 +1,265 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import datetime
+import threading
+from collections import Counter
+
+import numpy as np
+
+import schema
+import storage
+import table_cache
+
+# Codes are signed with this secret so they cannot be made up from a record id
+SECRET_ENV = 'NGO_CHECKIN_SECRET'
+SECRET_FILE = 'checkin.key'  # in the data directory, created on first use
+TOKEN_DIGITS = 10
+
+# Scans are acknowledged from memory and written in groups: a batch stays open this
+# long after its first scan, so a queue of arrivals costs one log append and fsync
+BATCH_WINDOW = 0.25
+BATCH_MAX = 500
+RETRY_SECONDS = 2
+
+CHECK_IN = 'check_in'
+CHECK_OUT = 'check_out'
+
+_lock = threading.RLock()
+_written = threading.Condition(_lock)
+_secret = None
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def _key():
+    global _secret
+    if _secret is None:
+        secret = os.environ.get(SECRET_ENV)
+        if not secret:
+            path = os.path.join(storage.DATA_DIR, SECRET_FILE)
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(secrets.token_hex(32))
+            with open(path) as f:
+                secret = f.read().strip()
+        _secret = secret.encode()
+    return _secret
+
+
+def _signature(record_id):
+    return hmac.new(_key(), record_id.encode(), hashlib.sha256).hexdigest()[:TOKEN_DIGITS]
+
+
+def token(record_id):
+    """The check-in code for one attendance record (what a volunteer shows at the door)."""
+    record_id = str(record_id)
+    return f'{record_id}-{_signature(record_id)}'
+
+
+def record_of(code):
+    # The attendance record a scanned code belongs to, or None if it is not genuine
+    record_id, _, signature = schema.to_text(code).strip().rpartition('-')
+    if not record_id or not hmac.compare_digest(signature.lower(), _signature(record_id)):
+        return None
+    return record_id
+
+
+class Roster(table_cache.DerivedView):
+    # Check-in state of every attendance record with per-event headcounts, kept up
+    # to date from the commit log and from scans not yet written
+
+    def __init__(self):
+        super().__init__()
+        self.rows = {}  # record_id -> {'event_id', 'user_id', 'check_in', 'check_out'}
+        self.by_registration = {}  # (event_id, user_id) -> record_id
+        self.registered = Counter()
+        self.checked_in = Counter()
+        self.present = Counter()  # checked in and not yet out
+
+    def _count(self, row, sign):
+        event_id = row['event_id']
+        self.registered[event_id] += sign
+        if row['check_in']:
+            self.checked_in[event_id] += sign
+            if not row['check_out']:
+                self.present[event_id] += sign
+
+    def _remove(self, record_id):
+        row = self.rows.pop(record_id, None)
+        if row is not None:
+            self._count(row, -1)
+            self.by_registration.pop((row['event_id'], row['user_id']), None)
+        return row
+
+    def _add(self, record_id, row):
+        row = {c: schema.to_text(row.get(c)) for c in ('event_id', 'user_id', 'check_in', 'check_out')}
+        self.rows[record_id] = row
+        self.by_registration[(row['event_id'], row['user_id'])] = record_id
+        self._count(row, 1)
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.by_registration = {}
+        self.registered = Counter()
+        self.checked_in = Counter()
+        self.present = Counter()
+        columns = ['event_id', 'user_id', 'check_in', 'check_out']
+        values = [frame[c].tolist() if c in frame.columns else [''] * len(frame) for c in columns]
+        for record_id, row in zip(frame['record_id'].astype(str), zip(*values)):
+            self._add(record_id, dict(zip(columns, row)))
+        # Scans not yet written still count
+        for changes in (_writing, _pending):
+            for record_id, change in changes.items():
+                self.update(record_id, change)
+
+    def update(self, record_id, changes):
+        old = self._remove(record_id)
+        if old is not None:
+            self._add(record_id, {**old, **changes})
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._add(key, op['row'])
+            elif op['op'] == 'update':
+                self.update(key, op['changes'])
+            elif op['op'] == 'delete':
+                self._remove(key)
+
+    def headcount(self, event_id):
+        """(registered, checked in, present now) for one event."""
+        event_id = str(event_id)
+        return self.registered[event_id], self.checked_in[event_id], self.present[event_id]
+
+    def registration(self, event_id, user_id):
+        return self.by_registration.get((str(event_id), str(user_id)))
+
+
+_roster = table_cache.derive('attendance', Roster(), _lock)
+_pending = {}  # record_id -> changes accepted but not yet handed to the writer
+_writing = {}  # record_id -> changes in the batch being committed
+_writer = None
+
+
+def roster():
+    """The roster as of the current attendance table and every scan acknowledged since."""
+    # Always the latest frame: the writer thread may have moved the table on since
+    # the caller loaded it, and an older frame would roll the counts back
+    attendance = table_cache.get_table('attendance')
+    with _lock:
+        return _roster.sync(attendance)
+
+
+def _already_written(frame, batch):
+    # Records in batch that the table (possibly written by another kiosk) already has checked in
+    ids = frame['record_id'].astype(str)
+    hits = np.flatnonzero(ids.isin(list(batch)).to_numpy())
+    check_ins = frame['check_in'].iloc[hits].fillna('').astype(str).to_numpy()
+    return {record_id for record_id, value in zip(ids.iloc[hits], check_ins) if value}
+
+
+def _write(batch):
+    with storage._file_lock('attendance'):
+        # Checked under the table lock, so a code scanned at two kiosks checks in once
+        done = _already_written(table_cache.get_table('attendance'), batch)
+        ops = []
+        for record_id, changes in batch.items():
+            if record_id in done:
+                changes = {c: v for c, v in changes.items() if c == 'check_out'}
+            if changes:
+                ops.append(storage.update_op(record_id, changes))
+        storage.commit('attendance', ops)
+
+
+def _run_writer():
+    global _writing
+    while True:
+        with _lock:
+            while not _pending:
+                _written.wait()
+        # Hold the batch open briefly so scans arriving together are written together
+        deadline = time.monotonic() + BATCH_WINDOW
+        while time.monotonic() < deadline and len(_pending) < BATCH_MAX:
+            time.sleep(0.01)
+        with _lock:
+            batch = _writing = dict(list(_pending.items())[:BATCH_MAX])
+            for record_id in batch:
+                del _pending[record_id]
+        try:
+            _write(batch)
+        except Exception:
+            # Keep the scans and try again; newer scans of the same record win
+            with _lock:
+                for record_id, changes in batch.items():
+                    _pending[record_id] = {**changes, **_pending.get(record_id, {})}
+                _writing = {}
+            time.sleep(RETRY_SECONDS)
+            continue
+        with _lock:
+            _writing = {}
+            _written.notify_all()
+
+
+def _start_writer():
+    # Caller holds _lock
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        _writer = threading.Thread(target=_run_writer, name='checkin-writer', daemon=True)
+        _writer.start()
+
+
+def scan(code, mode=CHECK_IN, event_id=None):
+    """Check a scanned code in or out; returns (outcome, row or None).
+
+    outcome is 'checked_in', 'checked_out', 'duplicate' (already done; scanning again
+    changes nothing), 'not_checked_in' (checking out before in), 'wrong_event' or
+    'invalid'. The scan is acknowledged at once and written with the next batch.
+    """
+    record_id = record_of(code)
+    if record_id is None:
+        return 'invalid', None
+    attendance = table_cache.get_table('attendance')
+    with _lock:
+        row = _roster.sync(attendance).rows.get(record_id)
+        if row is None:
+            return 'invalid', None
+        if event_id is not None and row['event_id'] != str(event_id):
+            return 'wrong_event', dict(row)
+        if mode == CHECK_IN:
+            if row['check_in']:
+                return 'duplicate', dict(row)
+            changes, outcome = {'check_in': _now(), 'status': 'attended'}, 'checked_in'
+        else:
+            if not row['check_in']:
+                return 'not_checked_in', dict(row)
+            if row['check_out']:
+                return 'duplicate', dict(row)
+            changes, outcome = {'check_out': _now()}, 'checked_out'
+        _roster.update(record_id, changes)
+        _pending[record_id] = {**_pending.get(record_id, {}), **changes}
+        _start_writer()
+        _written.notify_all()
+        return outcome, dict(_roster.rows[record_id])
+
+
+def flush(timeout=None):
+    """Wait until every acknowledged scan is in the table; False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _lock:
+        while _pending or _writing:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _written.wait(remaining)
+    return True
@@ -0,0 +1,113 @@
+"""On-disk formats for the table base files.
+
+csv      data/<name>.csv, the original format
+arrow    Arrow IPC file, read through a memory map without parsing or copying
+parquet  compressed columnar file, smaller on disk but decoded on every read
+
+A table is read in the format of whichever base file exists. Moving the data
+directory to another format is a one-shot migration:
+
+    python formats.py --to arrow
+"""
+import os
+import argparse
+
+import pandas as pd
+
+import schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # columnar formats are optional
+    pa = None
+    pq = None
+
+EXTENSIONS = {'csv': '.csv', 'arrow': '.arrow', 'parquet': '.parquet'}
+
+# Checked in this order when more than one base file exists
+PREFERENCE = ['arrow', 'parquet', 'csv']
+
+
+def path_for(data_dir, name, fmt):
+    return os.path.join(data_dir, f'{name}{EXTENSIONS[fmt]}')
+
+
+def detect(data_dir, name):
+    # Format of the table's existing base file, or None if there is none yet
+    for fmt in PREFERENCE:
+        if os.path.exists(path_for(data_dir, name, fmt)):
+            return fmt
+    return None
+
+
+def _require_arrow(fmt):
+    if pa is None:
+        raise RuntimeError(f"The {fmt} table format needs pyarrow installed")
+
+
+def _types_mapper(arrow_type):
+    # Keep strings and dates Arrow-backed instead of materialising Python objects
+    if schema.STRING_DTYPE is not None and arrow_type in (pa.string(), pa.large_string()):
+        return schema.STRING_DTYPE
+    if arrow_type == pa.date32() and isinstance(schema.DATE_DTYPE, pd.ArrowDtype):
+        return schema.DATE_DTYPE
+    return None
+
+
+def _to_frame(table, columns):
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table.to_pandas(types_mapper=_types_mapper)
+
+
+def read(path, fmt, name, columns=None):
+    """Read a base file, optionally only some of its columns."""
+    if fmt == 'csv':
+        usecols = None if columns is None else (lambda c: c in columns)
+        return pd.read_csv(path, dtype=schema.csv_dtypes(name), usecols=usecols)
+    _require_arrow(fmt)
+    if fmt == 'arrow':
+        # Buffers point into the mapping, so only the selected columns are ever paged in
+        return _to_frame(pa.ipc.open_file(pa.memory_map(path, 'r')).read_all(), columns)
+    return _to_frame(pq.read_table(path, columns=columns, memory_map=True), None)
+
+
+def _to_table(frame):
+    # Columns outside the schema may hold mixed Python objects; store those as text
+    mixed = [c for c in frame.columns if frame[c].dtype == object]
+    if mixed:
+        frame = frame.assign(**{c: frame[c].where(frame[c].isna(), frame[c].astype(str)) for c in mixed})
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def write(path, fmt, frame):
+    if fmt == 'csv':
+        frame.to_csv(path, index=False)
+        return
+    _require_arrow(fmt)
+    table = _to_table(frame)
+    if fmt == 'arrow':
+        # Uncompressed so reads can map the file directly
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, path)
+
+
+def main():
+    import storage  # storage imports this module
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--to', required=True, choices=sorted(EXTENSIONS), help="format to migrate the tables to")
+    parser.add_argument('--data', default=storage.DATA_DIR, help="directory holding the table files")
+    args = parser.parse_args()
+
+    storage.DATA_DIR = args.data
+    for name, rows in storage.migrate(args.to).items():
+        print(f"{name}: {rows} rows -> {storage.table_path(name)}")
+
+
+if __name__ == '__main__':
+    main()
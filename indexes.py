@@ -0,0 +1,174 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+_lock = threading.Lock()
+_user_index = None
+
+
+class UserIndex:
+    # user_id -> row position, plus username and (lower-cased) email lookups
+
+    def __init__(self, users):
+        self.users = users
+        positions = range(len(users))
+        self.by_id = dict(zip(users['user_id'].astype(str), positions))
+        self.by_username = dict(zip(users['username'].astype(str), positions))
+        emails = users['email'].fillna('').astype(str).str.lower()
+        self.by_email = {email: pos for email, pos in zip(emails, positions) if email}
+        self.names = dict(zip(users['user_id'].astype(str), users['name']))
+
+    def __contains__(self, user_id):
+        return str(user_id) in self.by_id
+
+    def row(self, user_id):
+        pos = self.by_id.get(str(user_id))
+        return None if pos is None else self.users.iloc[pos]
+
+    def name(self, user_id, default="Unknown User"):
+        if user_id is None or (isinstance(user_id, float) and pd.isna(user_id)):
+            return default
+        return self.names.get(str(user_id), default)
+
+    def has_username(self, username):
+        return username in self.by_username
+
+    def has_email(self, email):
+        return bool(email) and email.lower() in self.by_email
+
+
+def user_index(users):
+    """Return the index for this version of the users frame, building it once."""
+    global _user_index
+    with _lock:
+        if _user_index is None or _user_index.users is not users:
+            _user_index = UserIndex(users)
+        return _user_index
+
+
+class Relation:
+    # Normalised form of a comma-separated column: a (key, value) join table plus
+    # an inverted index from each value to the row positions that contain it
+
+    def __init__(self, frame, key_column, list_column):
+        self.frame = frame
+        self.key_column = key_column
+        values = frame[list_column].fillna('').astype(str).str.lower().str.split(',')
+        exploded = values.explode().str.strip()
+        positions = pd.Series(range(len(frame)), index=frame.index).reindex(exploded.index)
+        keep = exploded.notna() & (exploded != '')
+        self.pairs = pd.DataFrame({
+            key_column: frame[key_column].astype(str).reindex(exploded.index)[keep].to_numpy(),
+            list_column: exploded[keep].to_numpy(),
+        })
+        # Group row positions by value without a Python-level loop over the pairs
+        pair_positions = positions[keep].to_numpy(dtype=np.int64)
+        codes, uniques = pd.factorize(exploded[keep].to_numpy())
+        order = np.lexsort((pair_positions, codes))
+        codes, pair_positions = codes[order], pair_positions[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (pair_positions[1:] != pair_positions[:-1])
+        codes, pair_positions = codes[first], pair_positions[first]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        self.inverse = dict(zip(uniques, np.split(pair_positions, bounds) if len(codes) else []))
+
+    def values(self):
+        return sorted(self.inverse)
+
+    def positions(self, value):
+        return self.inverse.get(str(value).lower(), _NO_ROWS)
+
+    def keys(self, value):
+        return self.frame[self.key_column].iloc[self.positions(value)].tolist()
+
+    def rows(self, *values):
+        # Rows containing any of the given values, in table order
+        positions = [self.positions(value) for value in values]
+        if len(positions) != 1:
+            positions = [np.unique(np.concatenate(positions or [_NO_ROWS]))]
+        return self.frame.iloc[positions[0]]
+
+    def count(self, value):
+        return len(self.positions(value))
+
+
+_NO_ROWS = np.array([], dtype=np.int64)
+_relations = {}
+
+
+def relation(frame, key_column, list_column):
+    """Return the relation for this version of the frame, building it once."""
+    with _lock:
+        cached = _relations.get((key_column, list_column))
+        if cached is None or cached.frame is not frame:
+            cached = Relation(frame, key_column, list_column)
+            _relations[(key_column, list_column)] = cached
+        return cached
+
+
+def event_participants(events):
+    return relation(events, 'event_id', 'participants')
+
+
+def event_coordinators(events):
+    return relation(events, 'event_id', 'coordinator')
+
+
+def user_skills(users):
+    return relation(users, 'user_id', 'skills')
+
+
+def user_domains(users):
+    return relation(users, 'user_id', 'domains')
+
+
+def user_availability(users):
+    return relation(users, 'user_id', 'availability')
+
+
+class DateIndex:
+    # A date column parsed once into datetime64[D], plus its row positions in date order
+    # so time windows are binary-searched instead of re-parsed and scanned
+
+    def __init__(self, frame, column):
+        self.frame = frame
+        parsed = pd.to_datetime(frame[column], errors='coerce')
+        self.dates = parsed.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        # numpy sorts NaT last, so the first n_valid entries of the order are searchable
+        self.order = np.argsort(self.dates, kind='stable')
+        self.n_valid = int((~np.isnat(self.dates)).sum())
+        self.sorted_dates = self.dates[self.order[:self.n_valid]]
+
+    def positions_between(self, start=None, end=None):
+        # Row positions with start <= date <= end (either bound optional), in date order
+        if start is None and end is None:
+            return self.order
+        lo = 0 if start is None else np.searchsorted(self.sorted_dates, np.datetime64(start, 'D'), side='left')
+        hi = self.n_valid if end is None else np.searchsorted(self.sorted_dates, np.datetime64(end, 'D'), side='right')
+        return self.order[lo:max(lo, hi)]
+
+    def rows_between(self, start=None, end=None):
+        return self.frame.iloc[self.positions_between(start, end)]
+
+    def column(self, subset):
+        # Parsed dates for the rows of a subset of the frame
+        return self.dates[self.frame.index.get_indexer(subset.index)]
+
+    def date_of(self, label):
+        value = self.dates[self.frame.index.get_loc(label)]
+        return None if np.isnat(value) else value.astype(object)
+
+
+_date_indexes = {}
+
+
+def date_index(frame, column):
+    """Return the date index for this version of the frame, building it once."""
+    with _lock:
+        key = (frame.columns[0], column)
+        cached = _date_indexes.get(key)
+        if cached is None or cached.frame is not frame:
+            cached = DateIndex(frame, column)
+            _date_indexes[key] = cached
+        return cached
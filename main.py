@@ -1,16 +1,30 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import datetime
 import os
-import hashlib
 import uuid
-from PIL import Image
 import io
-import base64
 from streamlit_option_menu import option_menu
 
+import storage
+import blobstore
+import table_cache
+import indexes
+import matching
+import bulk_io
+import stats
+import projections
+import schema
+import auth
+import analytics
+import verification
+import search
+import votes
+import checkin
+import notifications
+import scheduler
+
 # Set page configuration
 st.set_page_config(
     page_title="NGO Volunteer Management",
@@ -28,22 +42,23 @@ if "user_id" not in st.session_state:
     st.session_state.user_id = None
 if "active_tab" not in st.session_state:
     st.session_state.active_tab = "Dashboard"
-if "notifications" not in st.session_state:
-    st.session_state.notifications = []
+
+# Changes made during this run are recorded in the change log under the logged-in user
+storage.set_actor(st.session_state.user_id)
 
 # Create database directories if they don't exist
 if not os.path.exists('data'):
     os.makedirs('data')
 
 # Initialize databases with sample data if they don't exist
-if not os.path.exists('data/users.csv'):
+if not storage.table_exists('users'):
     users_df = pd.DataFrame({
         'user_id': ['admin001', 'vol001', 'vol002'],
         'username': ['admin', 'john_doe', 'jane_smith'],
         'password': [
-            hashlib.sha256('admin123'.encode()).hexdigest(),
-            hashlib.sha256('password123'.encode()).hexdigest(),
-            hashlib.sha256('password456'.encode()).hexdigest()
+            auth.hash_password('admin123'),
+            auth.hash_password('password123'),
+            auth.hash_password('password456')
         ],
         'role': ['admin', 'volunteer', 'volunteer'],
         'name': ['Admin User', 'John Doe', 'Jane Smith'],
@@ -60,7 +75,7 @@ if not os.path.exists('data/users.csv'):
     })
     users_df.to_csv('data/users.csv', index=False)
 
-if not os.path.exists('data/tasks.csv'):
+if not storage.table_exists('tasks'):
     tasks_df = pd.DataFrame({
         'task_id': ['task001', 'task002', 'task003'],
         'title': ['Website Update', 'Social Media Campaign', 'Community Outreach'],
@@ -75,11 +90,13 @@ if not os.path.exists('data/tasks.csv'):
         'domain': ['technology', 'social media', 'on-ground'],
         'priority': ['medium', 'high', 'low'],
         'created_by': ['admin001', 'admin001', 'admin001'],
-        'created_date': ['2025-03-20', '2025-03-22', '2025-03-23']
+        'created_date': ['2025-03-20', '2025-03-22', '2025-03-23'],
+        'completed_date': ['', '', ''],
+        'flagged_overdue': ['', '', '']
     })
     tasks_df.to_csv('data/tasks.csv', index=False)
 
-if not os.path.exists('data/events.csv'):
+if not storage.table_exists('events'):
     events_df = pd.DataFrame({
         'event_id': ['evt001', 'evt002'],
         'title': ['Annual Fundraiser', 'Community Workshop'],
@@ -98,7 +115,7 @@ if not os.path.exists('data/events.csv'):
     })
     events_df.to_csv('data/events.csv', index=False)
 
-if not os.path.exists('data/attendance.csv'):
+if not storage.table_exists('attendance'):
     attendance_df = pd.DataFrame({
         'record_id': ['att001', 'att002'],
         'event_id': ['evt001', 'evt001'],
@@ -110,7 +127,7 @@ if not os.path.exists('data/attendance.csv'):
     })
     attendance_df.to_csv('data/attendance.csv', index=False)
 
-if not os.path.exists('data/ideas.csv'):
+if not storage.table_exists('ideas'):
     ideas_df = pd.DataFrame({
         'idea_id': ['idea001', 'idea002'],
         'title': ['Online Donation Platform', 'Monthly Newsletter'],
@@ -125,25 +142,55 @@ if not os.path.exists('data/ideas.csv'):
     })
     ideas_df.to_csv('data/ideas.csv', index=False)
 
+votes.create_tables()
+notifications.create_table()
+
+# Move any Aadhaar images still stored inline as base64 into the blob store (once per process)
+@st.cache_resource
+def migrate_aadhar_images():
+    return blobstore.migrate_inline_images()
+
+migrate_aadhar_images()
+
+# Event statuses, overdue tasks and reminders are swept in the background, not on reruns
+@st.cache_resource
+def start_scheduler():
+    scheduler.start()
+
+start_scheduler()
+
 # Load data
-@st.cache_data(ttl=60)
+# Each table is cached on its own and re-read only when its files change; our own
+# writes are applied to the cache directly. The frames are shared and read-only.
 def load_data():
-    users = pd.read_csv('data/users.csv')
-    tasks = pd.read_csv('data/tasks.csv')
-    events = pd.read_csv('data/events.csv')
-    attendance = pd.read_csv('data/attendance.csv')
-    ideas = pd.read_csv('data/ideas.csv')
+    users = table_cache.get_table('users')
+    tasks = table_cache.get_table('tasks')
+    events = table_cache.get_table('events')
+    attendance = table_cache.get_table('attendance')
+    ideas = table_cache.get_table('ideas')
     return users, tasks, events, attendance, ideas
 
 # Authentication functions
+# The login page only needs these, so the first render after a restart reads nothing else
+LOGIN_COLUMNS = ['user_id', 'username', 'password', 'role']
+
+def client_ip():
+    # Best effort: the address Streamlit saw, or the first proxy hop
+    context = getattr(st, 'context', None)
+    ip = getattr(context, 'ip_address', None)
+    if not ip and context is not None:
+        forwarded = context.headers.get('X-Forwarded-For', '')
+        ip = forwarded.split(',')[0].strip()
+    return ip or None
+
 def authenticate(username, password):
-    users, _, _, _, _ = load_data()
-    hashed_password = hashlib.sha256(password.encode()).hexdigest()
-    user = users[(users['username'] == username) & (users['password'] == hashed_password)]
-    if not user.empty:
+    # Raises auth.LoginThrottled after too many failed attempts
+    users = table_cache.get_table('users', LOGIN_COLUMNS)
+    user = auth.authenticate(users, username, password, client_ip())
+    if user is not None:
         st.session_state.authenticated = True
-        st.session_state.user_role = user['role'].values[0]
-        st.session_state.user_id = user['user_id'].values[0]
+        st.session_state.user_role = user['role']
+        st.session_state.user_id = user['user_id']
         return True
     return False
 
@@ -153,6 +200,74 @@ def logout():
     st.session_state.user_id = None
     st.session_state.active_tab = "Dashboard"
 
+# Number of rows rendered per page in the Members, Tasks and Events lists
+PAGE_SIZE = 20
+
+def paginate(frame, list_key, filters=()):
+    # Render page navigation and return only the visible slice of an already sorted frame (or list).
+    # The cursor lives in session state and resets whenever the list's filters change.
+    page_key = f"{list_key}_page"
+    filters_key = f"{list_key}_filters"
+    if st.session_state.get(filters_key) != filters:
+        st.session_state[filters_key] = filters
+        st.session_state[page_key] = 0
+    
+    total_pages = max(1, -(-len(frame) // PAGE_SIZE))
+    page = min(st.session_state.get(page_key, 0), total_pages - 1)
+    
+    if total_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("◀ Previous", key=f"{list_key}_prev", disabled=page == 0):
+                page -= 1
+        with next_col:
+            if st.button("Next ▶", key=f"{list_key}_next", disabled=page >= total_pages - 1):
+                page += 1
+        with info_col:
+            st.write(f"Page {page + 1} of {total_pages} ({len(frame)} items)")
+    
+    st.session_state[page_key] = page
+    rows = frame.iloc if isinstance(frame, pd.DataFrame) else frame
+    return rows[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+CONFLICT_MESSAGE = "Someone else changed this record while you were looking at it. The page now shows their changes; please try again."
+
+def _version_key(table, key):
+    return f"seen_version_{table}_{key}"
+
+def seen_version(table, row):
+    # The row's version as rendered on the previous run, i.e. what the user is acting on:
+    # a button or form submit reruns the script first, so the row read now may be newer
+    state_key = _version_key(table, row[storage.TABLES[table]])
+    current = storage.row_version(row)
+    seen = st.session_state.get(state_key, current)
+    st.session_state[state_key] = current
+    return seen
+
+def save_row(table, row, changes, seen):
+    # Update a row only if it is still at the version the user saw; shows an error otherwise
+    key = row[storage.TABLES[table]]
+    try:
+        version = storage.update(table, key, changes, version=seen)
+    except storage.ConflictError:
+        st.error(CONFLICT_MESSAGE)
+        return False
+    st.session_state[_version_key(table, key)] = version
+    return True
+
+def task_status(status):
+    # Changes for moving a task to status; completion is dated for the analytics
+    completed = datetime.date.today().strftime('%Y-%m-%d') if status == 'completed' else None
+    return {'status': status, 'completed_date': completed}
+
+def delete_row(table, row, seen):
+    try:
+        storage.delete(table, row[storage.TABLES[table]], version=seen)
+    except storage.ConflictError:
+        st.error(CONFLICT_MESSAGE)
+        return False
+    return True
+
 # Layout functions
 def show_login():
     st.title("🤝 NGO Volunteer Management Platform")
@@ -166,10 +281,15 @@ def show_login():
         login_button = st.button("Login")
         
         if login_button:
-            if authenticate(username, password):
-                st.rerun()
+            try:
+                logged_in = authenticate(username, password)
+            except auth.LoginThrottled as e:
+                st.error(f"Too many failed attempts. Please try again in {e.retry_after} seconds.")
             else:
-                st.error("Invalid username or password")
+                if logged_in:
+                    st.rerun()
+                else:
+                    st.error("Invalid username or password")
     
     with col2:
         st.write("### Register")
@@ -197,37 +317,40 @@ def show_login():
             if st.button("Register"):
                 if reg_name and reg_email and reg_phone and reg_username and reg_password:
                     users, _, _, _, _ = load_data()
-                    if reg_username in users['username'].values:
+                    if indexes.user_index(users).has_username(reg_username):
                         st.error("Username already exists. Please choose another.")
                     else:
-                        # Save Aadhar image if uploaded
-                        aadhar_image_data = ""
-                        if aadhar_upload:
-                            file_bytes = aadhar_upload.getvalue()
-                            aadhar_image_data = base64.b64encode(file_bytes).decode()
+                        try:
+                            password_hash = auth.hash_password(reg_password)
+                        except auth.LoginThrottled as e:
+                            st.error(f"The server is busy. Please try again in {e.retry_after} seconds.")
+                        else:
+                            # Save Aadhar image to the blob store if uploaded; only its digest goes in users.csv
+                            aadhar_image_data = ""
+                            if aadhar_upload:
+                                aadhar_image_data = blobstore.put_stream(aadhar_upload)
                         
-                        # Create new user
-                        new_user = pd.DataFrame({
-                            'user_id': [f"vol{str(uuid.uuid4())[:6]}"],
-                            'username': [reg_username],
-                            'password': [hashlib.sha256(reg_password.encode()).hexdigest()],
-                            'role': ['volunteer'],
-                            'name': [reg_name],
-                            'email': [reg_email],
-                            'phone': [reg_phone],
-                            'skills': [','.join(reg_skills).lower()],
-                            'domains': [','.join(reg_domains).lower()],
-                            'availability': [','.join(reg_availability).lower()],
-                            'aadhar_verified': [False],
-                            'aadhar_image': [aadhar_image_data],
-                            'status': ['active'],
-                            'join_date': [datetime.date.today().strftime('%Y-%m-%d')],
-                            'birthday': [reg_birthday.strftime('%Y-%m-%d')]
-                        })
+                            # Create new user
+                            new_user = pd.DataFrame({
+                                'user_id': [f"vol{str(uuid.uuid4())[:6]}"],
+                                'username': [reg_username],
+                                'password': [password_hash],
+                                'role': ['volunteer'],
+                                'name': [reg_name],
+                                'email': [reg_email],
+                                'phone': [reg_phone],
+                                'skills': [','.join(reg_skills).lower()],
+                                'domains': [','.join(reg_domains).lower()],
+                                'availability': [','.join(reg_availability).lower()],
+                                'aadhar_verified': [False],
+                                'aadhar_image': [aadhar_image_data],
+                                'status': ['active'],
+                                'join_date': [datetime.date.today().strftime('%Y-%m-%d')],
+                                'birthday': [reg_birthday.strftime('%Y-%m-%d')]
+                            })
                         
-                        users = pd.concat([users, new_user], ignore_index=True)
-                        users.to_csv('data/users.csv', index=False)
-                        st.success("Registration successful! You can now login.")
+                            storage.insert('users', new_user)
+                            st.success("Registration successful! You can now login.")
                 else:
                     st.warning("Please fill all required fields.")
 
@@ -235,40 +358,53 @@ def show_main_interface():
     users, tasks, events, attendance, ideas = load_data()
     
     # Get current user information
-    current_user = users[users['user_id'] == st.session_state.user_id].iloc[0]
+    current_user = indexes.user_index(users).row(st.session_state.user_id)
     
     # Sidebar navigation
     with st.sidebar:
         st.title(f"Welcome, {current_user['name']}")
         st.write(f"Role: {current_user['role'].capitalize()}")
         
+        # Kept up to date on every write, so this is a lookup rather than a scan
+        unread = notifications.inbox().unread(st.session_state.user_id)
+        if unread:
+            st.write(f"🔔 {unread} unread notification{'s' if unread != 1 else ''}")
+        
         if st.session_state.user_role == 'admin':
             selected = option_menu(
                 "Main Menu", 
-                ["Dashboard", "Members", "Tasks", "Events", "Aadhaar Verification", "Ideas", "Analytics", "Settings"],
-                icons=['house', 'people', 'list-task', 'calendar-event', 'card-checklist', 'lightbulb', 'graph-up', 'gear'],
+                ["Dashboard", "Notifications", "Members", "Tasks", "Events", "Check-in", "Aadhaar Verification", "Ideas", "Analytics", "Settings"],
+                icons=['house', 'bell', 'people', 'list-task', 'calendar-event', 'qr-code-scan', 'card-checklist', 'lightbulb', 'graph-up', 'gear'],
                 menu_icon="cast", 
                 default_index=0,
             )
         else:
             selected = option_menu(
                 "Main Menu", 
-                ["Dashboard", "My Profile", "My Tasks", "Events", "Submit Idea"],
-                icons=['house', 'person', 'list-task', 'calendar-event', 'lightbulb'],
+                ["Dashboard", "Notifications", "My Profile", "My Tasks", "Events", "Submit Idea"],
+                icons=['house', 'bell', 'person', 'list-task', 'calendar-event', 'lightbulb'],
                 menu_icon="cast", 
                 default_index=0,
             )
         
         st.session_state.active_tab = selected
         
+        search_query = st.text_input("🔍 Search", placeholder="Members, tasks, events, ideas").strip()
+        
         if st.button("Logout"):
             logout()
             st.rerun()
     
+    if search_query:
+        show_search_results(search_query, users, tasks, events, ideas)
+    
     # Main content
     if st.session_state.active_tab == "Dashboard":
         show_dashboard(users, tasks, events, ideas)
     
+    elif st.session_state.active_tab == "Notifications":
+        show_notifications()
+    
     elif st.session_state.active_tab == "Members" and st.session_state.user_role == 'admin':
         show_members(users)
     
@@ -284,6 +420,9 @@ def show_main_interface():
     elif st.session_state.active_tab == "Events":
         show_events(events, users, attendance)
     
+    elif st.session_state.active_tab == "Check-in" and st.session_state.user_role == 'admin':
+        show_checkin_kiosk(events, users, attendance)
+    
     elif st.session_state.active_tab == "Aadhaar Verification" and st.session_state.user_role == 'admin':
         show_aadhar_verification(users)
     
@@ -299,21 +438,76 @@ def show_main_interface():
     elif st.session_state.active_tab == "Settings":
         show_settings(current_user)
 
+SEARCH_LABELS = {'users': "👤 Member", 'tasks': "📋 Task", 'events': "📅 Event", 'ideas': "💡 Idea"}
+
+def show_search_results(query, users, tasks, events, ideas):
+    st.subheader(f"Search results for \"{query}\"")
+    if len(query) < search.MIN_SEARCH_LENGTH:
+        st.write(f"Type at least {search.MIN_SEARCH_LENGTH} characters to search.")
+        return
+    
+    if st.session_state.user_role == 'admin':
+        tables = {'users': users, 'tasks': tasks, 'events': events, 'ideas': ideas}
+        within = None
+    else:
+        # Volunteers search events and their own tasks and ideas
+        my_work = projections.my_work(st.session_state.user_id, tasks, events, ideas)
+        tables = {'tasks': tasks, 'events': events, 'ideas': ideas}
+        within = {'tasks': {t['task_id'] for t in my_work.tasks}, 'ideas': {i['idea_id'] for i in my_work.ideas}}
+    
+    hits = search.search(query, tables, limit=20, within=within)
+    if not hits:
+        st.write("No matches found.")
+    for hit in hits:
+        st.write(f"{SEARCH_LABELS[hit['table']]}: **{hit['title']}** ({hit['key']})")
+    st.markdown("---")
+
+NOTIFICATION_ICONS = {
+    notifications.TASK_ASSIGNED: "📋",
+    notifications.EVENT_INVITATION: "📅",
+    notifications.IDEA_STATUS: "💡",
+    notifications.TASK_OVERDUE: "⚠️",
+    notifications.REMINDER: "⏰",
+    notifications.BIRTHDAY: "🎂",
+}
+
+def show_notifications():
+    st.title("🔔 Notifications")
+    user_id = st.session_state.user_id
+    box = notifications.inbox()
+
+    if box.unread(user_id) and st.button("Mark all as read"):
+        notifications.mark_read(user_id)
+        st.rerun()
+
+    items = box.latest(user_id)
+    if not items:
+        st.write("No notifications yet.")
+    for item in items:
+        icon = NOTIFICATION_ICONS.get(item['kind'], "🔔")
+        sent = item['created_at'][:16].replace('T', ' ')
+        if item['read_at']:
+            st.write(f"{icon} {item['message']} ({sent})")
+        else:
+            st.write(f"{icon} **{item['message']}** ({sent})")
+
 def show_dashboard(users, tasks, events, ideas):
     st.title("📊 Dashboard")
+    user_lookup = indexes.user_index(users)
+    
+    # Counters, recent items and birthday buckets are maintained on every write
+    dashboard = stats.dashboard_stats(users, tasks, events, ideas)
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("Total Members", len(users))
+        st.metric("Total Members", dashboard.total_members)
     
     with col2:
-        active_tasks = len(tasks[tasks['status'] != 'completed'])
-        st.metric("Active Tasks", active_tasks)
+        st.metric("Active Tasks", dashboard.active_tasks)
     
     with col3:
-        upcoming_events = len(events[events['status'] == 'upcoming'])
-        st.metric("Upcoming Events", upcoming_events)
+        st.metric("Upcoming Events", dashboard.upcoming_events)
     
     # Different dashboard content based on role
     if st.session_state.user_role == 'admin':
@@ -337,39 +531,38 @@ def show_dashboard(users, tasks, events, ideas):
                 st.rerun()
         
         # Today's birthdays
-        today = datetime.date.today().strftime("%m-%d")
-        birthdays_today = users[users['birthday'].str[5:].str.replace('-', '') == today.replace('-', '')]
+        birthdays_today = dashboard.birthdays_on(datetime.date.today())
         
-        if not birthdays_today.empty:
+        if birthdays_today:
             st.subheader("🎂 Today's Birthdays")
-            for _, user in birthdays_today.iterrows():
-                st.info(f"🎉 It's {user['name']}'s birthday today!")
+            for name in birthdays_today:
+                st.info(f"🎉 It's {name}'s birthday today!")
         
         # Recent activities
         st.subheader("Recent Activities")
         
         # Recent tasks
-        recent_tasks = tasks.sort_values('created_date', ascending=False).head(3)
         st.write("Recent Tasks:")
-        for _, task in recent_tasks.iterrows():
-            st.write(f"- **{task['title']}** ({task['status']}) - Due: {task['due_date']}")
+        for task in dashboard.recent_tasks(3):
+            st.write(f"- **{task['title']}** ({task['status']}) - Due: {schema.format_date(task['due_date'])}")
         
         # Recent ideas
-        recent_ideas = ideas.sort_values('submission_date', ascending=False).head(3)
         st.write("Recent Ideas:")
-        for _, idea in recent_ideas.iterrows():
-            submitter = users[users['user_id'] == idea['submitted_by']]['name'].values[0]
+        for idea in dashboard.recent_ideas(3):
+            submitter = user_lookup.name(idea['submitted_by'])
             st.write(f"- **{idea['title']}** by {submitter} - Status: {idea['status']}")
     
     else:  # Volunteer dashboard
+        # Everything below comes from this volunteer's projection, not from the full tables
+        my_work = projections.my_work(st.session_state.user_id, tasks, events, ideas)
+        
         # My upcoming tasks
-        my_tasks = tasks[tasks['assigned_to'] == st.session_state.user_id]
-        upcoming_tasks = my_tasks[my_tasks['status'] != 'completed'].sort_values('due_date')
+        upcoming_tasks = my_work.open_tasks()
         
         st.subheader("My Upcoming Tasks")
-        if not upcoming_tasks.empty:
-            for _, task in upcoming_tasks.iterrows():
-                days_left = (datetime.datetime.strptime(task['due_date'], '%Y-%m-%d').date() - datetime.date.today()).days
+        if upcoming_tasks:
+            for task in upcoming_tasks:
+                days_left = (task['day'] - datetime.date.today()).days
                 if days_left < 0:
                     st.error(f"⚠️ **{task['title']}** - Overdue by {abs(days_left)} days")
                 elif days_left == 0:
@@ -380,27 +573,21 @@ def show_dashboard(users, tasks, events, ideas):
             st.write("You have no upcoming tasks.")
         
         # My upcoming events
-        my_events = []
-        for _, event in events.iterrows():
-            participants = str(event['participants']).split(',')
-            if st.session_state.user_id in participants:
-                my_events.append(event)
+        my_events = my_work.events
         
         if my_events:
             st.subheader("My Upcoming Events")
-            for event in my_events:
-                event_date = datetime.datetime.strptime(event['date'], '%Y-%m-%d').date()
-                if event_date >= datetime.date.today():
-                    st.info(f"📅 **{event['title']}** - {event['date']} at {event['time']}")
+            for event in my_work.upcoming_events():
+                st.info(f"📅 **{event['title']}** - {schema.format_date(event['date'])} at {event['time']}")
         else:
             st.subheader("My Upcoming Events")
             st.write("You have no upcoming events.")
         
         # My submitted ideas
-        my_ideas = ideas[ideas['submitted_by'] == st.session_state.user_id]
-        if not my_ideas.empty:
+        my_ideas = my_work.ideas
+        if my_ideas:
             st.subheader("My Ideas")
-            for _, idea in my_ideas.iterrows():
+            for idea in my_ideas:
                 st.write(f"- **{idea['title']}** - Status: {idea['status']}")
                 if idea['comments']:
                     st.write(f"  Comment: {idea['comments']}")
@@ -413,29 +600,70 @@ def show_members(users):
     with col1:
         status_filter = st.selectbox("Filter by Status", ["All", "Active", "Inactive"])
     with col2:
-        domain_filter = st.selectbox("Filter by Domain", ["All"] + sorted(list(set(",".join(users['domains'].fillna("")).split(",")))))
+        domain_filter = st.selectbox("Filter by Domain", ["All"] + indexes.user_domains(users).values())
     with col3:
         search_term = st.text_input("Search by Name or Email")
     
-    # Apply filters
-    filtered_users = users.copy()
+    # Apply filters (domain first: it is an index lookup that narrows the rest)
+    if domain_filter != "All" and domain_filter:
+        filtered_users = indexes.user_domains(users).rows(domain_filter)
+    else:
+        filtered_users = users
     
     if status_filter != "All":
         filtered_users = filtered_users[filtered_users['status'].str.lower() == status_filter.lower()]
     
-    if domain_filter != "All" and domain_filter:
-        filtered_users = filtered_users[filtered_users['domains'].str.contains(domain_filter.lower(), na=False)]
-    
-    if search_term:
+    if len(search_term) >= search.MIN_SEARCH_LENGTH:
+        # Trigram index lookup instead of scanning every name and email
+        matches = search.index('users', users).keys_matching(search_term, ['name', 'email'])
+        filtered_users = filtered_users[filtered_users['user_id'].astype(str).isin(matches)]
+    elif search_term:
+        # Too short for the index: one vectorised scan of the rows left after the filters
+        term = search_term.lower()
         filtered_users = filtered_users[
-            filtered_users['name'].str.contains(search_term, case=False, na=False) | 
-            filtered_users['email'].str.contains(search_term, case=False, na=False)
-        ]
+            filtered_users['name'].fillna('').astype(str).str.lower().str.contains(term, regex=False)
+            | filtered_users['email'].fillna('').astype(str).str.lower().str.contains(term, regex=False)]
     
     # Add new member button
     if st.button("Add New Member"):
         st.session_state.adding_member = True
     
+    # Bulk roster import / export
+    with st.expander("Bulk Import / Export"):
+        roster = st.file_uploader("Import volunteers (CSV or Parquet with username, password, name, email columns)",
+                                  type=["csv", "parquet"])
+        job = st.session_state.get('import_job')
+        if roster and (job is None or job.finished()) and st.button("Import Roster"):
+            # Large rosters take a few seconds, so the import carries on in the background
+            source = io.BytesIO(roster.getvalue())
+            source.name = roster.name
+            job = st.session_state.import_job = bulk_io.ImportJob(source, actor=st.session_state.user_id)
+        if job is not None and not job.finished():
+            if job.total:
+                st.progress(job.hashed / job.total, text=f"Importing: {job.hashed} of {job.total} passwords hashed")
+            else:
+                st.info("Reading the roster...")
+            st.button("Refresh", key="import_refresh")
+        elif job is not None:
+            if isinstance(job.error, (ValueError, RuntimeError)):
+                st.error(f"Import failed: {job.error}")
+            elif job.error is not None:
+                st.error(f"Import failed unexpectedly: {job.error!r}")
+            else:
+                st.success(f"Imported {job.report['imported']} members, skipped {job.report['skipped']} rows.")
+                for row_number, reason in job.report['errors'][:20]:
+                    st.write(f"- Row {row_number}: {reason}")
+        
+        export_format = st.selectbox("Export format", ["csv", "parquet"])
+        export_buffer = io.BytesIO()
+        if st.button("Prepare Export"):
+            try:
+                bulk_io.export_table('users', export_buffer, fmt=export_format)
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                st.download_button("Download Members", export_buffer.getvalue(), file_name=f"members.{export_format}")
+    
     # Add new member form
     if 'adding_member' in st.session_state and st.session_state.adding_member:
         st.subheader("Add New Member")
@@ -463,32 +691,36 @@ def show_members(users):
             submitted = st.form_submit_button("Save Member")
             if submitted:
                 if name and email and username and password:
-                    if username in users['username'].values:
+                    if indexes.user_index(users).has_username(username):
                         st.error("Username already exists. Please choose another.")
                     else:
-                        new_user = pd.DataFrame({
-                            'user_id': [f"{role[:3]}{str(uuid.uuid4())[:6]}"],
-                            'username': [username],
-                            'password': [hashlib.sha256(password.encode()).hexdigest()],
-                            'role': [role],
-                            'name': [name],
-                            'email': [email],
-                            'phone': [phone],
-                            'skills': [','.join(skills).lower()],
-                            'domains': [','.join(domains).lower()],
-                            'availability': [','.join(availability).lower()],
-                            'aadhar_verified': [False],
-                            'aadhar_image': [''],
-                            'status': ['active'],
-                            'join_date': [datetime.date.today().strftime('%Y-%m-%d')],
-                            'birthday': [birthday.strftime('%Y-%m-%d')]
-                        })
+                        try:
+                            password_hash = auth.hash_password(password)
+                        except auth.LoginThrottled as e:
+                            st.error(f"The server is busy. Please try again in {e.retry_after} seconds.")
+                        else:
+                            new_user = pd.DataFrame({
+                                'user_id': [f"{role[:3]}{str(uuid.uuid4())[:6]}"],
+                                'username': [username],
+                                'password': [password_hash],
+                                'role': [role],
+                                'name': [name],
+                                'email': [email],
+                                'phone': [phone],
+                                'skills': [','.join(skills).lower()],
+                                'domains': [','.join(domains).lower()],
+                                'availability': [','.join(availability).lower()],
+                                'aadhar_verified': [False],
+                                'aadhar_image': [''],
+                                'status': ['active'],
+                                'join_date': [datetime.date.today().strftime('%Y-%m-%d')],
+                                'birthday': [birthday.strftime('%Y-%m-%d')]
+                            })
                         
-                        all_users = pd.concat([users, new_user], ignore_index=True)
-                        all_users.to_csv('data/users.csv', index=False)
-                        st.success("Member added successfully!")
-                        st.session_state.adding_member = False
-                        st.rerun()
+                            storage.insert('users', new_user)
+                            st.success("Member added successfully!")
+                            st.session_state.adding_member = False
+                            st.rerun()
                 else:
                     st.warning("Please fill all required fields.")
         
@@ -501,14 +733,18 @@ def show_members(users):
     if filtered_users.empty:
         st.write("No members found matching the criteria.")
     else:
-        for i, user in filtered_users.iterrows():
+        page_users = paginate(filtered_users, "members", (status_filter, domain_filter, search_term))
+        for _, user in page_users.iterrows():
+            # Widgets and edit state are keyed on the id: row labels shift when rows are added or removed
+            i = user['user_id']
+            user_version = seen_version('users', user)
             with st.expander(f"{user['name']} - {user['role'].capitalize()} ({user['status'].capitalize()})"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.write(f"**Email:** {user['email']}")
                     st.write(f"**Phone:** {user['phone']}")
-                    st.write(f"**Join Date:** {user['join_date']}")
+                    st.write(f"**Join Date:** {schema.format_date(user['join_date'])}")
                     skills = user['skills'].split(',') if pd.notna(user['skills']) else []
                     st.write(f"**Skills:** {', '.join([s.capitalize() for s in skills])}")
                 
@@ -518,7 +754,7 @@ def show_members(users):
                     availability = user['availability'].split(',') if pd.notna(user['availability']) else []
                     st.write(f"**Availability:** {', '.join([a.capitalize() for a in availability])}")
                     st.write(f"**Aadhaar Verified:** {'Yes' if user['aadhar_verified'] else 'No'}")
-                    st.write(f"**Birthday:** {user['birthday']}")
+                    st.write(f"**Birthday:** {schema.format_date(user['birthday'])}")
                 
                 # Actions
                 action_col1, action_col2, action_col3 = st.columns(3)
@@ -526,23 +762,20 @@ def show_members(users):
                 with action_col1:
                     new_status = "Inactive" if user['status'].lower() == "active" else "Active"
                     if st.button(f"Mark {new_status}", key=f"status_{i}"):
-                        users.at[i, 'status'] = new_status.lower()
-                        users.to_csv('data/users.csv', index=False)
-                        st.success(f"User marked as {new_status}")
-                        st.rerun()
+                        if save_row('users', user, {'status': new_status.lower()}, user_version):
+                            st.success(f"User marked as {new_status}")
+                            st.rerun()
                 
                 with action_col2:
                     if st.button("Edit User", key=f"edit_{i}"):
                         st.session_state.editing_user = i
-                        st.session_state.editing_user_id = user['user_id']
                 
                 with action_col3:
                     if st.button("Delete User", key=f"delete_{i}"):
                         if st.session_state.user_id != user['user_id']:  # Prevent self-deletion
-                            users = users.drop(i)
-                            users.to_csv('data/users.csv', index=False)
-                            st.success("User deleted successfully!")
-                            st.rerun()
+                            if delete_row('users', user, user_version):
+                                st.success("User deleted successfully!")
+                                st.rerun()
                         else:
                             st.error("You cannot delete your own account!")
                 
@@ -575,24 +808,24 @@ def show_members(users):
                             default=[a.capitalize() for a in current_availability]
                         )
                         
-                        edit_birthday = st.date_input("Birthday", datetime.datetime.strptime(user['birthday'], '%Y-%m-%d').date())
+                        edit_birthday = st.date_input("Birthday", schema.to_date(user['birthday'], datetime.date(2000, 1, 1)))
                         edit_role = st.selectbox("Role", ["volunteer", "admin"], index=0 if user['role'] == "volunteer" else 1)
                         
                         update_submitted = st.form_submit_button("Update User")
                         if update_submitted:
-                            users.at[i, 'name'] = edit_name
-                            users.at[i, 'email'] = edit_email
-                            users.at[i, 'phone'] = edit_phone
-                            users.at[i, 'skills'] = ','.join([s.lower() for s in edit_skills])
-                            users.at[i, 'domains'] = ','.join([d.lower() for d in edit_domains])
-                            users.at[i, 'availability'] = ','.join([a.lower() for a in edit_availability])
-                            users.at[i, 'birthday'] = edit_birthday.strftime('%Y-%m-%d')
-                            users.at[i, 'role'] = edit_role
-                            
-                            users.to_csv('data/users.csv', index=False)
-                            st.success("User updated successfully!")
-                            st.session_state.editing_user = None
-                            st.rerun()
+                            if save_row('users', user, {
+                                'name': edit_name,
+                                'email': edit_email,
+                                'phone': edit_phone,
+                                'skills': ','.join([s.lower() for s in edit_skills]),
+                                'domains': ','.join([d.lower() for d in edit_domains]),
+                                'availability': ','.join([a.lower() for a in edit_availability]),
+                                'birthday': edit_birthday.strftime('%Y-%m-%d'),
+                                'role': edit_role
+                            }, user_version):
+                                st.success("User updated successfully!")
+                                st.session_state.editing_user = None
+                                st.rerun()
                     
                     if st.button("Cancel Editing"):
                         st.session_state.editing_user = None
@@ -600,6 +833,7 @@ def show_members(users):
 
 def show_profile(current_user):
     st.title("👤 My Profile")
+    profile_version = seen_version('users', current_user)
     
     col1, col2 = st.columns([1, 2])
     
@@ -607,7 +841,7 @@ def show_profile(current_user):
         # Display user avatar
         st.image("https://cdn.pixabay.com/photo/2015/10/05/22/37/blank-profile-picture-973460_960_720.png", width=150)
         st.write(f"**{current_user['name']}**")
-        st.write(f"Member since: {current_user['join_date']}")
+        st.write(f"Member since: {schema.format_date(current_user['join_date'])}")
         
         # Verification badge
         if current_user['aadhar_verified']:
@@ -619,7 +853,7 @@ def show_profile(current_user):
         st.subheader("Personal Information")
         st.write(f"**Email:** {current_user['email']}")
         st.write(f"**Phone:** {current_user['phone']}")
-        st.write(f"**Birthday:** {current_user['birthday']}")
+        st.write(f"**Birthday:** {schema.format_date(current_user['birthday'])}")
         
         # Skills and domains
         st.subheader("Skills & Interests")
@@ -671,29 +905,31 @@ def show_profile(current_user):
         update_submitted = st.form_submit_button("Update Profile")
         
         if update_submitted:
-            users, _, _, _, _ = load_data()
-            idx = users.index[users['user_id'] == current_user['user_id']].tolist()[0]
-            
-            users.at[idx, 'name'] = update_name
-            users.at[idx, 'email'] = update_email
-            users.at[idx, 'phone'] = update_phone
-            users.at[idx, 'skills'] = ','.join([s.lower() for s in update_skills])
-            users.at[idx, 'domains'] = ','.join([d.lower() for d in update_domains])
-            users.at[idx, 'availability'] = ','.join([a.lower() for a in update_availability])
-            
-            if update_password:
-                users.at[idx, 'password'] = hashlib.sha256(update_password.encode()).hexdigest()
+            changes = {
+                'name': update_name,
+                'email': update_email,
+                'phone': update_phone,
+                'skills': ','.join([s.lower() for s in update_skills]),
+                'domains': ','.join([d.lower() for d in update_domains]),
+                'availability': ','.join([a.lower() for a in update_availability])
+            }
             
-            if aadhar_upload:
-                file_bytes = aadhar_upload.getvalue()
-                users.at[idx, 'aadhar_image'] = base64.b64encode(file_bytes).decode()
-            
-            users.to_csv('data/users.csv', index=False)
-            st.success("Profile updated successfully!")
-            st.rerun()
+            try:
+                if update_password:
+                    changes['password'] = auth.hash_password(update_password)
+            except auth.LoginThrottled as e:
+                st.error(f"The server is busy. Please try again in {e.retry_after} seconds.")
+            else:
+                if aadhar_upload:
+                    changes['aadhar_image'] = blobstore.put_stream(aadhar_upload)
+                
+                if save_row('users', current_user, changes, profile_version):
+                    st.success("Profile updated successfully!")
+                    st.rerun()
 
 def show_tasks_admin(tasks, users):
     st.title("📋 Task Management")
+    user_lookup = indexes.user_index(users)
     
     # Task filters
     col1, col2, col3 = st.columns(3)
@@ -723,6 +959,25 @@ def show_tasks_admin(tasks, users):
     if st.button("Create New Task"):
         st.session_state.creating_task = True
     
+    # Assign the whole unassigned backlog in one pass
+    if st.button("Auto-assign All Unassigned"):
+        plan = matching.assign_unassigned(users, tasks)
+        backlog_size = int((tasks['status'].astype(str).str.lower() == 'unassigned').sum())
+        if plan.empty:
+            st.warning("No unassigned tasks could be matched to an available volunteer.")
+        else:
+            try:
+                matching.commit_assignments(plan)
+            except storage.ConflictError:
+                st.error("Some of these tasks were changed by someone else while assigning. Nothing was assigned; please try again.")
+            else:
+                titles = dict(zip(tasks['task_id'].astype(str), tasks['title']))
+                notifications.notify_each(notifications.TASK_ASSIGNED, (
+                    (user_id, f"You have been assigned the task \"{titles.get(str(task_id), task_id)}\".")
+                    for task_id, user_id in zip(plan['task_id'], plan['user_id'])))
+                st.success(f"Assigned {len(plan)} of {backlog_size} unassigned tasks.")
+                st.rerun()
+    
     # Create new task form
     if 'creating_task' in st.session_state and st.session_state.creating_task:
         st.subheader("Create New Task")
@@ -754,7 +1009,7 @@ def show_tasks_admin(tasks, users):
                 if task_title and task_description:
                     # Implement smart matching if selected
                     if assignment_method == "Smart Match":
-                        volunteer_id = smart_match_volunteer(users, task_domain, task_priority)
+                        volunteer_id = matching.smart_match_volunteer(users, tasks, task_domain, task_priority)
                     
                     # Create new task
                     new_task = pd.DataFrame({
@@ -767,11 +1022,15 @@ def show_tasks_admin(tasks, users):
                         'domain': [task_domain.lower()],
                         'priority': [task_priority.lower()],
                         'created_by': [st.session_state.user_id],
-                        'created_date': [datetime.date.today().strftime('%Y-%m-%d')]
+                        'created_date': [datetime.date.today().strftime('%Y-%m-%d')],
+                        'completed_date': [''],
+                        'flagged_overdue': ['']
                     })
                     
-                    all_tasks = pd.concat([tasks, new_task], ignore_index=True)
-                    all_tasks.to_csv('data/tasks.csv', index=False)
+                    storage.insert('tasks', new_task)
+                    if volunteer_id:
+                        notifications.notify([volunteer_id], notifications.TASK_ASSIGNED,
+                                             f"You have been assigned the task \"{task_title}\".")
                     st.success("Task created successfully!")
                     st.session_state.creating_task = False
                     st.rerun()
@@ -789,9 +1048,13 @@ def show_tasks_admin(tasks, users):
     else:
         # Sort tasks by due date (ascending) and priority (high to low)
         filtered_tasks = filtered_tasks.sort_values(['due_date', 'priority'], 
-                                                  ascending=[True, False])
+                                                  ascending=[True, False], kind='stable')
         
-        for i, task in filtered_tasks.iterrows():
+        page_tasks = paginate(filtered_tasks, "tasks_admin", (status_filter, domain_filter, priority_filter))
+        for _, task in page_tasks.iterrows():
+            # Widgets and edit state are keyed on the id: row labels shift when rows are added or removed
+            i = task['task_id']
+            task_version = seen_version('tasks', task)
             task_color = ""
             if task['priority'] == 'high':
                 task_color = "🔴"
@@ -812,19 +1075,15 @@ def show_tasks_admin(tasks, users):
                     st.write(f"**Priority:** {task['priority'].capitalize()}")
                 
                 with col2:
-                    st.write(f"**Due Date:** {task['due_date']}")
+                    st.write(f"**Due Date:** {schema.format_date(task['due_date'])}")
                     
                     # Show assignee name if assigned
                     if task['assigned_to']:
-                        assignee = users[users['user_id'] == task['assigned_to']]
-                        if not assignee.empty:
-                            st.write(f"**Assigned to:** {assignee.iloc[0]['name']}")
-                        else:
-                            st.write("**Assigned to:** Unknown User")
+                        st.write(f"**Assigned to:** {user_lookup.name(task['assigned_to'])}")
                     else:
                         st.write("**Assigned to:** Unassigned")
                     
-                    st.write(f"**Created On:** {task['created_date']}")
+                    st.write(f"**Created On:** {schema.format_date(task['created_date'])}")
                 
                 # Task actions
                 action_col1, action_col2, action_col3 = st.columns(3)
@@ -832,7 +1091,6 @@ def show_tasks_admin(tasks, users):
                 with action_col1:
                     if st.button("Reassign Task", key=f"reassign_{i}"):
                         st.session_state.reassigning_task = i
-                        st.session_state.reassigning_task_id = task['task_id']
                 
                 with action_col2:
                     status_options = {
@@ -852,17 +1110,15 @@ def show_tasks_admin(tasks, users):
                             'completed': 'pending'
                         }
                         
-                        tasks.at[i, 'status'] = new_status_map.get(task['status'].lower(), task['status'])
-                        tasks.to_csv('data/tasks.csv', index=False)
-                        st.success(f"Task status updated to {new_status_map.get(task['status'].lower(), task['status']).capitalize()}")
-                        st.rerun()
+                        if save_row('tasks', task, task_status(new_status_map.get(task['status'].lower(), task['status'])), task_version):
+                            st.success(f"Task status updated to {new_status_map.get(task['status'].lower(), task['status']).capitalize()}")
+                            st.rerun()
                 
                 with action_col3:
                     if st.button("Delete Task", key=f"delete_task_{i}"):
-                        tasks = tasks.drop(i)
-                        tasks.to_csv('data/tasks.csv', index=False)
-                        st.success("Task deleted successfully!")
-                        st.rerun()
+                        if delete_row('tasks', task, task_version):
+                            st.success("Task deleted successfully!")
+                            st.rerun()
                 
                 # Display reassignment form if selected
                 if 'reassigning_task' in st.session_state and st.session_state.reassigning_task == i:
@@ -883,108 +1139,46 @@ def show_tasks_admin(tasks, users):
                         
                         reassign_submitted = st.form_submit_button("Reassign")
                         if reassign_submitted:
-                            tasks.at[i, 'assigned_to'] = selected_vol
+                            changes = {'assigned_to': selected_vol}
                             
                             # Update status if assigning from unassigned
                             if task['status'].lower() == 'unassigned' and selected_vol:
-                                tasks.at[i, 'status'] = 'pending'
+                                changes.update(task_status('pending'))
                             
                             # If removing assignment, set status to unassigned
                             if not selected_vol:
-                                tasks.at[i, 'status'] = 'unassigned'
+                                changes.update(task_status('unassigned'))
                                 
-                            tasks.to_csv('data/tasks.csv', index=False)
-                            st.success("Task reassigned successfully!")
-                            st.session_state.reassigning_task = None
-                            st.rerun()
+                            if save_row('tasks', task, changes, task_version):
+                                if selected_vol and selected_vol != task['assigned_to']:
+                                    notifications.notify([selected_vol], notifications.TASK_ASSIGNED,
+                                                         f"You have been assigned the task \"{task['title']}\".")
+                                st.success("Task reassigned successfully!")
+                                st.session_state.reassigning_task = None
+                                st.rerun()
                     
                     if st.button("Cancel Reassignment"):
                         st.session_state.reassigning_task = None
                         st.rerun()
 
-# Smart matching algorithm for task assignments
-def smart_match_volunteer(users, task_domain, task_priority):
-    volunteers = users[users['role'] == 'volunteer'].copy()
-    
-    if volunteers.empty:
-        return ""
-    
-    # Initialize scores
-    volunteers['score'] = 0
-    
-    # Score based on domain match
-    for i, volunteer in volunteers.iterrows():
-        domains = str(volunteer['domains']).split(',') if pd.notna(volunteer['domains']) else []
-        
-        # Domain match (highest weight)
-        if task_domain.lower() in domains:
-            volunteers.at[i, 'score'] += 10
-        
-        # Skills relevance
-        skills = str(volunteer['skills']).split(',') if pd.notna(volunteer['skills']) else []
-        relevant_skills = {
-            'technology': ['coding', 'design', 'teaching'],
-            'social media': ['social media', 'writing', 'design'],
-            'education': ['teaching', 'writing', 'leadership'],
-            'creative': ['design', 'writing', 'social media'],
-            'on-ground': ['leadership', 'event management'],
-            'management': ['leadership', 'event management', 'fundraising'],
-            'fundraising': ['fundraising', 'leadership', 'writing']
-        }
-        
-        domain_relevant_skills = relevant_skills.get(task_domain.lower(), [])
-        skill_matches = sum(1 for skill in skills if skill in domain_relevant_skills)
-        volunteers.at[i, 'score'] += skill_matches * 2
-        
-        # Availability (moderate weight)
-        # This is simplified, but could be expanded to check specific day availability
-        availability = str(volunteer['availability']).split(',') if pd.notna(volunteer['availability']) else []
-        if availability:
-            volunteers.at[i, 'score'] += 3
-        
-        # Current workload consideration
-        # In a real app, you'd check how many active tasks they have
-        # Here we'll just use a random proxy for demonstration
-        workload_penalty = np.random.randint(0, 5)  # Simulated current workload
-        volunteers.at[i, 'score'] -= workload_penalty
-        
-        # Status consideration
-        if volunteer['status'].lower() != 'active':
-            volunteers.at[i, 'score'] = -100  # Ensure inactive volunteers aren't selected
-        
-        # Verification boost
-        if volunteer['aadhar_verified']:
-            volunteers.at[i, 'score'] += 2
-    
-    # Sort by score and pick the best match
-    volunteers = volunteers.sort_values('score', ascending=False)
-    
-    if volunteers.empty or volunteers.iloc[0]['score'] <= 0:
-        return ""  # No suitable match
-    
-    return volunteers.iloc[0]['user_id']
-
 def show_tasks_volunteer(tasks):
     st.title("📋 My Tasks")
     
-    # Get my tasks
-    my_tasks = tasks[tasks['assigned_to'] == st.session_state.user_id].copy()
-    
     # Task filters
     status_filter = st.selectbox("Filter by Status", ["All", "Pending", "In Progress", "Completed"])
     
-    # Apply filters
-    if status_filter != "All":
-        my_tasks = my_tasks[my_tasks['status'].str.lower() == status_filter.lower()]
+    # Get my tasks from my projection, already sorted by due date and priority
+    my_work = projections.my_work(st.session_state.user_id, tasks)
+    my_tasks = pd.DataFrame(my_work.tasks_with_status(None if status_filter == "All" else status_filter))
     
     # Display tasks
     if my_tasks.empty:
         st.write("You have no tasks matching the criteria.")
     else:
-        # Sort tasks by due date and priority
-        my_tasks = my_tasks.sort_values(['due_date', 'priority'], ascending=[True, False])
-        
-        for i, task in my_tasks.iterrows():
+        page_tasks = paginate(my_tasks, "tasks_volunteer", (status_filter,))
+        for _, task in page_tasks.iterrows():
+            i = task['task_id']
+            task_version = seen_version('tasks', task)
             task_color = ""
             if task['priority'] == 'high':
                 task_color = "🔴"
@@ -1000,11 +1194,10 @@ def show_tasks_volunteer(tasks):
                 st.write(f"**Description:** {task['description']}")
                 st.write(f"**Domain:** {task['domain'].capitalize()}")
                 st.write(f"**Priority:** {task['priority'].capitalize()}")
-                st.write(f"**Due Date:** {task['due_date']}")
+                st.write(f"**Due Date:** {schema.format_date(task['due_date'])}")
                 
                 # Days remaining calculation
-                due_date = datetime.datetime.strptime(task['due_date'], '%Y-%m-%d').date()
-                days_remaining = (due_date - datetime.date.today()).days
+                days_remaining = (task['day'] - datetime.date.today()).days
                 
                 if days_remaining < 0:
                     st.error(f"⚠️ Overdue by {abs(days_remaining)} days")
@@ -1028,17 +1221,14 @@ def show_tasks_volunteer(tasks):
                             'in progress': 'completed'
                         }
                         
-                        # Update the tasks DataFrame
-                        all_tasks, _, _, _, _ = load_data()
-                        idx = all_tasks.index[all_tasks['task_id'] == task['task_id']].tolist()[0]
-                        all_tasks.at[idx, 'status'] = new_status_map.get(task['status'].lower(), task['status'])
-                        all_tasks.to_csv('data/tasks.csv', index=False)
-                        
-                        st.success(f"Task status updated to {new_status_map.get(task['status'].lower(), task['status']).capitalize()}")
-                        st.rerun()
+                        # Update the task row
+                        if save_row('tasks', task, task_status(new_status_map.get(task['status'].lower(), task['status'])), task_version):
+                            st.success(f"Task status updated to {new_status_map.get(task['status'].lower(), task['status']).capitalize()}")
+                            st.rerun()
 
 def show_events(events, users, attendance):
     st.title("📅 Events")
+    user_lookup = indexes.user_index(users)
     
     is_admin = st.session_state.user_role == 'admin'
     
@@ -1092,8 +1282,7 @@ def show_events(events, users, attendance):
                         'created_date': [datetime.date.today().strftime('%Y-%m-%d')]
                     })
                     
-                    all_events = pd.concat([events, new_event], ignore_index=True)
-                    all_events.to_csv('data/events.csv', index=False)
+                    storage.insert('events', new_event)
                     
                     # Create attendance records for participants
                     if selected_participants:
@@ -1110,9 +1299,10 @@ def show_events(events, users, attendance):
                             })
                         
                         if new_attendance_records:
-                            new_attendance_df = pd.DataFrame(new_attendance_records)
-                            all_attendance = pd.concat([attendance, new_attendance_df], ignore_index=True)
-                            all_attendance.to_csv('data/attendance.csv', index=False)
+                            storage.insert('attendance', new_attendance_records)
+                        
+                        notifications.notify(selected_participants, notifications.EVENT_INVITATION,
+                                             f"You're invited to \"{event_title}\" on {event_date.strftime('%Y-%m-%d')} at {event_location}.")
                     
                     st.success("Event created successfully!")
                     st.session_state.creating_event = False
@@ -1131,90 +1321,61 @@ def show_events(events, users, attendance):
     with col2:
         time_period = st.selectbox("Time Period", ["All", "This Week", "This Month", "Next Month"])
     
-    # Apply filters to events
-    filtered_events = events.copy()
+    # Apply filters to events. Both filters are date windows, so they are
+    # intersected and answered with one range slice of the sorted date index.
+    event_dates = indexes.date_index(events, 'date')
+    today = datetime.date.today()
+    windows = []
     
     # Status filter
-    if status_filter != "All":
-        if status_filter == "Past":
-            filtered_events = filtered_events[
-                pd.to_datetime(filtered_events['date']) < datetime.datetime.now()
-            ]
-        elif status_filter == "Upcoming":
-            filtered_events = filtered_events[
-                pd.to_datetime(filtered_events['date']) > datetime.datetime.now()
-            ]
-        elif status_filter == "Ongoing":
-            today = datetime.date.today().strftime('%Y-%m-%d')
-            filtered_events = filtered_events[filtered_events['date'] == today]
+    if status_filter == "Past":
+        windows.append((None, today))
+    elif status_filter == "Upcoming":
+        windows.append((today + datetime.timedelta(days=1), None))
+    elif status_filter == "Ongoing":
+        windows.append((today, today))
     
     # Time period filter
-    if time_period != "All":
-        today = datetime.date.today()
-        if time_period == "This Week":
-            start_of_week = today - datetime.timedelta(days=today.weekday())
-            end_of_week = start_of_week + datetime.timedelta(days=6)
-            filtered_events = filtered_events[
-                (pd.to_datetime(filtered_events['date']) >= start_of_week) & 
-                (pd.to_datetime(filtered_events['date']) <= end_of_week)
-            ]
-        elif time_period == "This Month":
-            start_of_month = datetime.date(today.year, today.month, 1)
-            if today.month == 12:
-                end_of_month = datetime.date(today.year+1, 1, 1) - datetime.timedelta(days=1)
-            else:
-                end_of_month = datetime.date(today.year, today.month+1, 1) - datetime.timedelta(days=1)
-            
-            filtered_events = filtered_events[
-                (pd.to_datetime(filtered_events['date']) >= start_of_month) & 
-                (pd.to_datetime(filtered_events['date']) <= end_of_month)
-            ]
-        elif time_period == "Next Month":
-            if today.month == 12:
-                start_of_next_month = datetime.date(today.year+1, 1, 1)
-                end_of_next_month = datetime.date(today.year+1, 2, 1) - datetime.timedelta(days=1)
-            else:
-                start_of_next_month = datetime.date(today.year, today.month+1, 1)
-                if today.month == 11:
-                    end_of_next_month = datetime.date(today.year+1, 1, 1) - datetime.timedelta(days=1)
-                else:
-                    end_of_next_month = datetime.date(today.year, today.month+2, 1) - datetime.timedelta(days=1)
-            
-            filtered_events = filtered_events[
-                (pd.to_datetime(filtered_events['date']) >= start_of_next_month) & 
-                (pd.to_datetime(filtered_events['date']) <= end_of_next_month)
-            ]
+    if time_period == "This Week":
+        start_of_week = today - datetime.timedelta(days=today.weekday())
+        windows.append((start_of_week, start_of_week + datetime.timedelta(days=6)))
+    elif time_period == "This Month":
+        start_of_month = datetime.date(today.year, today.month, 1)
+        start_of_next_month = (start_of_month + datetime.timedelta(days=32)).replace(day=1)
+        windows.append((start_of_month, start_of_next_month - datetime.timedelta(days=1)))
+    elif time_period == "Next Month":
+        start_of_next_month = (datetime.date(today.year, today.month, 1) + datetime.timedelta(days=32)).replace(day=1)
+        start_of_month_after = (start_of_next_month + datetime.timedelta(days=32)).replace(day=1)
+        windows.append((start_of_next_month, start_of_month_after - datetime.timedelta(days=1)))
+    
+    starts = [start for start, _ in windows if start is not None]
+    ends = [end for _, end in windows if end is not None]
+    # Rows come back sorted by date
+    filtered_events = event_dates.rows_between(max(starts) if starts else None, min(ends) if ends else None)
     
     # For volunteers, only show events they're part of or all upcoming events
     if not is_admin:
         # Get events where volunteer is a participant
-        my_event_ids = []
-        for _, event in events.iterrows():
-            participants = str(event['participants']).split(',') if pd.notna(event['participants']) else []
-            if st.session_state.user_id in participants or event['coordinator'] == st.session_state.user_id:
-                my_event_ids.append(event['event_id'])
+        my_event_ids = (indexes.event_participants(events).keys(st.session_state.user_id) +
+                        indexes.event_coordinators(events).keys(st.session_state.user_id))
         
         # Filter to only show user's events and upcoming events
-        user_events = filtered_events[filtered_events['event_id'].isin(my_event_ids)]
-        upcoming_events = filtered_events[
-            (pd.to_datetime(filtered_events['date']) >= datetime.datetime.now()) & 
-            (filtered_events['status'] == 'upcoming')
-        ]
-        
-        filtered_events = pd.concat([user_events, upcoming_events]).drop_duplicates()
-    
-    # Sort events by date
-    filtered_events = filtered_events.sort_values('date')
+        is_mine = filtered_events['event_id'].isin(my_event_ids)
+        is_upcoming = (event_dates.column(filtered_events) > np.datetime64(today, 'D')) & (filtered_events['status'] == 'upcoming').to_numpy()
+        filtered_events = filtered_events[is_mine.to_numpy() | is_upcoming]
     
     # Display events
     st.subheader("Events")
     if filtered_events.empty:
         st.write("No events found matching the criteria.")
     else:
-        for i, event in filtered_events.iterrows():
+        page_events = paginate(filtered_events, "events", (status_filter, time_period))
+        for label, event in page_events.iterrows():
+            # Widgets and edit state are keyed on the id: row labels shift when rows are added or removed
+            i = event['event_id']
+            event_version = seen_version('events', event)
             # Format event title with date
-            event_date = datetime.datetime.strptime(event['date'], '%Y-%m-%d').date()
-            today = datetime.date.today()
+            event_date = event_dates.date_of(label)
             
             if event_date < today:
                 status_emoji = "✅"  # Past event
@@ -1223,28 +1384,26 @@ def show_events(events, users, attendance):
             else:
                 status_emoji = "📅"  # Upcoming event
             
-            title_text = f"{status_emoji} {event['title']} - {event['date']}"
+            title_text = f"{status_emoji} {event['title']} - {schema.format_date(event['date'])}"
             
             with st.expander(title_text):
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.write(f"**Description:** {event['description']}")
-                    st.write(f"**Date & Time:** {event['date']} at {event['time']}")
+                    st.write(f"**Date & Time:** {schema.format_date(event['date'])} at {event['time']}")
                     st.write(f"**Location:** {event['location']}")
                 
                 with col2:
                     # Show coordinator
-                    coordinator = users[users['user_id'] == event['coordinator']]
-                    if not coordinator.empty:
-                        st.write(f"**Coordinator:** {coordinator.iloc[0]['name']}")
+                    if event['coordinator'] in user_lookup:
+                        st.write(f"**Coordinator:** {user_lookup.name(event['coordinator'])}")
                     
                     # Show participants count
                     participants = str(event['participants']).split(',') if pd.notna(event['participants']) and event['participants'] else []
                     st.write(f"**Participants:** {len(participants)} volunteers")
                     
                     # Show days until event
-                    event_date = datetime.datetime.strptime(event['date'], '%Y-%m-%d').date()
                     days_until = (event_date - today).days
                     
                     if days_until < 0:
@@ -1253,6 +1412,11 @@ def show_events(events, users, attendance):
                         st.write("**Status:** Today!")
                     else:
                         st.write(f"**Status:** {days_until} days to go")
+                    
+                    # The code a registered volunteer shows at the check-in kiosk
+                    record_id = None if is_admin else checkin.roster().registration(event['event_id'], st.session_state.user_id)
+                    if record_id:
+                        st.write(f"**Check-in Code:** `{checkin.token(record_id)}`")
                 
                 # Admin actions
                 if is_admin:
@@ -1261,7 +1425,6 @@ def show_events(events, users, attendance):
                     with action_col1:
                         if st.button("Manage Participants", key=f"manage_part_{i}"):
                             st.session_state.managing_participants = i
-                            st.session_state.managing_event_id = event['event_id']
                     
                     with action_col2:
                         status_options = {
@@ -1279,6 +1442,295 @@ def show_events(events, users, attendance):
                                 'cancelled': 'upcoming'
                             }
                             
-                            events.at[i, 'status'] = new_status_map.get(event['status'].lower(), event['status'])
-                            events.to_csv('data/events.csv', index=False)
-                            st.success(f"Event status updated to {new_status_map.get(event['status'].lower(), event['status']).capitalize()}")
\ No newline at end of file
+                            if save_row('events', event, {'status': new_status_map.get(event['status'].lower(), event['status'])}, event_version):
+                                st.success(f"Event status updated to {new_status_map.get(event['status'].lower(), event['status']).capitalize()}")
+
+def idea_vote_button(board, idea, key):
+    # Vote button for the current volunteer; one vote per idea, none on their own ideas
+    user_id = st.session_state.user_id
+    if idea['submitted_by'] == user_id:
+        st.caption("Your idea")
+    elif board.has_voted(idea['idea_id'], user_id):
+        st.caption("✅ Voted")
+    elif st.button("👍 Vote", key=key):
+        if votes.cast(idea['idea_id'], user_id):
+            st.success("Vote recorded!")
+        st.rerun()
+
+def show_ideas_admin(ideas, users):
+    st.title("💡 Ideas")
+    user_lookup = indexes.user_index(users)
+    
+    # Vote counts and the trending ranking are kept up to date as votes come in
+    board = votes.board()
+    idea_rows = dict(zip(ideas['idea_id'].astype(str), range(len(ideas))))
+    
+    st.subheader("🔥 Trending Ideas")
+    trending = board.trending(10, keep=lambda idea_id: idea_id in idea_rows)
+    if not trending:
+        st.write("No votes yet.")
+    for rank, (idea_id, vote_count, heat) in enumerate(trending, 1):
+        idea = ideas.iloc[idea_rows[idea_id]]
+        st.write(f"{rank}. **{idea['title']}** by {user_lookup.name(idea['submitted_by'])} - "
+                 f"{vote_count} votes ({heat} recent) - {idea['status'].capitalize()}")
+    
+    st.subheader("All Ideas")
+    col1, col2 = st.columns(2)
+    with col1:
+        status_filter = st.selectbox("Filter by Status", ["All", "Under Review", "Approved", "Rejected"])
+    with col2:
+        sort_by = st.selectbox("Sort by", ["Newest", "Most Votes"])
+    
+    filtered_ideas = ideas
+    if status_filter != "All":
+        filtered_ideas = filtered_ideas[filtered_ideas['status'].str.lower() == status_filter.lower()]
+    vote_counts = board.counts()
+    filtered_ideas = filtered_ideas.assign(votes=[vote_counts.get(i, 0) for i in filtered_ideas['idea_id'].astype(str)])
+    if sort_by == "Most Votes":
+        filtered_ideas = filtered_ideas.sort_values(['votes', 'submission_date'], ascending=False)
+    else:
+        filtered_ideas = filtered_ideas.sort_values('submission_date', ascending=False)
+    
+    if filtered_ideas.empty:
+        st.write("No ideas found matching the criteria.")
+        return
+    
+    statuses = ["under review", "approved", "rejected"]
+    for _, idea in paginate(filtered_ideas, "ideas_admin", (status_filter, sort_by)).iterrows():
+        idea_version = seen_version('ideas', idea)
+        with st.expander(f"{idea['title']} ({idea['status'].capitalize()}) - {idea['votes']} votes"):
+            st.write(f"**Description:** {idea['description']}")
+            st.write(f"**Submitted by:** {user_lookup.name(idea['submitted_by'])} on {schema.format_date(idea['submission_date'])}")
+            
+            with st.form(f"review_idea_{idea['idea_id']}"):
+                current_status = str(idea['status']).lower()
+                new_status = st.selectbox("Status", statuses, format_func=str.capitalize,
+                                          index=statuses.index(current_status) if current_status in statuses else 0)
+                comments = st.text_area("Comments", value=idea['comments'])
+                if st.form_submit_button("Save Review"):
+                    if save_row('ideas', idea, {'status': new_status, 'comments': comments}, idea_version):
+                        if new_status != current_status:
+                            notifications.notify([idea['submitted_by']], notifications.IDEA_STATUS,
+                                                 f"Your idea \"{idea['title']}\" is now {new_status}.")
+                        st.success("Review saved!")
+                        st.rerun()
+
+def show_submit_idea(ideas):
+    st.title("💡 Ideas")
+    user_id = st.session_state.user_id
+    
+    with st.form("submit_idea_form"):
+        st.subheader("Submit a New Idea")
+        idea_title = st.text_input("Idea Title")
+        idea_description = st.text_area("Description")
+        
+        if st.form_submit_button("Submit Idea"):
+            if idea_title and idea_description:
+                new_idea = pd.DataFrame({
+                    'idea_id': [f"idea{str(uuid.uuid4())[:6]}"],
+                    'title': [idea_title],
+                    'description': [idea_description],
+                    'submitted_by': [user_id],
+                    'status': ['under review'],
+                    'submission_date': [datetime.date.today().strftime('%Y-%m-%d')],
+                    'comments': ['']
+                })
+                storage.insert('ideas', new_idea)
+                st.success("Idea submitted successfully!")
+                st.rerun()
+            else:
+                st.warning("Please fill all required fields.")
+    
+    board = votes.board()
+    open_ideas = ideas[ideas['status'].str.lower() != 'rejected']
+    idea_rows = dict(zip(open_ideas['idea_id'].astype(str), range(len(open_ideas))))
+    
+    st.subheader("🔥 Trending Ideas")
+    trending = board.trending(10, keep=lambda idea_id: idea_id in idea_rows)
+    if not trending:
+        st.write("No votes yet. Be the first to vote!")
+    for rank, (idea_id, vote_count, _) in enumerate(trending, 1):
+        idea = open_ideas.iloc[idea_rows[idea_id]]
+        text_col, vote_col = st.columns([4, 1])
+        with text_col:
+            st.write(f"{rank}. **{idea['title']}** - {vote_count} votes")
+        with vote_col:
+            idea_vote_button(board, idea, f"vote_trending_{idea_id}")
+    
+    st.subheader("Vote on Ideas")
+    newest = open_ideas.sort_values('submission_date', ascending=False)
+    for _, idea in paginate(newest, "ideas_vote").iterrows():
+        text_col, vote_col = st.columns([4, 1])
+        with text_col:
+            st.write(f"**{idea['title']}** - {board.count(idea['idea_id'])} votes")
+            st.caption(idea['description'])
+        with vote_col:
+            idea_vote_button(board, idea, f"vote_{idea['idea_id']}")
+    
+    st.subheader("My Ideas")
+    my_ideas = ideas[ideas['submitted_by'] == user_id].sort_values('submission_date', ascending=False)
+    if my_ideas.empty:
+        st.write("You haven't submitted any ideas yet.")
+    for _, idea in my_ideas.iterrows():
+        with st.expander(f"{idea['title']} ({str(idea['status']).capitalize()}) - {board.count(idea['idea_id'])} votes"):
+            st.write(f"**Submitted on:** {schema.format_date(idea['submission_date'])}")
+            if idea['comments']:
+                st.write(f"**Comments:** {idea['comments']}")
+
+CHECKIN_MESSAGES = {
+    'checked_in': (st.success, "Welcome, {name}! Checked in."),
+    'checked_out': (st.success, "Goodbye, {name}! Checked out."),
+    'duplicate': (st.info, "{name} is already {mode}."),
+    'not_checked_in': (st.warning, "{name} has not checked in yet."),
+    'wrong_event': (st.error, "{name} is registered for a different event."),
+    'invalid': (st.error, "Code not recognised."),
+}
+
+def kiosk_scan(event_id, mode, users):
+    # Runs when the scanner submits a code; clears the box for the next scan
+    code = st.session_state.kiosk_code
+    st.session_state.kiosk_code = ""
+    if code.strip():
+        outcome, row = checkin.scan(code, mode, event_id)
+        name = indexes.user_index(users).name(row['user_id']) if row else ""
+        st.session_state.kiosk_result = (outcome, name, "checked in" if mode == checkin.CHECK_IN else "checked out")
+
+def show_checkin_kiosk(events, users, attendance):
+    st.title("🎫 Event Check-in")
+    
+    # Events from yesterday on, so events running past midnight can still check out
+    today = datetime.date.today()
+    current_events = indexes.date_index(events, 'date').rows_between(today - datetime.timedelta(days=1), None)
+    if current_events.empty:
+        st.info("No current or upcoming events.")
+        return
+    
+    event_options = {str(e['event_id']): f"{e['title']} - {schema.format_date(e['date'])}" for _, e in current_events.iterrows()}
+    event_id = st.selectbox("Event", list(event_options), format_func=event_options.get)
+    mode = st.radio("Mode", [checkin.CHECK_IN, checkin.CHECK_OUT],
+                    format_func=lambda m: "Check In" if m == checkin.CHECK_IN else "Check Out", horizontal=True)
+    
+    # Scanners type the code followed by Enter
+    st.text_input("Scan or type check-in code", key="kiosk_code", on_change=kiosk_scan, args=(event_id, mode, users))
+    
+    result = st.session_state.pop('kiosk_result', None)
+    if result:
+        outcome, name, done = result
+        show, message = CHECKIN_MESSAGES[outcome]
+        show(message.format(name=name or "Volunteer", mode=done))
+    
+    # Live from memory, including scans still waiting to be written
+    registered, checked_in, present = checkin.roster().headcount(event_id)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Registered", registered)
+    with col2:
+        st.metric("Checked In", checked_in)
+    with col3:
+        st.metric("Present Now", present)
+
+def show_aadhar_verification(users):
+    st.title("🪪 Aadhaar Verification")
+    user_lookup = indexes.user_index(users)
+    
+    # Pending users are tracked on every write; only the visible page is looked at
+    queue = verification.queue(users)
+    st.metric("Pending Verifications", len(queue))
+    
+    if not len(queue):
+        st.success("No members are waiting for verification.")
+        return
+    
+    user_ids = queue.user_ids()
+    page_ids = paginate(user_ids, "aadhar")
+    
+    # Thumbnails for this page are waited on briefly; the next page's are made in the background
+    next_start = (st.session_state.aadhar_page + 1) * PAGE_SIZE
+    verification.prefetch([queue.image(uid) for uid in user_ids[next_start:next_start + PAGE_SIZE]])
+    previews = verification.thumbnails([queue.image(uid) for uid in page_ids], timeout=0.5)
+    
+    for user_id in page_ids:
+        user = user_lookup.row(user_id)
+        if user is None:
+            continue
+        user_version = seen_version('users', user)
+        digest = queue.image(user_id)
+        
+        with st.container():
+            image_col, details_col, action_col = st.columns([2, 3, 1])
+            
+            with image_col:
+                if previews.get(digest):
+                    st.image(previews[digest])
+                elif not blobstore.has_blob(digest):
+                    st.warning("Uploaded file is missing.")
+                elif not verification.has_preview(digest):
+                    st.write("📄 No preview (PDF or unsupported file)")
+                else:
+                    st.write("⏳ Preparing preview...")
+            
+            with details_col:
+                st.write(f"**{user['name']}** ({user['username']})")
+                st.write(f"**Email:** {user['email']}")
+                st.write(f"**Phone:** {user['phone']}")
+                st.write(f"**Join Date:** {schema.format_date(user['join_date'])}")
+            
+            with action_col:
+                if st.button("Approve", key=f"approve_{user_id}"):
+                    if save_row('users', user, {'aadhar_verified': True}, user_version):
+                        st.success(f"{user['name']} verified.")
+                        st.rerun()
+                
+                if st.button("Reject", key=f"reject_{user_id}"):
+                    # Clearing the upload takes the member out of the queue until they upload again
+                    if save_row('users', user, {'aadhar_image': ''}, user_version):
+                        st.warning(f"Upload from {user['name']} rejected.")
+                        st.rerun()
+                
+                if st.button("Full Image", key=f"full_{user_id}"):
+                    st.session_state.viewing_aadhar = None if st.session_state.get('viewing_aadhar') == user_id else user_id
+            
+            # The full-resolution file is read only when asked for
+            if st.session_state.get('viewing_aadhar') == user_id and blobstore.has_blob(digest):
+                if not verification.has_preview(digest):
+                    st.download_button("Download File", blobstore.read_blob(digest), file_name=f"aadhaar_{user_id}",
+                                       key=f"download_{user_id}")
+                else:
+                    st.image(blobstore.read_blob(digest))
+            
+            st.markdown("---")
+
+def show_analytics(users, tasks, events, attendance, ideas):
+    st.title("📈 Analytics")
+    
+    # Rollups are kept up to date on every write; charts are redrawn only when they change
+    report = analytics.analytics(users, tasks, attendance)
+    
+    throughput_tab, latency_tab, attendance_tab, retention_tab = st.tabs(
+        ["Task Throughput", "Completion Time", "Event Attendance", "Volunteer Retention"])
+    
+    with throughput_tab:
+        period = st.radio("Period", ["week", "day"], format_func=lambda p: f"Per {p}", horizontal=True)
+        st.image(report.chart('throughput', period=period, last=26 if period == 'week' else 60))
+        st.dataframe(report.throughput(period).iloc[::-1], hide_index=True)
+    
+    with latency_tab:
+        latency = report.completion_latency()
+        if latency.empty:
+            st.info("No completed tasks yet.")
+        else:
+            st.image(report.chart('latency'))
+            st.dataframe(latency, hide_index=True)
+    
+    with attendance_tab:
+        rates = report.attendance_rates(dict(zip(events['event_id'].astype(str), events['title'])))
+        if rates.empty:
+            st.info("No attendance recorded yet.")
+        else:
+            st.image(report.chart('attendance'))
+            st.dataframe(rates, hide_index=True)
+    
+    with retention_tab:
+        st.write("Share of each month's new volunteers who completed a task n months after joining.")
+        st.image(report.chart('retention'))
+        st.dataframe(report.retention().style.format(precision=2, na_rep=''))
@@ -0,0 +1,247 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import indexes
+import storage
+
+# Skills that make a volunteer useful for each task domain
+RELEVANT_SKILLS = {
+    'technology': ['coding', 'design', 'teaching'],
+    'social media': ['social media', 'writing', 'design'],
+    'education': ['teaching', 'writing', 'leadership'],
+    'creative': ['design', 'writing', 'social media'],
+    'on-ground': ['leadership', 'event management'],
+    'management': ['leadership', 'event management', 'fundraising'],
+    'fundraising': ['fundraising', 'leadership', 'writing']
+}
+
+DOMAIN_WEIGHT = 10
+SKILL_WEIGHT = 2
+AVAILABILITY_WEIGHT = 3
+VERIFIED_WEIGHT = 2
+WORKLOAD_WEIGHT = 1  # per open task already assigned
+INACTIVE_SCORE = -100
+
+_lock = threading.RLock()
+_matrix = None
+_workload = None
+_aligned_workload = None
+
+
+def _truthy(column):
+    return column.astype(str).str.strip().str.lower().isin(['true', '1', 'yes'])
+
+
+def _one_hot(relation, user_ids, vocabulary):
+    # Volunteer x value 0/1 matrix from a relation's join table
+    matrix = np.zeros((len(user_ids), len(vocabulary)), dtype=np.int8)
+    if len(vocabulary):
+        pairs = relation.pairs
+        rows = pd.Index(user_ids).get_indexer(pairs.iloc[:, 0])
+        cols = pd.Index(vocabulary).get_indexer(pairs.iloc[:, 1])
+        keep = (rows >= 0) & (cols >= 0)
+        matrix[rows[keep], cols[keep]] = 1
+    return matrix
+
+
+class VolunteerMatrix:
+    # Per-volunteer features precomputed once per version of the users table
+
+    def __init__(self, users):
+        self.users = users
+        volunteers = users[users['role'] == 'volunteer']
+        self.user_ids = volunteers['user_id'].astype(str).to_numpy()
+        self.names = volunteers['name'].to_numpy()
+
+        skills = indexes.user_skills(users)
+        domains = indexes.user_domains(users)
+        self.skills = skills.values()
+        self.domains = domains.values()
+        self.skill_matrix = _one_hot(skills, self.user_ids, self.skills)
+        self.domain_matrix = _one_hot(domains, self.user_ids, self.domains)
+
+        available = indexes.user_availability(users).pairs['user_id'].unique()
+        self.base_score = (
+            AVAILABILITY_WEIGHT * pd.Index(self.user_ids).isin(available)
+            + VERIFIED_WEIGHT * _truthy(volunteers['aadhar_verified']).to_numpy()
+        ).astype(np.int32)
+        self.active = (volunteers['status'].astype(str).str.lower() == 'active').to_numpy()
+
+    def domain_scores(self, task_domain):
+        task_domain = task_domain.lower()
+        scores = self.base_score.copy()
+        if task_domain in self.domains:
+            scores += DOMAIN_WEIGHT * self.domain_matrix[:, self.domains.index(task_domain)]
+        relevant = [self.skills.index(s) for s in RELEVANT_SKILLS.get(task_domain, []) if s in self.skills]
+        if relevant:
+            scores += SKILL_WEIGHT * self.skill_matrix[:, relevant].sum(axis=1, dtype=np.int32)
+        return scores
+
+
+def volunteer_matrix(users):
+    global _matrix
+    with _lock:
+        if _matrix is None or _matrix.users is not users:
+            _matrix = VolunteerMatrix(users)
+        return _matrix
+
+
+def open_task_counts(tasks):
+    """Number of assigned, not yet completed tasks per user_id (cached per tasks version)."""
+    global _workload
+    with _lock:
+        if _workload is None or _workload[0] is not tasks:
+            open_tasks = tasks[(tasks['status'].astype(str).str.lower() != 'completed') & tasks['assigned_to'].notna()]
+            counts = open_tasks['assigned_to'].astype(str).value_counts()
+            _workload = (tasks, counts[counts.index != ''])
+        return _workload[1]
+
+
+def _workload_vector(matrix, tasks):
+    # Open task counts aligned with the matrix rows, cached per (users, tasks) version
+    global _aligned_workload
+    with _lock:
+        cached = _aligned_workload
+        if cached is None or cached[0] is not matrix or cached[1] is not tasks:
+            workload = open_task_counts(tasks).reindex(matrix.user_ids, fill_value=0).to_numpy()
+            cached = _aligned_workload = (matrix, tasks, workload)
+        return cached[2]
+
+
+def score_volunteers(users, tasks, task_domain):
+    matrix = volunteer_matrix(users)
+    workload = _workload_vector(matrix, tasks)
+    scores = matrix.domain_scores(task_domain) - WORKLOAD_WEIGHT * workload
+    return np.where(matrix.active, scores, INACTIVE_SCORE)
+
+
+def rank_volunteers(users, tasks, task_domain, top_k=5):
+    """Top-k volunteers for a task as a DataFrame of user_id, name and score, best first."""
+    matrix = volunteer_matrix(users)
+    scores = score_volunteers(users, tasks, task_domain)
+    k = min(top_k, len(scores))
+    if k == 0:
+        return pd.DataFrame({'user_id': [], 'name': [], 'score': []})
+    # Ties go to the volunteer listed first so the result is deterministic
+    order_key = scores.astype(np.int64) * len(scores) - np.arange(len(scores))
+    candidates = np.argpartition(-order_key, k - 1)[:k]
+    candidates = candidates[np.argsort(-order_key[candidates])]
+    return pd.DataFrame({
+        'user_id': matrix.user_ids[candidates],
+        'name': matrix.names[candidates],
+        'score': scores[candidates],
+    })
+
+
+def smart_match_volunteer(users, tasks, task_domain, task_priority):
+    ranked = rank_volunteers(users, tasks, task_domain, top_k=1)
+    if ranked.empty or ranked['score'].iloc[0] <= 0:
+        return ""  # No suitable match
+    return ranked['user_id'].iloc[0]
+
+
+# Batch assignment of the unassigned backlog
+
+MAX_OPEN_TASKS = 5  # per volunteer, counting tasks they already hold
+PRIORITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+PRIORITY_BONUS = {'high': 4, 'medium': 2, 'low': 0}
+MAX_ASSIGNMENT_CELLS = 20_000_000  # tasks x candidate slots handed to the exact solver
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional; fall back to the greedy pass
+    linear_sum_assignment = None
+
+
+def _greedy_assign(domain_scores, task_domains, load, eligible, capacity):
+    # Tasks arrive in priority order; each takes the best volunteer given the load so far
+    picks = np.full(len(task_domains), -1)
+    gains = np.zeros(len(task_domains), dtype=np.int64)
+    for t, domain in enumerate(task_domains):
+        scores = np.where(eligible & (load < capacity), domain_scores[domain] - WORKLOAD_WEIGHT * load, INACTIVE_SCORE)
+        best = int(np.argmax(scores))
+        if scores[best] > 0:
+            picks[t] = best
+            gains[t] = scores[best]
+            load[best] += 1
+    return picks, gains
+
+
+def _exact_assign(domain_scores, task_domains, task_bonus, load, eligible, capacity):
+    # Expand each volunteer into one slot per free unit of capacity; slot j costs j extra workload
+    free = np.where(eligible, np.clip(capacity - load, 0, None), 0)
+    slot_volunteer = np.repeat(np.arange(len(load)), free)
+    slot_rank = np.arange(len(slot_volunteer)) - np.repeat(np.cumsum(free) - free, free)
+    slot_penalty = WORKLOAD_WEIGHT * (load[slot_volunteer] + slot_rank)
+
+    # A domain's tasks can only ever use its len(tasks) best slots
+    n = len(task_domains)
+    candidates = set()
+    for domain in set(task_domains):
+        slot_scores = domain_scores[domain][slot_volunteer] - slot_penalty
+        top = min(n, len(slot_scores))
+        if top:
+            candidates.update(np.argpartition(-slot_scores, top - 1)[:top].tolist())
+    slots = np.array(sorted(candidates), dtype=np.int64)
+    if len(slots) == 0 or n * len(slots) > MAX_ASSIGNMENT_CELLS:
+        return None
+
+    scores = np.vstack([domain_scores[d][slot_volunteer[slots]] for d in task_domains]) - slot_penalty[slots]
+    gain = np.where(scores > 0, scores + task_bonus[:, None], 0)
+    rows, cols = linear_sum_assignment(gain, maximize=True)
+    picks = np.full(n, -1)
+    gains = np.zeros(n, dtype=np.int64)
+    matched = scores[rows, cols] > 0
+    picks[rows[matched]] = slot_volunteer[slots[cols[matched]]]
+    gains[rows[matched]] = scores[rows[matched], cols[matched]]
+    return picks, gains
+
+
+def assign_unassigned(users, tasks, capacity=MAX_OPEN_TASKS):
+    """Plan assignments for every unassigned task in one pass.
+
+    Returns a DataFrame of task_id, user_id, score and the task's version for the
+    tasks that found a volunteer with a positive score and spare capacity.
+    """
+    backlog = tasks[tasks['status'].astype(str).str.lower() == 'unassigned']
+    plan = pd.DataFrame({'task_id': [], 'user_id': [], 'score': [], 'version': []})
+    matrix = volunteer_matrix(users)
+    if backlog.empty or len(matrix.user_ids) == 0:
+        return plan
+
+    priorities = backlog['priority'].astype(str).str.lower()
+    backlog = backlog.assign(_order=priorities.map(PRIORITY_ORDER).fillna(len(PRIORITY_ORDER)))
+    backlog = backlog.sort_values(['_order', 'due_date'], kind='stable')
+    task_domains = backlog['domain'].astype(str).str.lower().tolist()
+    task_bonus = backlog['priority'].astype(str).str.lower().map(PRIORITY_BONUS).fillna(0).to_numpy(dtype=np.int64)
+
+    domain_scores = {d: matrix.domain_scores(d) for d in set(task_domains)}
+    load = _workload_vector(matrix, tasks).astype(np.int64).copy()
+    eligible = matrix.active.copy()
+
+    result = None
+    if linear_sum_assignment is not None:
+        result = _exact_assign(domain_scores, task_domains, task_bonus, load.copy(), eligible, capacity)
+    if result is None:
+        result = _greedy_assign(domain_scores, task_domains, load, eligible, capacity)
+    picks, gains = result
+
+    assigned = picks >= 0
+    return pd.DataFrame({
+        'task_id': backlog['task_id'].to_numpy()[assigned],
+        'user_id': matrix.user_ids[picks[assigned]],
+        'score': gains[assigned],
+        'version': (backlog[storage.VERSION_COLUMN].to_numpy()[assigned] if storage.VERSION_COLUMN in backlog
+                    else np.zeros(assigned.sum(), dtype=np.int64)),
+    })
+
+
+def commit_assignments(plan):
+    # All assignments go to the tasks log as a single transaction, which fails
+    # with storage.ConflictError if any of the tasks changed since the plan was made
+    storage.commit('tasks', [
+        storage.update_op(task_id, {'assigned_to': user_id, 'status': 'pending'}, version)
+        for task_id, user_id, version in zip(plan['task_id'], plan['user_id'], plan['version'])
+    ])
@@ -0,0 +1,345 @@
+"""Per-user notification inboxes and the e-mail digest outbox.
+
+A notification is a row of the notifications table. Sending one to many users
+writes them a batch per transaction, and unread counts are kept in memory from
+the commit log, so the sidebar badge is a dictionary lookup. Unread
+notifications not yet e-mailed are the outbox: a digest run sends each user one
+message listing theirs, through a pluggable transport.
+
+    python notifications.py digest --smtp-host localhost --smtp-port 1025
+    python notifications.py digest --print      # write the digests to stdout instead
+"""
+import os
+import sys
+import uuid
+import smtplib
+import argparse
+import datetime
+import itertools
+import threading
+from collections import Counter
+from email.message import EmailMessage
+
+import pandas as pd
+
+import schema
+import storage
+import indexes
+import table_cache
+
+TABLE = 'notifications'
+COLUMNS = [c for c in schema.SCHEMAS[TABLE] if c != storage.VERSION_COLUMN]
+
+TASK_ASSIGNED = 'task_assigned'
+EVENT_INVITATION = 'event_invitation'
+IDEA_STATUS = 'idea_status'
+TASK_OVERDUE = 'task_overdue'
+REMINDER = 'reminder'
+BIRTHDAY = 'birthday'
+
+# Recipients written per transaction: a fan-out to thousands of users is a few
+# log appends, none of them large enough to force an early checkpoint
+FANOUT_BATCH = 2000
+DIGEST_ITEMS = 20  # listed in one e-mail; the rest are counted
+KEEP_READ_DAYS = 90  # read notifications older than this are deleted (see purge_read)
+
+MAIL_FROM = os.environ.get('NGO_MAIL_FROM', 'no-reply@ngo.org')
+
+_lock = threading.RLock()
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class Inbox(table_cache.DerivedView):
+    # Every user's notifications with unread counts and the outbox, kept up to
+    # date from the commit log
+
+    def __init__(self):
+        super().__init__()
+        self.rows = {}  # notification_id -> {'user_id', 'kind', 'message', 'created_at', 'read_at', 'emailed_at'}
+        self.by_user = {}  # user_id -> {notification_id: None}, oldest first
+        self.unread_counts = Counter()
+        self.outbox = {}  # user_id -> {notification_id: None} unread and not yet e-mailed
+
+    def _count(self, key, row):
+        user_id = row['user_id']
+        if not row['read_at']:
+            self.unread_counts[user_id] += 1
+            if not row['emailed_at']:
+                self.outbox.setdefault(user_id, {})[key] = None
+
+    def _uncount(self, key, row):
+        user_id = row['user_id']
+        if not row['read_at']:
+            self.unread_counts[user_id] -= 1
+            if not self.unread_counts[user_id]:
+                del self.unread_counts[user_id]
+        pending = self.outbox.get(user_id)
+        if pending is not None:
+            pending.pop(key, None)
+            if not pending:
+                del self.outbox[user_id]
+
+    def _add(self, key, row):
+        row = {c: schema.to_text(row.get(c)) for c in COLUMNS if c != 'notification_id'}
+        self.rows[key] = row
+        self.by_user.setdefault(row['user_id'], {})[key] = None
+        self._count(key, row)
+
+    def _remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return None
+        self.by_user[row['user_id']].pop(key, None)
+        self._uncount(key, row)
+        return row
+
+    def _update(self, key, changes):
+        # In place, so the notification keeps its place in the user's inbox. Returns
+        # the user_id if it went (back) into the outbox, where it is now out of order
+        old = self.rows.get(key)
+        if old is None:
+            return None
+        row = {**old, **{c: schema.to_text(v) for c, v in changes.items() if c in old}}
+        if row['user_id'] != old['user_id']:
+            self._remove(key)
+            self._add(key, row)
+            return None
+        was_pending = key in self.outbox.get(row['user_id'], ())
+        self._uncount(key, old)
+        self.rows[key] = row
+        self._count(key, row)
+        if not was_pending and key in self.outbox.get(row['user_id'], ()):
+            return row['user_id']
+        return None
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.by_user = {}
+        self.unread_counts = Counter()
+        self.outbox = {}
+        # Oldest first, so each user's notifications stay in the order they were sent
+        frame = frame.sort_values('created_at', kind='stable') if 'created_at' in frame.columns else frame
+        columns = [c for c in COLUMNS if c in frame.columns and c != 'notification_id']
+        for key, values in zip(frame['notification_id'].astype(str), zip(*(frame[c].tolist() for c in columns))):
+            self._add(key, dict(zip(columns, values)))
+
+    def apply(self, ops):
+        requeued = set()
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._add(key, op['row'])
+            elif op['op'] == 'update':
+                requeued.add(self._update(key, op['changes']))
+            elif op['op'] == 'delete':
+                self._remove(key)
+        for user_id in requeued - {None}:
+            # e.g. put back after a failed digest: oldest first again
+            pending = self.outbox.get(user_id)
+            if pending:
+                self.outbox[user_id] = {key: None for key in self.by_user[user_id] if key in pending}
+
+    def unread(self, user_id):
+        return self.unread_counts.get(str(user_id), 0)
+
+    def latest(self, user_id, n=50):
+        """The user's newest n notifications, newest first, as dicts with their notification_id."""
+        keys = itertools.islice(reversed(self.by_user.get(str(user_id), {})), n)
+        return [{'notification_id': key, **self.rows[key]} for key in keys]
+
+    def unread_ids(self, user_id):
+        return [key for key in self.by_user.get(str(user_id), {}) if not self.rows[key]['read_at']]
+
+
+_inbox = table_cache.derive(TABLE, Inbox(), _lock)
+
+
+def inbox():
+    """Every user's notifications as of the current notifications table."""
+    frame = table_cache.get_table(TABLE)
+    with _lock:
+        return _inbox.sync(frame)
+
+
+def notify_each(kind, messages):
+    """Put message in user_id's inbox for every (user_id, message); returns how many were sent."""
+    created_at = _now()
+    rows = [{'notification_id': f"ntf{uuid.uuid4().hex[:12]}", 'user_id': str(user_id), 'kind': kind,
+             'message': message, 'created_at': created_at, 'read_at': '', 'emailed_at': ''}
+            for user_id, message in messages if schema.to_text(user_id)]
+    for start in range(0, len(rows), FANOUT_BATCH):
+        storage.insert(TABLE, rows[start:start + FANOUT_BATCH])
+    return len(rows)
+
+
+def notify(user_ids, kind, message):
+    """Send the same message to every user in user_ids (each once)."""
+    return notify_each(kind, ((user_id, message) for user_id in dict.fromkeys(map(str, user_ids))))
+
+
+def mark_read(user_id, notification_ids=None):
+    """Mark the user's notifications (default: all unread) as read in one transaction."""
+    box = inbox()
+    with _lock:
+        unread = box.unread_ids(user_id)
+    if notification_ids is not None:
+        wanted = set(notification_ids)
+        unread = [key for key in unread if key in wanted]
+    read_at = _now()
+    storage.commit(TABLE, [storage.update_op(key, {'read_at': read_at}) for key in unread])
+    return len(unread)
+
+
+def purge_read(before):
+    """Delete the notifications read before the date before; returns how many were deleted."""
+    cutoff = before.isoformat()
+    box = inbox()
+    with _lock:
+        old = [key for key, row in box.rows.items() if row['read_at'] and row['read_at'][:10] < cutoff]
+    for start in range(0, len(old), FANOUT_BATCH):
+        storage.commit(TABLE, [storage.delete_op(key) for key in old[start:start + FANOUT_BATCH]])
+    return len(old)
+
+
+class SmtpTransport:
+    # Delivers through an SMTP server, one connection per digest run. Any local
+    # stand-in works for testing, e.g. `python -m aiosmtpd -n -l localhost:1025`
+
+    def __init__(self, host='localhost', port=25, username=None, password=None, starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+
+    def send(self, message):
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                self._smtp.starttls()
+            if self.username:
+                self._smtp.login(self.username, self.password)
+        self._smtp.send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (OSError, smtplib.SMTPException):
+                pass
+            self._smtp = None
+
+
+class PrintTransport:
+    # Writes the messages to a stream instead of sending them
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, message):
+        self.stream.write(f"{message}\n")
+
+    def close(self):
+        pass
+
+
+def default_transport():
+    # SMTP server from the environment (NGO_SMTP_HOST, _PORT, _USER, _PASSWORD, _STARTTLS); None if unset
+    host = os.environ.get('NGO_SMTP_HOST')
+    if not host:
+        return None
+    return SmtpTransport(host, int(os.environ.get('NGO_SMTP_PORT', 25)), os.environ.get('NGO_SMTP_USER'),
+                         os.environ.get('NGO_SMTP_PASSWORD'),
+                         os.environ.get('NGO_SMTP_STARTTLS', '').lower() in schema.TRUE_VALUES)
+
+
+def _digest(email, name, items):
+    message = EmailMessage()
+    message['From'] = MAIL_FROM
+    message['To'] = email
+    message['Subject'] = f"You have {len(items)} new notification{'s' if len(items) != 1 else ''}"
+    lines = [f"Hello {name or 'there'},", ""]
+    lines += [f"- {item['created_at'][:16].replace('T', ' ')}  {item['message']}" for item in items[-DIGEST_ITEMS:][::-1]]
+    if len(items) > DIGEST_ITEMS:
+        lines.append(f"... and {len(items) - DIGEST_ITEMS} more")
+    lines += ["", "Log in to see them all."]
+    message.set_content("\n".join(lines))
+    return message
+
+
+def send_digests(users, transport):
+    """E-mail every user with outbox notifications one digest of them; returns digests sent.
+
+    The notifications are claimed (marked e-mailed) before anything is sent, so
+    two runs never send the same one; those of a digest that fails to send are
+    put back for the next run. Users without an e-mail address are left alone.
+    """
+    user_lookup = indexes.user_index(users)
+    with storage._file_lock(TABLE):
+        box = inbox()
+        with _lock:
+            claimed = {user_id: [{'notification_id': key, **box.rows[key]} for key in keys]
+                       for user_id, keys in box.outbox.items()
+                       if user_id in user_lookup and schema.to_text(user_lookup.row(user_id)['email'])}
+        emailed_at = _now()
+        storage.commit(TABLE, [storage.update_op(item['notification_id'], {'emailed_at': emailed_at})
+                               for items in claimed.values() for item in items])
+    delivered = set()
+    try:
+        for user_id, items in claimed.items():
+            user = user_lookup.row(user_id)
+            try:
+                transport.send(_digest(schema.to_text(user['email']), schema.to_text(user['name']), items))
+            except smtplib.SMTPRecipientsRefused:
+                continue  # this address only
+            except (OSError, smtplib.SMTPException):
+                break  # the server is unreachable or gave up; the rest wait for the next run
+            delivered.add(user_id)
+    finally:
+        transport.close()
+        # Anything claimed but not sent goes back in the outbox
+        storage.commit(TABLE, [storage.update_op(item['notification_id'], {'emailed_at': ''})
+                               for user_id, items in claimed.items() if user_id not in delivered for item in items])
+    return len(delivered)
+
+
+def create_table():
+    # An empty notifications table for a new data directory
+    if not storage.table_exists(TABLE):
+        with storage._file_lock(TABLE):
+            storage.checkpoint(TABLE, pd.DataFrame(columns=COLUMNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['digest'])
+    parser.add_argument('--data', default=storage.DATA_DIR, help="directory holding the table files")
+    parser.add_argument('--smtp-host', help="default: $NGO_SMTP_HOST")
+    parser.add_argument('--smtp-port', type=int, default=25)
+    parser.add_argument('--print', action='store_true', help="write the digests to stdout instead of sending them")
+    args = parser.parse_args()
+
+    storage.DATA_DIR = args.data
+    if args.print:
+        transport = PrintTransport()
+    elif args.smtp_host:
+        transport = SmtpTransport(args.smtp_host, args.smtp_port)
+    else:
+        transport = default_transport()
+        if transport is None:
+            parser.error("no SMTP server: pass --smtp-host, set NGO_SMTP_HOST or use --print")
+    if not storage.table_exists(TABLE):
+        print("0 digests sent")
+        return
+    sent = send_digests(table_cache.get_table('users'), transport)
+    print(f"{sent} digest{'s' if sent != 1 else ''} sent", file=sys.stderr if args.print else sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import datetime
+import threading
+
+import schema
+import storage
+import table_cache
+
+_lock = threading.RLock()
+
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+
+def _day(value):
+    # Parsed once when the row is written, not on every render
+    try:
+        return datetime.date.fromisoformat(schema.to_text(value)[:10])
+    except ValueError:
+        return None
+
+
+class Projection(table_cache.DerivedView):
+    # Rows of one table grouped by the user(s) they belong to, kept up to date
+    # from the storage commit log so a user's slice is read without scanning the table
+
+    def __init__(self, key, columns, owners_of, date_column=None):
+        super().__init__()
+        self.key = key
+        self.columns = columns
+        self.owners_of = owners_of
+        self.date_column = date_column
+        self.rows = {}
+        self.owners = {}
+        self.by_user = {}
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.owners = {}
+        self.by_user = {}
+        columns = [c for c in self.columns if c in frame.columns]
+        keys = frame[self.key].astype(str)
+        for key, values in zip(keys, zip(*(frame[c] for c in columns))):
+            self._add(key, dict(zip(columns, values)))
+
+    def _add(self, key, row):
+        row = {c: row.get(c) for c in self.columns}
+        row[self.key] = key
+        if self.date_column:
+            row['day'] = _day(row.get(self.date_column))
+        owners = tuple(self.owners_of(row))
+        self.rows[key] = row
+        self.owners[key] = owners
+        for user_id in owners:
+            self.by_user.setdefault(user_id, set()).add(key)
+
+    def _remove(self, key):
+        row = self.rows.pop(key, None)
+        for user_id in self.owners.pop(key, ()):
+            self.by_user.get(user_id, set()).discard(key)
+        return row
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._add(key, op['row'])
+            elif op['op'] == 'update':
+                row = self._remove(key)
+                if row is not None:
+                    row = {**row, **{c: v for c, v in op['changes'].items() if c in self.columns}}
+                    self._add(key, row)
+            elif op['op'] == 'delete':
+                self._remove(key)
+
+    def for_user(self, user_id):
+        return [self.rows[key] for key in self.by_user.get(str(user_id), ())]
+
+
+def _assignee(row):
+    user_id = schema.to_text(row.get('assigned_to')).strip()
+    return [user_id] if user_id else []
+
+
+def _participants(row):
+    return [p.strip() for p in schema.to_text(row.get('participants')).split(',') if p.strip()]
+
+
+def _submitter(row):
+    user_id = schema.to_text(row.get('submitted_by')).strip()
+    return [user_id] if user_id else []
+
+
+_projections = {name: table_cache.derive(name, projection, _lock) for name, projection in {
+    'tasks': Projection('task_id', ['title', 'description', 'assigned_to', 'status', 'due_date', 'domain', 'priority',
+                                    storage.VERSION_COLUMN], _assignee, date_column='due_date'),
+    'events': Projection('event_id', ['title', 'date', 'time', 'location', 'participants', 'status'],
+                         _participants, date_column='date'),
+    'ideas': Projection('idea_id', ['title', 'submitted_by', 'status', 'comments', 'submission_date'], _submitter),
+}.items()}
+
+
+class MyWork:
+    # One volunteer's tasks, events and ideas
+
+    def __init__(self, tasks, events, ideas):
+        self.tasks = sorted(tasks, key=lambda t: (t['day'] or datetime.date.max,
+                                                  PRIORITY_RANK.get(schema.to_text(t['priority']).lower(), len(PRIORITY_RANK))))
+        self.events = sorted(events, key=lambda e: (e['day'] or datetime.date.max, schema.to_text(e['time'])))
+        self.ideas = sorted(ideas, key=lambda i: schema.to_text(i['submission_date']), reverse=True)
+
+    def tasks_with_status(self, status=None):
+        if status is None:
+            return list(self.tasks)
+        return [t for t in self.tasks if schema.to_text(t['status']).lower() == status.lower()]
+
+    def open_tasks(self):
+        return [t for t in self.tasks if schema.to_text(t['status']).lower() != 'completed']
+
+    def upcoming_events(self, today=None):
+        today = today or datetime.date.today()
+        return [e for e in self.events if e['day'] is not None and e['day'] >= today]
+
+
+def my_work(user_id, tasks, events=None, ideas=None):
+    """The per-user projection for user_id; costs O(that user's rows) once built.
+
+    Tables passed as None are skipped and come back empty.
+    """
+    with _lock:
+        return MyWork(_projections['tasks'].sync(tasks).for_user(user_id),
+                      _projections['events'].sync(events).for_user(user_id) if events is not None else [],
+                      _projections['ideas'].sync(ideas).for_user(user_id) if ideas is not None else [])
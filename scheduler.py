@@ -0,0 +1,329 @@
+"""Periodic sweeps that run in the background instead of on page renders.
+
+Each sweep is about the rows whose date has just crossed a line: events that are
+now in the past are marked completed, tasks that have just gone past their due
+date are flagged (tasks.flagged_overdue) and their assignee and creator told,
+and reminders are queued for tasks due and events happening tomorrow and for
+today's birthdays. Once a day, replaced password hashes and Aadhaar images are
+scrubbed from the users history if any were replaced since the last scrub, and
+read notifications past notifications.KEEP_READ_DAYS are deleted. The last day
+each sweep covered is kept in data/scheduler.json, so a run only looks at the
+days since then, found with a binary search of the table's date index.
+
+Every app process runs the scheduler in a thread (start()). A process claims a
+sweep's window in the state file, under a lock held only for that, and runs the
+sweep unlocked, so each day is swept once and sweeps in different processes
+run side by side.
+
+    python scheduler.py                   # run the sweeps that are due now, once
+    python scheduler.py --today 2025-06-01
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import datetime
+import threading
+
+import pandas as pd
+
+import stats
+import schema
+import storage
+import indexes
+import changelog
+import table_cache
+import notifications
+
+STATE_FILE = 'scheduler.json'  # in the data directory
+LOCK_NAME = 'scheduler'
+TICK_SECONDS = 300
+CLAIM_SECONDS = 3600  # a claimed sweep not finished by then (its process died) is free to run again
+ACTOR = 'scheduler'  # what the sweeps' commits are recorded as in the change log
+SECRET_COLUMNS = ['password', 'aadhar_image']  # blanked from the users history once replaced
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_thread = None
+_stop = threading.Event()
+
+
+def _is_open(tasks):
+    return tasks['status'].astype(str).str.lower() != 'completed'
+
+
+class Sweep:
+    # A daily job over the rows whose date has come within days_ahead of today
+    # since the last run. With catch_up, days missed while nothing was running are
+    # swept late; without it they are skipped (yesterday's reminder is no use).
+    # backfill makes the very first run cover every earlier date as well
+
+    def __init__(self, name, days_ahead, select, act, catch_up=False, backfill=False):
+        self.name = name
+        self.days_ahead = days_ahead
+        self.select = select
+        self.act = act
+        self.catch_up = catch_up
+        self.backfill = backfill
+
+    def window(self, last, today):
+        # (first, last) day to sweep, first None meaning from the beginning; None if up to date
+        end = today + datetime.timedelta(days=self.days_ahead)
+        if last is None:
+            return (None if self.backfill else end), end
+        if last >= end:
+            return None
+        start = last + datetime.timedelta(days=1)
+        return (start if self.catch_up else end), end
+
+
+def _dated(table, column):
+    def select(start, end):
+        frame = table_cache.get_table(table)
+        return indexes.date_index(frame, column).rows_between(start, end)
+    return select
+
+
+def _birthdays(start, end):
+    users = table_cache.get_table('users')
+    days = pd.date_range(start or end, end).date
+    return [user_id for day in days for user_id in stats.birthdays_on(users, day)]
+
+
+def _complete_events(events, today):
+    # Past events still marked upcoming. An event an admin edited in between keeps
+    # the admin's edit: the commit is retried without the rows it conflicted on
+    upcoming = events[events['status'].astype(str).str.lower() == 'upcoming']
+    ops = [storage.update_op(row['event_id'], {'status': 'completed'}, storage.row_version(row))
+           for _, row in upcoming.iterrows()]
+    while ops:
+        try:
+            storage.commit('events', ops)
+        except storage.ConflictError as e:
+            conflicts = set(e.keys)
+            ops = [op for op in ops if op['key'] not in conflicts]
+        else:
+            break
+    return len(ops)
+
+
+def _flag_overdue(tasks, today):
+    # The day each task was flagged goes in flagged_overdue first, so a retried
+    # run skips the tasks whose assignee and creator have already been told
+    overdue = tasks[_is_open(tasks)]
+    if 'flagged_overdue' in overdue.columns:
+        overdue = overdue[overdue['flagged_overdue'].isna()]
+    storage.commit('tasks', [storage.update_op(task_id, {'flagged_overdue': today.isoformat()})
+                             for task_id in overdue['task_id']])
+    user_lookup = indexes.user_index(table_cache.get_table('users'))
+    messages = []
+    for _, task in overdue.iterrows():
+        due = schema.to_text(task['due_date'])[:10]
+        assignee = schema.to_text(task['assigned_to'])
+        if assignee:
+            messages.append((assignee, f"Task \"{task['title']}\" was due on {due} and is overdue."))
+            owner_message = f"Task \"{task['title']}\" assigned to {user_lookup.name(assignee)} is overdue (due {due})."
+        else:
+            owner_message = f"Unassigned task \"{task['title']}\" is overdue (due {due})."
+        if schema.to_text(task['created_by']) and schema.to_text(task['created_by']) != assignee:
+            messages.append((schema.to_text(task['created_by']), owner_message))
+    notifications.notify_each(notifications.TASK_OVERDUE, messages)
+    return len(overdue)
+
+
+def _remind_tasks(tasks, today):
+    due = tasks[_is_open(tasks) & (tasks['assigned_to'].fillna('').astype(str) != '')]
+    return notifications.notify_each(notifications.REMINDER, (
+        (task['assigned_to'], f"Reminder: task \"{task['title']}\" is due on {schema.to_text(task['due_date'])[:10]}.")
+        for _, task in due.iterrows()))
+
+
+def _remind_events(events, today):
+    upcoming = events[events['status'].astype(str).str.lower() == 'upcoming']
+    messages = []
+    for _, event in upcoming.iterrows():
+        people = [p.strip() for p in schema.to_text(event['participants']).split(',') if p.strip()]
+        message = (f"Reminder: \"{event['title']}\" is on {schema.to_text(event['date'])[:10]} "
+                   f"at {event['time']}, {event['location']}.")
+        messages.extend((user_id, message) for user_id in dict.fromkeys(people + [schema.to_text(event['coordinator'])]))
+    return notifications.notify_each(notifications.REMINDER, messages)
+
+
+def _greet_birthdays(user_ids, today):
+    if not user_ids:
+        return 0
+    users = table_cache.get_table('users')
+    user_lookup = indexes.user_index(users)
+    names = ', '.join(user_lookup.name(user_id) for user_id in user_ids)
+    admins = users.loc[users['role'].astype(str) == 'admin', 'user_id'].astype(str)
+    notifications.notify_each(notifications.BIRTHDAY, [
+        *((user_id, f"Happy birthday, {user_lookup.name(user_id)}! 🎂") for user_id in user_ids),
+        *((admin_id, f"Birthdays today: {names}") for admin_id in admins),
+    ])
+    return len(user_ids)
+
+
+def _secrets_replaced(start, end):
+    # (last users seq, whether any commit since the last scrub overwrote a secret or
+    # deleted a row holding one). Scrubbing rewrites the history files, so it is
+    # skipped on the days nothing was replaced
+    after = _load_state().get('history_scrub_seq', 0)
+    last, replaced = after, False
+    for txn in changelog.records('users', after=after):
+        last = txn['seq']
+        for op in txn['ops']:
+            if op['op'] == 'delete' or (op['op'] == 'update' and any(c in op['changes'] for c in SECRET_COLUMNS)):
+                replaced = True
+    return last, replaced
+
+
+def _scrub_secrets(replaced, today):
+    # Password hashes replaced since the last scrub (e.g. legacy SHA-256 or bulk
+    # import ones rehashed at login) are blanked from the users table's history
+    last, replaced = replaced
+    scrubbed = storage.scrub_history('users', SECRET_COLUMNS) if replaced else 0
+    with storage._file_lock(LOCK_NAME):
+        state = _load_state()
+        state['history_scrub_seq'] = last
+        _save_state(state)
+    return scrubbed
+
+
+def _purge_notifications(_, today):
+    return notifications.purge_read(today - datetime.timedelta(days=notifications.KEEP_READ_DAYS))
+
+
+SWEEPS = [
+    Sweep('event_status', -1, _dated('events', 'date'), _complete_events, catch_up=True, backfill=True),
+    Sweep('overdue_tasks', -1, _dated('tasks', 'due_date'), _flag_overdue, catch_up=True),
+    Sweep('task_reminders', 1, _dated('tasks', 'due_date'), _remind_tasks),
+    Sweep('event_reminders', 1, _dated('events', 'date'), _remind_events),
+    Sweep('birthdays', 0, _birthdays, _greet_birthdays),
+    Sweep('history_scrub', 0, _secrets_replaced, _scrub_secrets),
+    Sweep('notification_retention', 0, lambda start, end: None, _purge_notifications),
+]
+
+
+def _state_path():
+    return os.path.join(storage.DATA_DIR, STATE_FILE)
+
+
+def _load_state():
+    try:
+        with open(_state_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(state):
+    tmp_path = f'{_state_path()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, _state_path())
+
+
+def _claim(sweep, today):
+    # The sweep's window, marked in the state as being swept; None if it is up to
+    # date or another process is sweeping it
+    with storage._file_lock(LOCK_NAME):
+        # Read under the lock: another process may have just claimed or swept
+        state = _load_state()
+        claims = state.setdefault('claims', {})
+        if claims.get(sweep.name, 0) > time.time():
+            return None
+        last = state.get(sweep.name)
+        window = sweep.window(datetime.date.fromisoformat(last) if last else None, today)
+        if window is not None:
+            claims[sweep.name] = time.time() + CLAIM_SECONDS
+            _save_state(state)
+        return window
+
+
+def _release(sweep, swept_to):
+    # Drop the sweep's claim, recording swept_to (a date) as its last day if it succeeded
+    with storage._file_lock(LOCK_NAME):
+        state = _load_state()
+        state.get('claims', {}).pop(sweep.name, None)
+        if swept_to is not None:
+            state[sweep.name] = swept_to.isoformat()
+        _save_state(state)
+
+
+def run_pending(today=None):
+    """Run every sweep that has days left to cover; returns {sweep: rows handled or the error}.
+
+    A sweep that fails keeps its last day and is tried again on the next run.
+    E-mail digests go out once a day when an SMTP server is configured (see
+    notifications.default_transport).
+    """
+    today = today or datetime.date.today()
+    done = {}
+    for sweep in SWEEPS:
+        window = _claim(sweep, today)
+        if window is None:
+            continue
+        try:
+            done[sweep.name] = sweep.act(sweep.select(*window), today)
+        except Exception as e:
+            log.exception("Sweep %s failed; it is tried again on the next run", sweep.name)
+            done[sweep.name] = e
+            _release(sweep, None)
+        else:
+            _release(sweep, window[1])
+    transport = notifications.default_transport()
+    if transport is None:
+        return done
+    with storage._file_lock(LOCK_NAME):
+        state = _load_state()
+        send_digests = state.get('email_digests') != today.isoformat()
+        if send_digests:
+            state['email_digests'] = today.isoformat()
+            _save_state(state)
+    if send_digests:
+        # Digests claim their own notifications
+        done['email_digests'] = notifications.send_digests(table_cache.get_table('users'), transport)
+    return done
+
+
+def _run():
+    storage.set_actor(ACTOR)
+    while not _stop.is_set():
+        try:
+            run_pending()
+        except Exception:
+            # e.g. the data directory is being migrated; try again next tick
+            log.exception("Scheduler run failed")
+        _stop.wait(TICK_SECONDS)
+
+
+def start():
+    """Start the background sweeps in this process (once)."""
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name='scheduler', daemon=True)
+            _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=storage.DATA_DIR, help="directory holding the table files")
+    parser.add_argument('--today', type=datetime.date.fromisoformat, help="sweep as of this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    storage.DATA_DIR = args.data
+    storage.set_actor(ACTOR)
+    notifications.create_table()
+    for name, result in run_pending(args.today).items():
+        print(f"{name}: {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Column types of the tables and the in-memory footprint they give.
+
+    python schema.py            # memory report for data/
+    python schema.py --compare  # ... next to the untyped pandas defaults
+"""
+import datetime
+import argparse
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow-backed strings and dates are optional
+    pa = None
+
+# category: small closed set of values, stored as integer codes
+# string:   free text, stored in one Arrow buffer instead of a Python object per cell
+# text:     free text where missing means empty
+# hash:     password hashes (auth.py scrypt strings, or legacy SHA-256 hex), kept as text
+# bool:     real booleans; 'True'/'true'/'1'/'yes' read as True, anything else as False
+# date:     calendar dates (ISO strings on disk)
+# version:  storage's per-row write counter, 0 for rows written before it existed
+SCHEMAS = {
+    'users': {
+        'user_id': 'string', 'username': 'string', 'password': 'hash', 'role': 'category',
+        'name': 'string', 'email': 'string', 'phone': 'string', 'skills': 'string',
+        'domains': 'string', 'availability': 'string', 'aadhar_verified': 'bool',
+        'aadhar_image': 'text', 'status': 'category', 'join_date': 'date', 'birthday': 'date',
+    },
+    'tasks': {
+        'task_id': 'string', 'title': 'string', 'description': 'string', 'assigned_to': 'text',
+        'status': 'category', 'due_date': 'date', 'domain': 'category', 'priority': 'category',
+        'created_by': 'category', 'created_date': 'date', 'completed_date': 'date',
+        'flagged_overdue': 'date',
+    },
+    'events': {
+        'event_id': 'string', 'title': 'string', 'description': 'string', 'date': 'date',
+        'time': 'category', 'location': 'category', 'coordinator': 'string', 'participants': 'text',
+        'status': 'category', 'created_by': 'category', 'created_date': 'date',
+    },
+    'attendance': {
+        'record_id': 'string', 'event_id': 'string', 'user_id': 'string', 'status': 'category',
+        'check_in': 'text', 'check_out': 'text', 'tasks': 'text',
+    },
+    'ideas': {
+        'idea_id': 'string', 'title': 'string', 'description': 'string', 'submitted_by': 'string',
+        'status': 'category', 'submission_date': 'date', 'comments': 'text',
+    },
+}
+# Idea votes are spread by voter over VOTE_SHARDS small tables votes_0, votes_1, ...
+# (see votes.py); voted_at is an ISO timestamp
+VOTE_SHARDS = 8
+for _shard in range(VOTE_SHARDS):
+    SCHEMAS[f'votes_{_shard}'] = {'vote_id': 'string', 'idea_id': 'string', 'user_id': 'string', 'voted_at': 'text'}
+# One row per notification in a user's inbox (see notifications.py); the
+# timestamps are ISO strings, empty until the notification is read or e-mailed
+SCHEMAS['notifications'] = {
+    'notification_id': 'string', 'user_id': 'string', 'kind': 'category', 'message': 'string',
+    'created_at': 'text', 'read_at': 'text', 'emailed_at': 'text',
+}
+for _columns in SCHEMAS.values():
+    _columns['_version'] = 'version'
+
+TRUE_VALUES = ['true', '1', 'yes']
+
+
+def _string_dtype():
+    if pa is None:
+        return None  # leave strings as pandas reads them
+    try:
+        # Missing values stay NaN, as with the default object strings
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype('pyarrow_numpy')
+
+
+STRING_DTYPE = _string_dtype()
+DATE_DTYPE = pd.ArrowDtype(pa.date32()) if pa is not None else np.dtype('datetime64[s]')
+
+
+def _as_string(column):
+    if STRING_DTYPE is None or column.dtype == STRING_DTYPE:
+        return column
+    return column.astype(STRING_DTYPE)
+
+
+def _as_text(column):
+    if column.isna().any():
+        column = column.fillna('')
+    return _as_string(column)
+
+
+def _as_category(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+    return _as_string(column).astype('category')
+
+
+def _as_bool(column):
+    if column.dtype == bool:
+        return column
+    return column.astype(str).str.strip().str.lower().isin(TRUE_VALUES)
+
+
+def _as_version(column):
+    if column.dtype == np.int64:
+        return column
+    return pd.to_numeric(column, errors='coerce').fillna(0).astype(np.int64)
+
+
+def _as_date(column):
+    if column.dtype == DATE_DTYPE:
+        return column
+    if isinstance(column.dtype, pd.ArrowDtype):
+        column = column.astype(object)
+    dates = pd.to_datetime(column, errors='coerce', format='ISO8601').dt.normalize()
+    return dates.astype(DATE_DTYPE)
+
+
+CONVERTERS = {
+    'category': _as_category,
+    'string': _as_string,
+    'text': _as_text,
+    'hash': _as_string,
+    'bool': _as_bool,
+    'date': _as_date,
+    'version': _as_version,
+}
+
+
+def csv_dtypes(name):
+    # What read_csv should parse each column as before apply() finishes the job
+    return {column: 'category' if kind == 'category' else str for column, kind in SCHEMAS.get(name, {}).items()
+            if kind != 'version'}
+
+
+def apply(name, frame):
+    """Return frame with every known column in its schema dtype (a no-op if already typed)."""
+    converted = {}
+    for column, kind in SCHEMAS.get(name, {}).items():
+        if column in frame.columns:
+            values = CONVERTERS[kind](frame[column])
+            if values is not frame[column]:
+                converted[column] = values
+    if converted:
+        frame = frame.assign(**converted)
+    return frame
+
+
+def to_text(value):
+    """A cell as a str, empty if it is missing (None or NaN)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return str(value)
+
+
+def to_date(value, default=None):
+    """A cell of a date column as a datetime.date, or default if it is missing or malformed."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return default
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return default
+
+
+def format_date(value):
+    # For display: YYYY-MM-DD, or empty when missing
+    day = to_date(value)
+    return day.isoformat() if day is not None else ''
+
+
+def column_report(frame):
+    """Dtype and deep memory footprint of every column, largest first."""
+    usage = frame.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'column': usage.index,
+        'dtype': [str(frame[c].dtype) for c in usage.index],
+        'bytes': usage.to_numpy(),
+    }).sort_values('bytes', ascending=False, ignore_index=True)
+
+
+def memory_report(tables):
+    """Rows, columns and deep memory footprint (bytes) of each frame in a name -> frame dict."""
+    report = []
+    for name, frame in tables.items():
+        usage = frame.memory_usage(deep=True, index=True)
+        report.append({
+            'table': name,
+            'rows': len(frame),
+            'columns': frame.shape[1],
+            'bytes': int(usage.sum()),
+            'bytes_per_row': int(usage.sum()) / len(frame) if len(frame) else 0.0,
+        })
+    return pd.DataFrame(report)
+
+
+def main():
+    import storage  # storage imports this module
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=storage.DATA_DIR, help="directory holding the table files")
+    parser.add_argument('--compare', action='store_true', help="also load with untyped pandas defaults")
+    parser.add_argument('--columns', action='store_true', help="print the per-column breakdown")
+    args = parser.parse_args()
+
+    storage.DATA_DIR = args.data
+    tables = {name: storage.load_table(name) for name in storage.TABLES if storage.table_exists(name)}
+    report = memory_report(tables)
+    if args.compare:
+        # Every cell as a Python object, as pandas reads the CSVs by default
+        untyped = memory_report({name: frame.astype(object) for name, frame in tables.items()})
+        report['untyped_bytes'] = untyped['bytes']
+        report['ratio'] = (report['untyped_bytes'] / report['bytes']).round(2)
+    print(report.to_string(index=False))
+    if args.columns:
+        for name, frame in tables.items():
+            print(f"\n{name}")
+            print(column_report(frame).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
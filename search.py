@@ -0,0 +1,314 @@
+import heapq
+import threading
+
+import numpy as np
+
+import schema
+import storage
+import table_cache
+
+# Searchable text of each table; the first field is the row's title and weighs most
+FIELDS = {
+    'users': ['name', 'email', 'skills'],
+    'tasks': ['title', 'description'],
+    'events': ['title', 'description', 'location'],
+    'ideas': ['title', 'description'],
+}
+TITLE_WEIGHT = 3.0
+FIELD_WEIGHT = 1.0
+WORD_START_BONUS = 2.0  # the term starts a word rather than sitting inside one
+
+# Changed rows are indexed into a small dict and merged into the arrays once this many
+# postings have piled up there
+COMPACT_POSTINGS = 200_000
+
+# A trigram list covering more than 1/DENSE_FRACTION of the rows is intersected as a
+# per-row mask; candidates are checked against their text this many at a time
+DENSE_FRACTION = 16
+VERIFY_CHUNK = 1024
+
+# Shorter queries have no trigram to look up and would verify every row; callers
+# scan a narrowed frame instead, or ask for more characters
+MIN_SEARCH_LENGTH = 3
+
+_lock = threading.RLock()
+_SEP = '\x00'  # between fields, so no trigram spans two of them
+_EMPTY = np.empty(0, dtype=np.int32)
+_NO_MASKS = np.empty(0, dtype=np.uint8)
+
+
+def _codes(text):
+    # Every trigram of text as one int64 (three 21-bit code points); none span a separator
+    points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    if len(points) < 3:
+        return np.empty(0, dtype=np.int64)
+    first, second, third = points[:-2], points[1:-1], points[2:]
+    codes = (first << 42) | (second << 21) | third
+    return codes[(first != 0) & (second != 0) & (third != 0)]
+
+
+def _trigrams(texts):
+    # Codes of every trigram in texts, and the position in texts each came from
+    points = np.frombuffer(_SEP.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    if len(points) < 3:
+        return np.empty(0, dtype=np.int64), _EMPTY
+    lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+    owner = np.repeat(np.arange(len(texts), dtype=np.int32), lengths)
+    first, second, third = points[:-2], points[1:-1], points[2:]
+    valid = (first != 0) & (second != 0) & (third != 0)
+    return ((first << 42) | (second << 21) | third)[valid], owner[:len(points) - 2][valid]
+
+
+def _postings(columns):
+    # CSR posting lists over the lower-cased field texts of every doc: sorted unique
+    # codes, offsets, then per posting the doc (ascending within a code) and a bit mask
+    # of the fields the trigram occurs in
+    parts = [(*_trigrams(texts), field) for field, texts in enumerate(columns)]
+    codes = np.concatenate([p[0] for p in parts])
+    docs = np.concatenate([p[1] for p in parts])
+    masks = np.concatenate([np.full(len(p[0]), 1 << p[2], dtype=np.uint8) for p in parts])
+    if not len(codes):
+        return np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64), _EMPTY, _NO_MASKS
+    order = np.lexsort((docs, codes))
+    codes, docs, masks = codes[order], docs[order], masks[order]
+    # One posting per (code, doc), with the fields of its repeats or-ed together
+    first = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])])
+    masks = np.bitwise_or.reduceat(masks, first)
+    codes, docs = codes[first], docs[first]
+    unique, starts = np.unique(codes, return_index=True)
+    return unique, np.append(starts, len(codes)), docs, masks
+
+
+def _intersect(a, b):
+    # Common values of two sorted unique arrays, with their positions in each
+    if len(a) > len(b):
+        common, in_b, in_a = _intersect(b, a)
+        return common, in_a, in_b
+    at = np.minimum(np.searchsorted(b, a), max(len(b) - 1, 0))
+    hit = np.flatnonzero(b[at] == a) if len(b) else _EMPTY
+    return a[hit], hit, at[hit]
+
+
+class SearchIndex(table_cache.DerivedView):
+    # Trigram index over some text columns of one table. Rows are numbered documents;
+    # a changed row gets a new number and its old one is left dead until compaction.
+    # Each posting records which fields hold the trigram, which bounds a doc's score
+    # before its text is looked at, so ranked searches check the likeliest docs first
+
+    def __init__(self, key, fields):
+        super().__init__()
+        self.key = key
+        self.fields = fields
+        self.keys = []  # doc -> row key (None once dead)
+        self.texts = []  # doc -> lower-cased fields joined by _SEP (None once dead)
+        self.labels = []  # doc -> the title field as written
+        self.doc_of = {}
+        self.base = (np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64), _EMPTY, _NO_MASKS)
+        self.delta = {}  # code -> {doc: field mask} added since the arrays were built
+        self.delta_size = 0
+
+    def _field_values(self, row):
+        return [schema.to_text(row.get(f)) for f in self.fields]
+
+    def rebuild(self, frame):
+        columns = [frame[f].tolist() if f in frame.columns else [''] * len(frame) for f in self.fields]
+        self.keys = frame[self.key].astype(str).tolist()
+        self.labels = [schema.to_text(v) for v in columns[0]]
+        self.texts = [_SEP.join(values) for values in zip(*([schema.to_text(v).lower() for v in c] for c in columns))]
+        self.doc_of = dict(zip(self.keys, range(len(self.keys))))
+        self._build()
+
+    def _build(self):
+        columns = list(zip(*(text.split(_SEP) for text in self.texts))) or [[] for _ in self.fields]
+        self.base = _postings([list(c) for c in columns])
+        self.delta = {}
+        self.delta_size = 0
+
+    def _compact(self):
+        # Renumber the live documents and rebuild the arrays from them
+        live = [doc for doc, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[d] for d in live]
+        self.texts = [self.texts[d] for d in live]
+        self.labels = [self.labels[d] for d in live]
+        self.doc_of = dict(zip(self.keys, range(len(self.keys))))
+        self._build()
+
+    def _add(self, key, values):
+        doc = len(self.keys)
+        lowered = [v.lower() for v in values]
+        self.keys.append(key)
+        self.labels.append(values[0])
+        self.texts.append(_SEP.join(lowered))
+        self.doc_of[key] = doc
+        for field, value in enumerate(lowered):
+            for code in np.unique(_codes(value)).tolist():
+                masks = self.delta.setdefault(code, {})
+                if doc not in masks:
+                    self.delta_size += 1
+                masks[doc] = masks.get(doc, 0) | (1 << field)
+
+    def _remove(self, key):
+        doc = self.doc_of.pop(key, None)
+        if doc is None:
+            return None
+        values = self.texts[doc].split(_SEP)
+        values[0] = self.labels[doc]
+        self.keys[doc] = self.texts[doc] = self.labels[doc] = None
+        return values
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._add(key, self._field_values(op['row']))
+            elif op['op'] == 'update':
+                changed = [f for f in self.fields if f in op['changes']]
+                if not changed or key not in self.doc_of:
+                    continue
+                values = self._remove(key)
+                for f in changed:
+                    values[self.fields.index(f)] = schema.to_text(op['changes'][f])
+                self._add(key, values)
+            elif op['op'] == 'delete':
+                self._remove(key)
+        if self.delta_size > COMPACT_POSTINGS:
+            self._compact()
+
+    def _posting(self, code):
+        codes, offsets, docs, masks = self.base
+        i = np.searchsorted(codes, code)
+        if i < len(codes) and codes[i] == code:
+            docs, masks = docs[offsets[i]:offsets[i + 1]], masks[offsets[i]:offsets[i + 1]]
+        else:
+            docs, masks = _EMPTY, _NO_MASKS
+        added = self.delta.get(code)
+        if added:
+            # Delta docs are numbered after every base doc, so this stays sorted
+            docs = np.concatenate([docs, np.fromiter(added.keys(), dtype=np.int32, count=len(added))])
+            masks = np.concatenate([masks, np.fromiter(added.values(), dtype=np.uint8, count=len(added))])
+        return docs, masks
+
+    def _term(self, term, field_mask):
+        # Docs that may contain term, with the fields it may be in
+        codes = np.unique(_codes(term))
+        if not len(codes):
+            # One- or two-letter term: nothing to narrow by
+            return np.arange(len(self.keys), dtype=np.int32), np.full(len(self.keys), field_mask, dtype=np.uint8)
+        postings = sorted((self._posting(c) for c in codes.tolist()), key=lambda p: len(p[0]))
+        docs, masks = postings[0]
+        if len(docs) * DENSE_FRACTION > len(self.keys):
+            # Common trigrams: and-ing one mask per doc beats matching up long sorted lists
+            found = np.zeros(len(self.keys), dtype=np.uint8)
+            found[docs] = masks & field_mask
+            for other_docs, other_masks in postings[1:]:
+                here = np.zeros(len(self.keys), dtype=np.uint8)
+                here[other_docs] = other_masks
+                found &= here
+            docs = np.flatnonzero(found).astype(np.int32)
+            return docs, found[docs]
+        masks = masks & field_mask
+        for other_docs, other_masks in postings[1:]:
+            if not len(docs):
+                break
+            docs, here, there = _intersect(docs, other_docs)
+            masks = masks[here] & other_masks[there]
+        keep = masks != 0
+        return docs[keep], masks[keep]
+
+    def _candidates(self, terms, field_mask):
+        # Docs that may contain every term, with an upper bound on their score
+        docs, bounds = None, None
+        for term in terms:
+            term_docs, masks = self._term(term, field_mask)
+            term_bounds = np.where(masks & 1, TITLE_WEIGHT, FIELD_WEIGHT) + WORD_START_BONUS
+            if docs is None:
+                docs, bounds = term_docs, term_bounds
+            else:
+                docs, here, there = _intersect(docs, term_docs)
+                bounds = bounds[here] + term_bounds[there]
+            if not len(docs):
+                break
+        return docs, bounds
+
+    def _score(self, text, terms, fields):
+        values = text.split(_SEP)
+        score = 0.0
+        for term in terms:
+            best = 0.0
+            for i in fields:
+                value = values[i]
+                at = value.find(term)
+                if at < 0:
+                    continue
+                weight = TITLE_WEIGHT if i == 0 else FIELD_WEIGHT
+                if at == 0 or not value[at - 1].isalnum():
+                    weight += WORD_START_BONUS
+                best = max(best, weight)
+            if not best:
+                return 0.0
+            score += best
+        return score
+
+    def _matches(self, query, fields=None, allowed=None):
+        # (score, doc, bound) of every true match, highest bound first
+        terms = schema.to_text(query).lower().split()
+        if not terms:
+            return
+        fields = range(len(self.fields)) if fields is None else [self.fields.index(f) for f in fields]
+        docs, bounds = self._candidates(terms, sum(1 << i for i in fields))
+        order = np.lexsort((docs, -bounds))
+        docs, bounds = docs[order], bounds[order]
+        for start in range(0, len(docs), VERIFY_CHUNK):
+            chunk = slice(start, start + VERIFY_CHUNK)
+            for doc, bound in zip(docs[chunk].tolist(), bounds[chunk].tolist()):
+                text = self.texts[doc]
+                if text is None or (allowed is not None and self.keys[doc] not in allowed):
+                    continue
+                score = self._score(text, terms, fields)
+                if score:
+                    yield score, doc, bound
+
+    def search(self, query, limit=20, fields=None, allowed=None):
+        """Best matches for every word of query as (score, key, title), best first.
+
+        Only rows whose key is in allowed are returned, if it is given.
+        """
+        best = []  # min-heap of the top hits so far
+        for score, doc, bound in self._matches(query, fields, allowed):
+            if len(best) == limit:
+                if best[0][0] >= bound:
+                    break  # nothing after this can score higher
+                heapq.heappushpop(best, (score, -doc))
+            else:
+                heapq.heappush(best, (score, -doc))
+        best.sort(reverse=True)
+        return [(score, self.keys[-doc], self.labels[-doc]) for score, doc in best]
+
+    def keys_matching(self, query, fields=None):
+        """Keys of every row matching all words of query, in any of fields (default: all)."""
+        return {self.keys[doc] for _, doc, _ in self._matches(query, fields)}
+
+
+_indexes = {name: table_cache.derive(name, SearchIndex(storage.TABLES[name], fields), _lock)
+            for name, fields in FIELDS.items()}
+
+
+def index(name, frame):
+    """The search index for this version of one table's frame."""
+    with _lock:
+        return _indexes[name].sync(frame)
+
+
+def search(query, tables, limit=20, within=None):
+    """Ranked hits across tables (name -> frame) as dicts with table, key, title and score.
+
+    within optionally maps a table name to the set of keys its hits are limited to.
+    """
+    hits = []
+    with _lock:
+        for name, frame in tables.items():
+            found = _indexes[name].sync(frame).search(query, limit, allowed=(within or {}).get(name))
+            hits.extend({'table': name, 'key': key, 'title': title, 'score': score} for score, key, title in found)
+    hits.sort(key=lambda hit: -hit['score'])
+    return hits[:limit]
@@ -0,0 +1,176 @@
+import heapq
+import calendar
+import itertools
+import threading
+from collections import Counter
+
+import schema
+import table_cache
+
+_lock = threading.RLock()
+
+
+def _month_day(value):
+    # '1995-07-22' -> '07-22'
+    value = schema.to_text(value)[:10]
+    return value[5:] if len(value) == 10 else ''
+
+
+def _birthday_buckets(day):
+    # Month-days celebrated on day: 29 February birthdays on the 28th outside leap years
+    buckets = [day.strftime('%m-%d')]
+    if buckets[0] == '02-28' and not calendar.isleap(day.year):
+        buckets.append('02-29')
+    return buckets
+
+
+class TableStats(table_cache.DerivedView):
+    # Aggregates over one table that can be updated row by row: a counter over one
+    # column, a lazily-invalidated max-heap over a date column and value buckets
+
+    def __init__(self, key, columns, count_column=None, recent_column=None, bucket_of=None):
+        super().__init__()
+        self.key = key
+        self.columns = columns
+        self.count_column = count_column
+        self.recent_column = recent_column
+        self.bucket_of = bucket_of
+        self.rows = {}
+        self.counts = Counter()
+        self.buckets = {}
+        self.heap = []
+        self._seq = itertools.count()
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.counts = Counter()
+        self.buckets = {}
+        self.heap = []
+        columns = [c for c in self.columns if c in frame.columns]
+        keys = frame[self.key].astype(str)
+        for key, values in zip(keys, zip(*(frame[c] for c in columns))):
+            row = self._add(key, dict(zip(columns, values)))
+            if self.recent_column:
+                self.heap.append(self._recent_entry(key, row))
+        heapq.heapify(self.heap)
+
+    def _recent_entry(self, key, row):
+        # heapq is a min-heap, so key on the negated YYYYMMDD to get newest first
+        date = schema.to_text(row.get(self.recent_column))[:10]
+        digits = date.replace('-', '')
+        return (-int(digits) if digits.isdigit() else 0, next(self._seq), key, date)
+
+    def _add(self, key, row):
+        row = {c: row.get(c) for c in self.columns}
+        self.rows[key] = row
+        if self.count_column:
+            self.counts[schema.to_text(row.get(self.count_column)).lower()] += 1
+        if self.bucket_of:
+            self.buckets.setdefault(self.bucket_of(row), set()).add(key)
+        return row
+
+    def _push(self, key, row):
+        if self.recent_column:
+            heapq.heappush(self.heap, self._recent_entry(key, row))
+            if len(self.heap) > 2 * len(self.rows) + 64:
+                # Too many stale entries; start again from the live rows
+                self.heap = [self._recent_entry(k, r) for k, r in self.rows.items()]
+                heapq.heapify(self.heap)
+
+    def _remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return None
+        if self.count_column:
+            self.counts[schema.to_text(row.get(self.count_column)).lower()] -= 1
+        if self.bucket_of:
+            self.buckets.get(self.bucket_of(row), set()).discard(key)
+        # Heap entries for removed rows are dropped lazily in recent()
+        return row
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._remove(key)
+                self._push(key, self._add(key, op['row']))
+            elif op['op'] == 'update':
+                old = self._remove(key)
+                if old is None:
+                    continue
+                redated = self.recent_column in op['changes']
+                row = self._add(key, {**old, **{c: v for c, v in op['changes'].items() if c in self.columns}})
+                if redated:
+                    self._push(key, row)
+            elif op['op'] == 'delete':
+                self._remove(key)
+
+    def total(self):
+        return len(self.rows)
+
+    def count(self, value):
+        return self.counts.get(value, 0)
+
+    def bucket(self, value):
+        return sorted(self.buckets.get(value, ()))
+
+    def recent(self, n):
+        # Newest n rows as (key, row); stale heap entries are discarded on the way
+        found = []
+        seen = set()
+        while self.heap and len(found) < n:
+            entry = heapq.heappop(self.heap)
+            key, date = entry[2], entry[3]
+            row = self.rows.get(key)
+            if row is None or key in seen or schema.to_text(row.get(self.recent_column))[:10] != date:
+                continue  # deleted or re-dated since this entry was pushed
+            seen.add(key)
+            found.append(entry)
+        for entry in found:
+            heapq.heappush(self.heap, entry)
+        return [(entry[2], self.rows[entry[2]]) for entry in found]
+
+
+_stats = {name: table_cache.derive(name, table, _lock) for name, table in {
+    'users': TableStats('user_id', ['name', 'birthday'],
+                        bucket_of=lambda row: _month_day(row.get('birthday'))),
+    'tasks': TableStats('task_id', ['title', 'status', 'due_date', 'created_date'],
+                        count_column='status', recent_column='created_date'),
+    'events': TableStats('event_id', ['status'], count_column='status'),
+    'ideas': TableStats('idea_id', ['title', 'status', 'submitted_by', 'submission_date'],
+                        recent_column='submission_date'),
+}.items()}
+
+
+class DashboardStats:
+    # O(1) reads for the dashboard, taken from the incrementally maintained aggregates
+
+    def __init__(self, users, tasks, events, ideas):
+        self.total_members = users.total()
+        self.active_tasks = tasks.total() - tasks.count('completed')
+        self.upcoming_events = events.count('upcoming')
+        self._users = users
+        self._tasks = tasks
+        self._ideas = ideas
+
+    def birthdays_on(self, day):
+        return [self._users.rows[key]['name'] for bucket in _birthday_buckets(day) for key in self._users.bucket(bucket)]
+
+    def recent_tasks(self, n=3):
+        return [row for _, row in self._tasks.recent(n)]
+
+    def recent_ideas(self, n=3):
+        return [row for _, row in self._ideas.recent(n)]
+
+
+def dashboard_stats(users, tasks, events, ideas):
+    with _lock:
+        return DashboardStats(_stats['users'].sync(users), _stats['tasks'].sync(tasks),
+                              _stats['events'].sync(events), _stats['ideas'].sync(ideas))
+
+
+def birthdays_on(users, day):
+    """user_ids of the users whose birthday falls on day's month and day (29 February on the 28th in other years)."""
+    with _lock:
+        table = _stats['users'].sync(users)
+        return [key for bucket in _birthday_buckets(day) for key in table.bucket(bucket)]
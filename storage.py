@@ -0,0 +1,596 @@
+import os
+import re
+import json
+import shutil
+import datetime
+import threading
+import contextlib
+import contextvars
+
+import numpy as np
+import pandas as pd
+
+import schema
+import formats
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: only the in-process lock applies there
+    fcntl = None
+
+DATA_DIR = 'data'
+
+# Primary key column of every table
+TABLES = {
+    'users': 'user_id',
+    'tasks': 'task_id',
+    'events': 'event_id',
+    'attendance': 'record_id',
+    'ideas': 'idea_id',
+}
+TABLES.update({f'votes_{shard}': 'vote_id' for shard in range(schema.VOTE_SHARDS)})
+TABLES['notifications'] = 'notification_id'
+
+# Number of committed transactions (or bytes) kept in a table's write-ahead log
+# before they are folded back into the base file
+CHECKPOINT_EVERY = 500
+CHECKPOINT_BYTES = 16 * 1024 * 1024
+
+# Checkpointed logs are kept as numbered segments under data/log/<table>/ (the
+# change history), with a snapshot of the base file every few segments so a
+# rebuild only replays the segments after the latest one (see changelog.py).
+# The history goes back to the oldest snapshot kept; older segments are dropped
+LOG_DIR = 'log'
+SNAPSHOT_EVERY = 8
+KEEP_SNAPSHOTS = 3
+
+# Format of base files created from scratch; existing tables keep the format of
+# the file on disk until migrated (see formats.py)
+DEFAULT_FORMAT = os.environ.get('NGO_TABLE_FORMAT', 'csv')
+
+# Per-row counter bumped by every commit that writes the row
+VERSION_COLUMN = '_version'
+
+_lock = threading.Lock()  # guards _table_locks only; never held while waiting on a table
+_table_locks = {}  # table name -> RLock serialising this process's threads on that table
+_wal_tails = {}  # table name -> (log file identity, transactions, last seq)
+_commit_listeners = []
+_actor = contextvars.ContextVar('actor', default=None)
+_held_locks = {}  # table name -> [lock file, depth] while this process holds its file lock
+
+
+class ConflictError(Exception):
+    # Raised by commit when a row changed after the caller read it
+    def __init__(self, name, keys):
+        super().__init__(f"{len(keys)} {name} row(s) changed since they were read: {', '.join(keys[:5])}")
+        self.name = name
+        self.keys = keys
+
+
+def table_format(name):
+    return formats.detect(DATA_DIR, name) or DEFAULT_FORMAT
+
+
+def table_path(name):
+    return formats.path_for(DATA_DIR, name, table_format(name))
+
+
+def table_exists(name):
+    return formats.detect(DATA_DIR, name) is not None
+
+
+def wal_path(name):
+    return os.path.join(DATA_DIR, f'{name}.wal')
+
+
+def lock_path(name):
+    return os.path.join(DATA_DIR, f'{name}.lock')
+
+
+def log_dir(name):
+    return os.path.join(DATA_DIR, LOG_DIR, name)
+
+
+SEGMENT_PATTERN = re.compile(r'^(\d{12})-(\d{12})\.log$')
+SNAPSHOT_PATTERN = re.compile(r'^snapshot-(\d{12})\.(\w+)$')
+
+
+def segments(name):
+    """Sealed log segments of a table as (first seq, last seq, path), oldest first."""
+    found = []
+    directory = log_dir(name)
+    if os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            match = SEGMENT_PATTERN.match(entry)
+            if match:
+                found.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, entry)))
+    return sorted(found)
+
+
+def snapshots(name):
+    """Snapshots of a table's base file as (seq, path, format), oldest first."""
+    found = []
+    directory = log_dir(name)
+    extensions = {ext.lstrip('.'): fmt for fmt, ext in formats.EXTENSIONS.items()}
+    if os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            match = SNAPSHOT_PATTERN.match(entry)
+            if match and match.group(2) in extensions:
+                found.append((int(match.group(1)), os.path.join(directory, entry), extensions[match.group(2)]))
+    return sorted(found)
+
+
+def set_actor(actor):
+    # Who the commits made from this thread/context are recorded as
+    _actor.set(actor)
+
+
+def _table_lock(name):
+    # The in-process lock for one table (or other lock name), made on first use
+    with _lock:
+        lock = _table_locks.get(name)
+        if lock is None:
+            lock = _table_locks[name] = threading.RLock()
+        return lock
+
+
+@contextlib.contextmanager
+def _file_lock(name, shared=False):
+    # Advisory lock shared with every other process using the data directory:
+    # exclusive for commits and checkpoints, shared for loads so a reader never
+    # sees a checkpoint half done. Re-entrant within this process. Threads wait
+    # on the table's own lock, so waiting for one table never holds up another.
+    with _table_lock(name):
+        held = _held_locks.get(name)
+        if held is not None:
+            held[1] += 1
+            try:
+                yield
+            finally:
+                held[1] -= 1
+            return
+        f = open(lock_path(name), 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            _held_locks[name] = [f, 1]
+            try:
+                yield
+            finally:
+                del _held_locks[name]
+        finally:
+            f.close()  # also releases the flock
+
+
+def row_version(row):
+    """Version of a row (Series or dict); rows written before versioning count as 0."""
+    value = row.get(VERSION_COLUMN)
+    return 0 if value is None or pd.isna(value) else int(value)
+
+
+def _json_default(value):
+    # numpy scalars and dates coming out of DataFrames
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _scan_log(path, offset=0):
+    # (transactions from offset bytes on, bytes up to the end of the last complete one)
+    transactions = []
+    good = offset
+    if not os.path.exists(path):
+        return transactions, good
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # a torn write from a crash mid-commit
+            if line.strip():
+                try:
+                    transactions.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # likewise; everything after it is discarded
+            good += len(line)
+    return transactions, good
+
+
+def _read_wal(name):
+    return _scan_log(wal_path(name))[0]
+
+
+def _sealed_seq(name):
+    # Last seq already moved out of the write-ahead log
+    sealed = segments(name)
+    if sealed:
+        return sealed[-1][1]
+    taken = snapshots(name)
+    return taken[-1][0] if taken else 0
+
+
+def _wal_tail(name):
+    # (transactions in the write-ahead log, last seq) for the next append, re-read only
+    # when another process has touched the file. A torn final line is cut off here so
+    # the next commit does not land behind it.
+    path = wal_path(name)
+    try:
+        stat = os.stat(path)
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        identity = None
+    cached = _wal_tails.get(name)
+    if cached is not None and cached[0] == identity:
+        return cached[1], cached[2]
+    last_seq = _sealed_seq(name)
+    count = 0
+    if identity is not None:
+        transactions, good = _scan_log(path)
+        if good < identity[1]:
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+        count = len(transactions)
+        if transactions:
+            last_seq = transactions[-1].get('seq', last_seq + count)
+    _wal_tails[name] = (identity, count, last_seq)
+    return count, last_seq
+
+
+def _set_cells(frame, positions, column, values):
+    col = frame.columns.get_loc(column)
+    try:
+        frame.iloc[positions, col] = values
+    except (TypeError, ValueError):
+        # e.g. a new category, or a string written into a typed column; schema.apply
+        # converts the column back afterwards
+        frame[column] = frame[column].astype(object)
+        frame.iloc[positions, col] = values
+
+
+def _replay(frame, key, transactions, projected=False):
+    # Collapse the log into its net effect so each row is touched once.
+    # A projected frame only picks up changes to the columns it already has.
+    inserted = {}
+    updates = {}
+    deleted = set()
+    for txn in transactions:
+        for op in txn['ops']:
+            k = op['key']
+            if op['op'] == 'insert':
+                inserted[k] = dict(op['row'])
+            elif op['op'] == 'update':
+                if k in inserted:
+                    inserted[k].update(op['changes'])
+                else:
+                    updates.setdefault(k, {}).update(op['changes'])
+            elif op['op'] == 'delete':
+                inserted.pop(k, None)
+                updates.pop(k, None)
+                deleted.add(k)
+
+    if not (inserted or updates or deleted):
+        return frame
+
+    frame = frame.copy()
+    if updates:
+        # One assignment per column: setting Arrow-backed cells one at a time rebuilds the array each time
+        by_column = {}
+        keys = frame[key].astype(str)
+        # isin runs in Arrow for Arrow-backed keys; a hashed Index would be rebuilt on every commit
+        hits = np.flatnonzero(keys.isin(list(updates)).to_numpy())
+        for pos, k in zip(hits, keys.iloc[hits]):
+            for column, value in updates[k].items():
+                if projected and column not in frame.columns:
+                    continue
+                rows, values = by_column.setdefault(column, ([], []))
+                rows.append(pos)
+                values.append(value)
+        for column, (rows, values) in by_column.items():
+            if column not in frame.columns:
+                frame[column] = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+            _set_cells(frame, rows, column, values)
+    if deleted:
+        frame = frame[~frame[key].astype(str).isin(deleted)]
+    if inserted:
+        new_rows = pd.DataFrame(list(inserted.values()))
+        if projected:
+            new_rows = new_rows.reindex(columns=frame.columns)
+        frame = pd.concat([frame, new_rows], ignore_index=True)
+    return frame.reset_index(drop=True)
+
+
+def _read_base(name, columns=None):
+    return formats.read(table_path(name), table_format(name), name, columns)
+
+
+def _write_base(name, frame, fmt=None):
+    fmt = fmt or table_format(name)
+    path = formats.path_for(DATA_DIR, name, fmt)
+    tmp_path = f'{path}.tmp'
+    formats.write(tmp_path, fmt, frame)
+    os.replace(tmp_path, path)
+
+
+def load_table(name, columns=None):
+    """Read a table with its log replayed; columns (if given) always include the key."""
+    key = TABLES[name]
+    if columns is not None:
+        columns = [key] + [c for c in columns if c != key]
+    with _file_lock(name, shared=True):
+        frame = _read_base(name, columns)
+        transactions = _read_wal(name)
+        return schema.apply(name, _replay(frame, key, transactions, projected=columns is not None))
+
+
+def _snapshot(name, seq):
+    # Copy of the base file as of seq; only the newest few are kept, with the segments after the oldest of them
+    os.makedirs(log_dir(name), exist_ok=True)
+    path = table_path(name)
+    target = os.path.join(log_dir(name), f'snapshot-{seq:012d}{os.path.splitext(path)[1]}')
+    shutil.copyfile(path, f'{target}.tmp')
+    os.replace(f'{target}.tmp', target)
+    taken = snapshots(name)
+    for _, old_path, _ in taken[:-KEEP_SNAPSHOTS]:
+        os.remove(old_path)
+    oldest = taken[-KEEP_SNAPSHOTS:][0][0]
+    for _, last, segment_path in segments(name):
+        if last <= oldest:
+            os.remove(segment_path)
+
+
+def _seal_wal(name):
+    # Move the write-ahead log into the change history as the next segment
+    path = wal_path(name)
+    transactions = _read_wal(name)
+    _wal_tails.pop(name, None)
+    if not transactions:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    sealed = _sealed_seq(name)
+    first = transactions[0].get('seq', sealed + 1)
+    last = transactions[-1].get('seq', sealed + len(transactions))
+    os.makedirs(log_dir(name), exist_ok=True)
+    os.replace(path, os.path.join(log_dir(name), f'{first:012d}-{last:012d}.log'))
+
+
+def _fold(name, frame, fmt=None):
+    # Write frame (the table with its log applied) as the new base and seal the log
+    if not snapshots(name) and table_exists(name):
+        # The state the history starts from
+        _snapshot(name, _sealed_seq(name))
+    old_path = table_path(name)
+    _write_base(name, frame, fmt)
+    if fmt is not None and formats.path_for(DATA_DIR, name, fmt) != old_path and os.path.exists(old_path):
+        os.remove(old_path)
+    _seal_wal(name)
+    sealed = segments(name)
+    taken = snapshots(name)
+    last_snapshot = taken[-1][0] if taken else 0
+    if sealed and sum(1 for first, _, _ in sealed if first > last_snapshot) >= SNAPSHOT_EVERY:
+        _snapshot(name, sealed[-1][1])
+
+
+def checkpoint(name, frame=None):
+    """Fold the write-ahead log into the base file and start a fresh log.
+
+    frame, if given, is written instead of the replayed table (e.g. a rebuilt copy).
+    """
+    with _file_lock(name):
+        if frame is None:
+            frame = load_table(name)
+        _fold(name, frame)
+        return frame
+
+
+def _stale(keys, values, current):
+    # Positions of values that are set but are no longer their row's current value
+    return [i for i, (key, value) in enumerate(zip(keys, values))
+            if value is not None and str(value) not in ('', 'nan') and str(value) != current.get(key)]
+
+
+def scrub_history(name, columns):
+    """Blank the values of columns in the table's history that are no longer current.
+
+    For secrets replaced in place, such as legacy password hashes rehashed at
+    login or images moved out of the table: the live table and every other
+    change in the history are kept. Returns the number of values blanked.
+    """
+    key = TABLES[name]
+    scrubbed = 0
+    with _file_lock(name):
+        # Fold the write-ahead log first, so every old value is in a snapshot or a segment
+        checkpoint(name)
+        frame = load_table(name, columns)
+        columns = [c for c in columns if c in frame.columns]
+        keys = frame[key].astype(str)
+        current = {c: dict(zip(keys, frame[c].fillna('').astype(str))) for c in columns}
+
+        for _, path, fmt in snapshots(name):
+            snapshot = formats.read(path, fmt, name)
+            snapshot_keys = snapshot[key].astype(str).tolist()
+            changed = False
+            for column in columns:
+                if column not in snapshot.columns:
+                    continue
+                stale = _stale(snapshot_keys, snapshot[column].tolist(), current[column])
+                if stale:
+                    _set_cells(snapshot, stale, column, [''] * len(stale))
+                    scrubbed += len(stale)
+                    changed = True
+            if changed:
+                formats.write(f'{path}.tmp', fmt, snapshot)
+                os.replace(f'{path}.tmp', path)
+
+        for _, _, path in segments(name):
+            transactions = _scan_log(path)[0]
+            changed = False
+            for txn in transactions:
+                for op in txn['ops']:
+                    values = op.get('row') or op.get('changes') or {}
+                    for column in columns:
+                        if column in values and _stale([op['key']], [values[column]], current[column]):
+                            values[column] = ''
+                            scrubbed += 1
+                            changed = True
+            if changed:
+                with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(txn, default=_json_default) + '\n' for txn in transactions)
+                os.replace(f'{path}.tmp', path)
+    return scrubbed
+
+
+def migrate(fmt):
+    """Rewrite every table's base file in another format, folding in its log.
+
+    Returns {table name: rows written}. The old base files are removed.
+    """
+    written = {}
+    for name in TABLES:
+        with _file_lock(name):
+            if not table_exists(name) or table_format(name) == fmt:
+                continue
+            frame = load_table(name)
+            _fold(name, frame, fmt)
+            written[name] = len(frame)
+    return written
+
+
+def on_commit(listener):
+    # listener(name, ops) is called after every successful commit, still under the table's
+    # lock, and by table_cache for other processes' commits as it reads them from the log
+    _commit_listeners.append(listener)
+    return listener
+
+
+_reader = None
+
+
+def use_reader(reader):
+    # reader(name) returns the current full table; commit uses it to look up row
+    # versions (table_cache installs its cached reader, otherwise load_table is used)
+    global _reader
+    _reader = reader
+    return reader
+
+
+def _current_versions(name, keys):
+    # {key: version} for the keys that exist in the table right now
+    if not table_exists(name):
+        return {}
+    frame = (_reader or load_table)(name)
+    ids = frame[TABLES[name]].astype(str)
+    hits = np.flatnonzero(ids.isin(keys).to_numpy())
+    if VERSION_COLUMN not in frame.columns:
+        return dict.fromkeys(ids.iloc[hits], 0)
+    versions = frame[VERSION_COLUMN].iloc[hits]
+    return dict(zip(ids.iloc[hits], versions.fillna(0).astype(np.int64).tolist()))
+
+
+def _stamp(name, ops):
+    # Check expected versions and write the new version into every insert and update
+    current = _current_versions(name, list({op['key'] for op in ops}))
+    conflicts = [op['key'] for op in ops if 'version' in op and current.get(op['key']) != op['version']]
+    if conflicts:
+        raise ConflictError(name, conflicts)
+    stamped = []
+    versions = {}
+    for op in ops:
+        op = {field: value for field, value in op.items() if field != 'version'}
+        key = op['key']
+        if op['op'] == 'delete':
+            current.pop(key, None)
+            versions.pop(key, None)
+        else:
+            current[key] = versions[key] = current.get(key, 0) + 1
+            if op['op'] == 'insert':
+                op['row'] = {**op['row'], VERSION_COLUMN: current[key]}
+            else:
+                op['changes'] = {**op['changes'], VERSION_COLUMN: current[key]}
+        stamped.append(op)
+    return stamped, versions
+
+
+def apply_ops(frame, name, ops, projected=False):
+    return schema.apply(name, _replay(frame, TABLES[name], [{'ops': ops}], projected))
+
+
+def commit(name, ops):
+    """Append one transaction (a list of insert/update/delete ops) to the table's log.
+
+    Ops made with an expected version are checked against the row as it is now,
+    across processes; if any has changed or gone, nothing is written and
+    ConflictError is raised. Returns {key: new version} for the rows written.
+    """
+    if not ops:
+        return {}
+    with _file_lock(name):
+        ops, versions = _stamp(name, ops)
+        count, last_seq = _wal_tail(name)
+        txn = {
+            'seq': last_seq + 1,
+            'ts': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'actor': _actor.get(),
+            'ops': ops,
+        }
+        line = json.dumps(txn, default=_json_default) + '\n'
+        with open(wal_path(name), 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        stat = os.stat(wal_path(name))
+        _wal_tails[name] = ((stat.st_ino, stat.st_size, stat.st_mtime_ns), count + 1, txn['seq'])
+        if count + 1 >= CHECKPOINT_EVERY or size >= CHECKPOINT_BYTES:
+            checkpoint(name)
+        for listener in _commit_listeners:
+            listener(name, ops)
+    return versions
+
+
+def _clean(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def insert_op(name, row):
+    row = {column: _clean(value) for column, value in dict(row).items()}
+    return {'op': 'insert', 'key': str(row[TABLES[name]]), 'row': row}
+
+
+def update_op(key, changes, version=None):
+    # With version, the commit fails unless the row is still at that version
+    op = {'op': 'update', 'key': str(key), 'changes': {c: _clean(v) for c, v in changes.items()}}
+    if version is not None:
+        op['version'] = int(version)
+    return op
+
+
+def delete_op(key, version=None):
+    op = {'op': 'delete', 'key': str(key)}
+    if version is not None:
+        op['version'] = int(version)
+    return op
+
+
+def insert(name, rows):
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict('records')
+    elif isinstance(rows, dict):
+        rows = [rows]
+    return commit(name, [insert_op(name, row) for row in rows])
+
+
+def update(name, key, changes, version=None):
+    """Update one row; returns its new version. See update_op for version."""
+    return commit(name, [update_op(key, changes, version)]).get(str(key))
+
+
+def delete(name, key, version=None):
+    commit(name, [delete_op(key, version)])
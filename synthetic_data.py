@@ -0,0 +1,182 @@
+"""Reproducible synthetic data for the NGO_Manager tables.
+
+    python synthetic_data.py --out /tmp/ngo_data --users 50000 --tasks 200000
+"""
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import auth
+import votes
+
+SKILLS = ['teaching', 'coding', 'design', 'social media', 'writing', 'event management', 'fundraising', 'leadership']
+DOMAINS = ['education', 'technology', 'creative', 'social media', 'on-ground', 'management', 'fundraising']
+AVAILABILITY = ['weekdays', 'weekends', 'evenings', 'mornings']
+TASK_STATUSES = ['unassigned', 'pending', 'in progress', 'completed']
+PRIORITIES = ['low', 'medium', 'high']
+EVENT_STATUSES = ['upcoming', 'completed', 'cancelled']
+IDEA_STATUSES = ['under review', 'approved', 'rejected']
+LOCATIONS = ['Community Hall, City Center', 'Public Park, West Side', 'Main Office', 'Riverside School', 'Online']
+
+DEFAULT_SIZES = {'users': 5000, 'tasks': 20000, 'events': 2000, 'attendance': 40000, 'ideas': 2000, 'votes': 20000}
+
+
+def _ids(prefix, n):
+    return np.char.add(prefix, np.char.zfill(np.arange(n).astype(str), 7))
+
+
+def _dates(rng, start, end, n):
+    start, end = np.datetime64(start), np.datetime64(end)
+    offsets = rng.integers(0, int((end - start).astype(int)) + 1, n)
+    return np.datetime_as_string(start + offsets.astype('timedelta64[D]'), unit='D')
+
+
+def _pick_sets(rng, vocabulary, n, mean):
+    # Comma-joined subsets with a Poisson-distributed size (at least one item)
+    counts = np.clip(rng.poisson(mean, n), 1, len(vocabulary))
+    order = np.argsort(rng.random((n, len(vocabulary))), axis=1)
+    vocabulary = np.array(vocabulary)
+    return [','.join(vocabulary[order[i, :counts[i]]]) for i in range(n)]
+
+
+def _popular(rng, ids, n, skew=1.2):
+    # Zipf-like draw so a few volunteers/events get most of the activity
+    weights = 1.0 / np.arange(1, len(ids) + 1) ** skew
+    return ids[rng.choice(len(ids), size=n, p=weights / weights.sum())]
+
+
+def generate(sizes=None, seed=0, start='2022-01-01', end='2026-12-31'):
+    """Return a dict of DataFrames with the same columns as data/*.csv."""
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = np.random.default_rng(seed)
+
+    n = sizes['users']
+    user_ids = _ids('vol', n)
+    user_ids[:max(1, n // 100)] = _ids('adm', max(1, n // 100))
+    roles = np.where(np.char.startswith(user_ids, 'adm'), 'admin', 'volunteer')
+    users = pd.DataFrame({
+        'user_id': user_ids,
+        'username': np.char.add('user', np.arange(n).astype(str)),
+        # Salt from the seeded generator too, so the same seed gives the same files
+        'password': auth.hash_password('password', salt=rng.bytes(auth.SALT_BYTES)),
+        'role': roles,
+        'name': np.char.add('Volunteer ', np.arange(n).astype(str)),
+        'email': np.char.add(np.char.add('user', np.arange(n).astype(str)), '@example.org'),
+        'phone': (9000000000 + rng.integers(0, 999999999, n)).astype(str),
+        'skills': _pick_sets(rng, SKILLS, n, 2),
+        'domains': _pick_sets(rng, DOMAINS, n, 2),
+        'availability': _pick_sets(rng, AVAILABILITY, n, 1),
+        'aadhar_verified': rng.random(n) < 0.6,
+        'aadhar_image': '',
+        'status': np.where(rng.random(n) < 0.9, 'active', 'inactive'),
+        'join_date': _dates(rng, start, end, n),
+        'birthday': _dates(rng, '1960-01-01', '2006-12-31', n),
+    })
+    volunteers = user_ids[roles == 'volunteer']
+    admins = user_ids[roles == 'admin']
+
+    n = sizes['tasks']
+    statuses = rng.choice(TASK_STATUSES, n, p=[0.1, 0.3, 0.2, 0.4])
+    assigned = np.where(statuses == 'unassigned', '', _popular(rng, volunteers, n, skew=0.6))
+    created = _dates(rng, start, end, n)
+    due = np.datetime_as_string(created.astype('datetime64[D]') + rng.integers(1, 60, n).astype('timedelta64[D]'), unit='D')
+    finished = created.astype('datetime64[D]') + rng.geometric(0.1, n).astype('timedelta64[D]')
+    completed = np.where(statuses == 'completed', np.datetime_as_string(finished, unit='D'), '')
+    tasks = pd.DataFrame({
+        'task_id': _ids('task', n),
+        'title': np.char.add('Task ', np.arange(n).astype(str)),
+        'description': 'Synthetic task description',
+        'assigned_to': assigned,
+        'status': statuses,
+        'due_date': due,
+        'domain': rng.choice(DOMAINS, n),
+        'priority': rng.choice(PRIORITIES, n, p=[0.4, 0.4, 0.2]),
+        'created_by': rng.choice(admins, n),
+        'created_date': created,
+        'completed_date': completed,
+        'flagged_overdue': '',
+    })
+
+    n = sizes['events']
+    event_ids = _ids('evt', n)
+    attendance_n = sizes['attendance']
+    att_events = _popular(rng, event_ids, attendance_n, skew=0.8)
+    att_users = _popular(rng, volunteers, attendance_n, skew=0.6)
+    pairs = pd.DataFrame({'event_id': att_events, 'user_id': att_users}).drop_duplicates()
+    participants = pairs.groupby('event_id')['user_id'].agg(','.join)
+    events = pd.DataFrame({
+        'event_id': event_ids,
+        'title': np.char.add('Event ', np.arange(n).astype(str)),
+        'description': 'Synthetic event description',
+        'date': _dates(rng, start, end, n),
+        'time': rng.choice(['09:00:00', '10:00:00', '14:00:00', '18:00:00'], n),
+        'location': rng.choice(LOCATIONS, n),
+        'coordinator': rng.choice(user_ids, n),
+        'participants': participants.reindex(event_ids).fillna('').to_numpy(),
+        'status': rng.choice(EVENT_STATUSES, n, p=[0.5, 0.45, 0.05]),
+        'created_by': rng.choice(admins, n),
+        'created_date': _dates(rng, start, end, n),
+    })
+
+    n = len(pairs)
+    attendance = pd.DataFrame({
+        'record_id': _ids('att', n),
+        'event_id': pairs['event_id'].to_numpy(),
+        'user_id': pairs['user_id'].to_numpy(),
+        'status': rng.choice(['confirmed', 'attended', 'no-show'], n, p=[0.5, 0.4, 0.1]),
+        'check_in': '',
+        'check_out': '',
+        'tasks': np.where(rng.random(n) < 0.3, 'registration,setup', ''),
+    })
+
+    n = sizes['ideas']
+    ideas = pd.DataFrame({
+        'idea_id': _ids('idea', n),
+        'title': np.char.add('Idea ', np.arange(n).astype(str)),
+        'description': 'Synthetic idea description',
+        'submitted_by': _popular(rng, volunteers, n),
+        'status': rng.choice(IDEA_STATUSES, n, p=[0.5, 0.3, 0.2]),
+        'submission_date': _dates(rng, start, end, n),
+        'comments': '',
+    })
+
+    # One vote per (idea, volunteer) pair, split over the vote tables by voter
+    n = sizes['votes']
+    pairs = pd.DataFrame({
+        'idea_id': _popular(rng, ideas['idea_id'].to_numpy(), n, skew=0.9),
+        'user_id': _popular(rng, volunteers, n, skew=0.6),
+    }).drop_duplicates(ignore_index=True)
+    voted = np.datetime64(start) + rng.integers(0, int((np.datetime64(end) - np.datetime64(start)).astype(int)) + 1,
+                                                len(pairs)).astype('timedelta64[D]')
+    votes_frame = pairs.assign(
+        vote_id=pairs['idea_id'] + ':' + pairs['user_id'],
+        voted_at=np.char.add(np.datetime_as_string(voted, unit='D'), 'T12:00:00+00:00'),
+    )[votes.COLUMNS]
+    shards = votes_frame['user_id'].map(votes.shard_of)
+
+    tables = {'users': users, 'tasks': tasks, 'events': events, 'attendance': attendance, 'ideas': ideas}
+    for name in votes.SHARDS:
+        tables[name] = votes_frame[shards == name]
+    return tables
+
+
+def write(tables, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, frame in tables.items():
+        frame.to_csv(os.path.join(out_dir, f'{name}.csv'), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help="directory to write the table CSVs into")
+    parser.add_argument('--seed', type=int, default=0)
+    for name, size in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=size)
+    args = parser.parse_args()
+    write(generate({name: getattr(args, name) for name in DEFAULT_SIZES}, seed=args.seed), args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import os
+
+import storage
+
+# Entries of a table are read and replaced under storage's lock for that table, so a
+# load here and a commit's write-through can never wait on each other, and a table
+# being loaded or written never holds up the others
+_cache = {}  # (table name, projected columns or None) -> (file signature, frame)
+_replaced = {}  # table name -> the full frame the latest ops were applied to
+_views = {}  # table name -> [(derived view, the lock its module reads it under)]
+
+
+def _signature(name):
+    # (inode, mtime, size) of the base file and its write-ahead log
+    signature = []
+    for path in (storage.table_path(name), storage.wal_path(name)):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _appended(old, new):
+    # True if the files have only changed by commits appended to the same log since old
+    if old[0] != new[0] or new[1] is None:
+        return False
+    return old[1] is None or (old[1][0] == new[1][0] and old[1][2] < new[1][2])
+
+
+def _tail(name, signature):
+    # (signature, ops) of the commits appended to the log since signature, or None if
+    # the files have changed some other way (a checkpoint, a cut-off torn write)
+    with storage._file_lock(name, shared=True):
+        current = _signature(name)
+        if not _appended(signature, current):
+            return None
+        transactions, end = storage._scan_log(storage.wal_path(name), signature[1][2] if signature[1] else 0)
+    if end != current[1][2]:
+        return None
+    return current, [op for txn in transactions for op in txn['ops']]
+
+
+def _freeze(frame):
+    # Shared between every session, so make accidental in-place edits fail loudly.
+    # Best effort: only numpy-backed blocks can be flagged read-only.
+    for block in getattr(frame._mgr, 'blocks', ()):
+        values = getattr(block.values, '_ndarray', block.values)
+        if hasattr(values, 'flags'):
+            values.flags.writeable = False
+    return frame
+
+
+def get_table(name, columns=None):
+    """Return the shared, read-only frame for a table, re-reading it only if its files changed.
+
+    With columns, only those columns (plus the key) are read and cached, separately
+    from the full table. Commits other processes have appended to the log are read
+    from where the cached frame left off and applied to it, and passed on to the
+    derived views as if made here; anything else re-reads the table.
+    """
+    key = (name, None if columns is None else tuple(columns))
+    with storage._table_lock(name):
+        signature = _signature(name)
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        tail = _tail(name, cached[0]) if cached is not None and _appended(cached[0], signature) else None
+        if tail is not None:
+            signature, ops = tail
+            frame = _freeze(storage.apply_ops(cached[1], name, ops, projected=columns is not None))
+            _cache[key] = (signature, frame)
+            if columns is None:
+                _replaced[name] = cached[1]
+                _update_views(name, ops)
+            return frame
+        frame = _freeze(storage.load_table(name, columns))
+        _cache[key] = (signature, frame)
+        return frame
+
+
+def invalidate(name=None):
+    for key in [k for k in list(_cache) if name is None or k[0] == name]:
+        with storage._table_lock(key[0]):
+            _cache.pop(key, None)
+
+
+def version(name):
+    # Changes whenever the cached frame for a table is replaced
+    with storage._table_lock(name):
+        cached = _cache.get((name, None))
+        return id(cached[1]) if cached is not None else None
+
+
+@storage.use_reader
+def _current(name):
+    return get_table(name)
+
+
+@storage.on_commit
+def _write_through(name, ops):
+    # Apply our own commits to the cached frames instead of re-parsing the file. The
+    # full frame is up to date with the files as they were just before the commit
+    # (commit reads row versions through get_table); a projection cached at another
+    # signature has missed other processes' writes, so it is left as it is and
+    # catches up from the log, this commit included, when next asked for
+    with storage._table_lock(name):
+        full = _cache.get((name, None))
+        before = full[0] if full is not None else None
+        _replaced[name] = full[1] if full is not None else None
+        signature = _signature(name)
+        for key, (cached_signature, frame) in list(_cache.items()):
+            if key[0] != name or cached_signature != before:
+                continue
+            frame = _freeze(storage.apply_ops(frame, name, ops, projected=key[1] is not None))
+            _cache[key] = (signature, frame)
+
+
+def peek(name):
+    # The cached frame as it is now, without checking the files
+    with storage._table_lock(name):
+        cached = _cache.get((name, None))
+        return None if cached is None else cached[1]
+
+
+class DerivedView:
+    # Something built from one table's full cached frame and kept up to date from its
+    # commits (aggregates, indexes, inboxes). Subclasses implement rebuild(frame) and
+    # apply(ops); modules register each view with derive() and read it through sync()
+    # under the same lock
+
+    def __init__(self):
+        self.source = None  # the cached frame this view describes
+
+    def rebuild(self, frame):
+        raise NotImplementedError
+
+    def apply(self, ops):
+        raise NotImplementedError
+
+    def sync(self, frame):
+        """The view as of frame, rebuilt unless it already describes it."""
+        if self.source is not frame:
+            # First use, or the table was re-read rather than moved on by commits
+            self.rebuild(frame)
+            self.source = frame
+        return self
+
+
+def derive(name, view, lock):
+    """Keep view up to date with the commits to table name; lock guards the view."""
+    _views.setdefault(name, []).append((view, lock))
+    return view
+
+
+@storage.on_commit
+def _update_views(name, ops):
+    # After _write_through, under the table's lock: ops made from the frame a view
+    # describes move it on to the new frame; a view built from any other frame has
+    # missed changes, so it is left to rebuild when next read
+    for view, lock in _views.get(name, ()):
+        with lock:
+            if view.source is None or view.source is not _replaced.get(name):
+                continue
+            view.apply(ops)
+            view.source = _cache[(name, None)][1]
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+import table_cache  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # An empty data directory for storage, with nothing cached from other tests
+    monkeypatch.setattr(storage, 'DATA_DIR', str(tmp_path))
+    storage._wal_tails.clear()
+    table_cache.invalidate()
+    yield tmp_path
+    storage._wal_tails.clear()
+    table_cache.invalidate()
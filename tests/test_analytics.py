@@ -0,0 +1,52 @@
+import pandas as pd
+
+import analytics
+
+USERS = pd.DataFrame({
+    'user_id': ['vol1', 'vol2', 'adm1'],
+    'role': ['volunteer', 'volunteer', 'admin'],
+    'join_date': ['2025-01-10', '2025-01-20', '2025-03-05'],
+})
+TASKS = pd.DataFrame({
+    'task_id': ['t1', 't2', 't3', 't4'],
+    'created_date': ['2025-01-12', '2025-02-01', '2025-03-06', '2025-03-10'],
+    'completed_date': ['2025-01-15', '2025-02-04', '2025-03-08', ''],
+    'status': ['completed', 'completed', 'completed', 'pending'],
+    'domain': ['education', 'education', 'technology', 'technology'],
+    'priority': ['high', 'low', 'high', 'low'],
+    'assigned_to': ['vol1', 'vol1', 'adm1', 'vol2'],
+})
+ATTENDANCE = pd.DataFrame({
+    'record_id': ['a1', 'a2', 'a3'],
+    'event_id': ['e1', 'e1', 'e2'],
+    'status': ['attended', 'no-show', 'registered'],
+})
+
+
+def _analytics():
+    return analytics.analytics(USERS, TASKS, ATTENDANCE)
+
+
+def test_retention_counts_volunteers_only():
+    # adm1 joined in a month with no volunteer joins and completed a task
+    table = _analytics().retention(max_months=2)
+    assert list(table.index) == ['2025-01']
+    assert table.loc['2025-01', 'volunteers'] == 2
+    assert table.loc['2025-01', 0] == 0.5
+    assert table.loc['2025-01', 1] == 0.5
+
+
+def test_throughput_latency_and_attendance():
+    result = _analytics()
+    monthly = result.throughput('day')
+    assert monthly['created'].sum() == 4 and monthly['completed'].sum() == 3
+    latency = result.completion_latency().set_index(['domain', 'priority'])
+    assert latency.loc[('education', 'high'), 'mean_days'] == 3
+    rates = result.attendance_rates().set_index('event_id')
+    assert rates.loc['e1', 'registered'] == 2 and rates.loc['e1', 'rate'] == 0.5
+
+
+def test_charts_render():
+    result = _analytics()
+    for name in analytics.CHARTS:
+        assert result.chart(name).startswith(b'\x89PNG')
@@ -0,0 +1,83 @@
+import hashlib
+
+import pandas as pd
+import pytest
+
+import auth
+import storage
+import table_cache
+
+
+def _users(passwords):
+    return pd.DataFrame({
+        'user_id': [f'vol{i}' for i in range(len(passwords))],
+        'username': [f'user{i}' for i in range(len(passwords))],
+        'password': passwords,
+        'role': 'volunteer',
+    })
+
+
+def _stored(user_id):
+    return table_cache.get_table('users').set_index('user_id').loc[user_id, 'password']
+
+
+@pytest.fixture
+def fresh_throttle(monkeypatch):
+    monkeypatch.setattr(auth, 'throttle', auth.Throttle())
+
+
+def test_login_with_full_cost_hash(data_dir, fresh_throttle):
+    storage.checkpoint('users', _users([auth.hash_password('secret')]))
+    users = table_cache.get_table('users')
+    assert auth.authenticate(users, 'user0', 'secret')['user_id'] == 'vol0'
+    assert auth.authenticate(users, 'user0', 'wrong') is None
+    assert auth.authenticate(users, 'nobody', 'secret') is None
+    assert _stored('vol0') == users.iloc[0]['password']
+
+
+def test_legacy_and_bulk_hashes_are_upgraded_on_login(data_dir, fresh_throttle):
+    legacy = hashlib.sha256(b'old').hexdigest()
+    bulk, = auth.hash_passwords(['new'])
+    assert bulk.startswith(f'scrypt${auth.BULK_SCRYPT_N}$')
+    storage.checkpoint('users', _users([legacy, bulk]))
+
+    assert auth.authenticate(table_cache.get_table('users'), 'user0', 'old') is not None
+    assert auth.authenticate(table_cache.get_table('users'), 'user1', 'new') is not None
+    for user_id, password in (('vol0', 'old'), ('vol1', 'new')):
+        assert _stored(user_id).startswith(f'scrypt${auth.SCRYPT_N}$')
+        assert auth._verify(password, _stored(user_id)) == (True, False)
+
+
+def test_rehash_is_skipped_when_the_hash_pool_is_full(data_dir, fresh_throttle, monkeypatch):
+    bulk, = auth.hash_passwords(['new'])
+    storage.checkpoint('users', _users([bulk]))
+
+    def busy(password, salt=None):
+        raise auth.LoginThrottled(retry_after=5)
+
+    monkeypatch.setattr(auth, 'hash_password', busy)
+    assert auth.authenticate(table_cache.get_table('users'), 'user0', 'new')['user_id'] == 'vol0'
+    assert _stored('vol0') == bulk
+
+
+def test_failed_attempts_are_throttled_per_user_and_ip(data_dir, fresh_throttle):
+    storage.checkpoint('users', _users([auth.hash_password('secret')] * 2))
+    users = table_cache.get_table('users')
+    for _ in range(auth.USER_ATTEMPTS):
+        assert auth.authenticate(users, 'user0', 'wrong', client_ip='10.0.0.1') is None
+    with pytest.raises(auth.LoginThrottled) as throttled:
+        auth.authenticate(users, 'user0', 'secret', client_ip='10.0.0.2')
+    assert throttled.value.retry_after > 0
+    # The other user from the same address still has attempts left
+    assert auth.authenticate(users, 'user1', 'secret', client_ip='10.0.0.1') is not None
+
+
+def test_token_bucket_refills():
+    bucket = auth.TokenBucket(capacity=2, refill_seconds=10)
+    bucket.updated = 0
+    bucket.take(0)
+    bucket.take(0)
+    assert bucket.retry_after(0) == 11
+    assert bucket.retry_after(10) == 0
+    assert not bucket.full(10)
+    assert bucket.full(20)
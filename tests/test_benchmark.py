@@ -0,0 +1,10 @@
+import benchmark
+
+SIZES = {'users': 60, 'tasks': 120, 'events': 20, 'attendance': 100, 'ideas': 20, 'votes': 50}
+
+
+def test_every_case_runs_on_small_data(monkeypatch):
+    monkeypatch.setattr(benchmark, 'CASES', {name: (fn, 1) for name, (fn, _) in benchmark.CASES.items()})
+    report = benchmark.run(SIZES, seed=1)
+    assert set(report['results']) == set(benchmark.CASES)
+    assert {row['table'] for row in report['memory']} >= {'users', 'tasks', 'events'}
@@ -0,0 +1,92 @@
+import io
+
+import pandas as pd
+
+import auth
+import bulk_io
+import storage
+import table_cache
+
+ROSTER = """username,password,name,email,role
+asha,pw1,Asha,asha@example.org,volunteer
+ravi,pw2,Ravi,ravi@example.org,admin
+asha,pw3,Asha Again,other@example.org,volunteer
+meena,pw4,Meena,ASHA@example.org,volunteer
+noemail,pw5,No Email,not-an-address,volunteer
+,pw6,No Username,blank@example.org,volunteer
+"""
+
+
+def _empty_users():
+    storage.checkpoint('users', pd.DataFrame(columns=bulk_io.USER_COLUMNS))
+
+
+def _import(text):
+    job = bulk_io.ImportJob(io.BytesIO(text.encode()))
+    job._thread.join()
+    return job
+
+
+def test_import_validates_and_deduplicates(data_dir):
+    _empty_users()
+    job = _import(ROSTER)
+    assert job.error is None
+    assert job.total == 6
+    assert (job.report['imported'], job.report['skipped']) == (2, 4)
+    assert sorted(number for number, _ in job.report['errors']) == [4, 5, 6, 7]
+
+    users = table_cache.get_table('users').set_index('username')
+    assert sorted(users.index) == ['asha', 'ravi']
+    assert users.loc['ravi', 'role'] == 'admin'
+    assert users.loc['asha', 'password'].startswith(f'scrypt${auth.BULK_SCRYPT_N}$')
+    # Folded into the base file straight away
+    assert not (data_dir / 'users.wal').exists()
+
+
+def test_imported_password_is_upgraded_on_first_login(data_dir, monkeypatch):
+    monkeypatch.setattr(auth, 'throttle', auth.Throttle())
+    _empty_users()
+    _import(ROSTER)
+    assert auth.authenticate(table_cache.get_table('users'), 'asha', 'pw1') is not None
+    stored = table_cache.get_table('users').set_index('username').loc['asha', 'password']
+    assert stored.startswith(f'scrypt${auth.SCRYPT_N}$')
+
+
+def test_import_with_nothing_new_writes_nothing(data_dir):
+    _empty_users()
+    _import(ROSTER)
+    sealed = storage.segments('users')
+    job = _import(ROSTER)
+    assert (job.report['imported'], job.report['skipped']) == (0, 6)
+    assert storage.segments('users') == sealed
+    assert not (data_dir / 'users.wal').exists()
+
+
+def test_unexpected_failure_is_kept_on_the_job(data_dir, monkeypatch):
+    _empty_users()
+
+    def broken(source, chunksize, progress=None):
+        raise KeyError('user_id')
+
+    monkeypatch.setattr(bulk_io, 'import_users', broken)
+    job = _import(ROSTER)
+    assert isinstance(job.error, KeyError)
+    assert job.report is None
+
+
+def test_missing_columns_are_reported(data_dir):
+    _empty_users()
+    job = _import("username,password\nasha,pw1\n")
+    assert isinstance(job.error, ValueError)
+    assert 'name' in str(job.error)
+
+
+def test_export_leaves_out_private_columns(data_dir):
+    _empty_users()
+    _import(ROSTER)
+    out = io.BytesIO()
+    bulk_io.export_table('users', out)
+    exported = pd.read_csv(io.BytesIO(out.getvalue()))
+    assert sorted(exported['username']) == ['asha', 'ravi']
+    assert 'password' not in exported.columns
+    assert storage.VERSION_COLUMN not in exported.columns
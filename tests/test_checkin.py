@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import checkin
+import storage
+import table_cache
+
+
+@pytest.fixture
+def attendance(data_dir, monkeypatch):
+    # Forty registrations for evt1 and one for evt2, signed with a fixed key
+    monkeypatch.setattr(checkin, '_secret', b'test key')
+    storage.checkpoint('attendance', pd.DataFrame({
+        'record_id': [f'att{i}' for i in range(41)],
+        'event_id': ['evt1'] * 40 + ['evt2'],
+        'user_id': [f'vol{i}' for i in range(41)],
+        'status': 'registered',
+        'check_in': '',
+        'check_out': '',
+    }))
+    yield
+    assert checkin.flush(timeout=10)
+
+
+def _row(record_id):
+    return table_cache.get_table('attendance').set_index('record_id').loc[record_id]
+
+
+def test_codes_are_signed(attendance):
+    code = checkin.token('att1')
+    assert checkin.record_of(code) == 'att1'
+    assert checkin.record_of(code.upper()) is None
+    assert checkin.record_of('att2' + code[4:]) is None
+    assert checkin.scan('att1-0000000000') == ('invalid', None)
+
+
+def test_scan_outcomes(attendance):
+    code = checkin.token('att1')
+    assert checkin.scan(checkin.token('att1'), checkin.CHECK_OUT)[0] == 'not_checked_in'
+    assert checkin.scan(code, event_id='evt2')[0] == 'wrong_event'
+    outcome, row = checkin.scan(code, event_id='evt1')
+    assert outcome == 'checked_in' and row['check_in']
+    assert checkin.scan(code)[0] == 'duplicate'
+    assert checkin.roster().headcount('evt1') == (40, 1, 1)
+    assert checkin.scan(code, checkin.CHECK_OUT)[0] == 'checked_out'
+    assert checkin.scan(code, checkin.CHECK_OUT)[0] == 'duplicate'
+    assert checkin.roster().headcount('evt1') == (40, 1, 0)
+
+    assert checkin.flush(timeout=10)
+    assert _row('att1')['status'] == 'attended'
+    assert _row('att1')['check_out']
+
+
+def test_scans_arriving_together_share_a_commit(attendance, monkeypatch):
+    commits = []
+    commit = storage.commit
+    monkeypatch.setattr(storage, 'commit', lambda name, ops: commits.append(len(ops)) or commit(name, ops))
+    for i in range(40):
+        assert checkin.scan(checkin.token(f'att{i}'))[0] == 'checked_in'
+    assert checkin.flush(timeout=10)
+    assert sum(commits) == 40
+    assert len(commits) < 5
+    assert checkin.roster().headcount('evt1') == (40, 40, 40)
+
+
+def test_unwritten_scans_survive_a_reload(attendance, monkeypatch):
+    start_writer = checkin._start_writer
+    monkeypatch.setattr(checkin, '_start_writer', lambda: None)
+    checkin.scan(checkin.token('att1'))
+    # A re-read table, as after another process's checkpoint, makes the roster rebuild
+    table_cache.invalidate('attendance')
+    assert checkin.roster().headcount('evt1') == (40, 1, 1)
+    monkeypatch.setattr(checkin, '_start_writer', start_writer)
+    with checkin._lock:
+        start_writer()
+    assert checkin.flush(timeout=10)
+    assert _row('att1')['check_in']
+
+
+def test_a_record_checked_in_elsewhere_keeps_its_time(attendance):
+    storage.update('attendance', 'att2', {'check_in': '2025-06-01T09:00:00', 'status': 'attended'})
+    checkin._write({'att2': {'check_in': '2025-06-01T09:05:00', 'status': 'attended'}})
+    assert _row('att2')['check_in'] == '2025-06-01T09:00:00'
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+
+import matching
+import storage
+import table_cache
+
+
+def _users():
+    return pd.DataFrame({
+        'user_id': ['adm', 'coder', 'writer', 'idle', 'away'],
+        'role': ['admin', 'volunteer', 'volunteer', 'volunteer', 'volunteer'],
+        'name': ['Admin', 'Coder', 'Writer', 'Idle', 'Away'],
+        'status': ['active', 'active', 'active', 'active', 'inactive'],
+        'aadhar_verified': [True, True, False, False, True],
+        'skills': ['coding', 'Coding, Design', 'writing', '', 'coding,design'],
+        'domains': ['technology', 'technology', 'education,creative', '', 'technology'],
+        'availability': ['', 'weekends', 'weekdays', '', 'weekends'],
+    })
+
+
+def _tasks(assigned=()):
+    return pd.DataFrame({
+        'task_id': [f'task{i}' for i in range(len(assigned))],
+        'assigned_to': list(assigned),
+        'status': 'pending',
+    })
+
+
+def test_scores_weigh_domain_skills_availability_and_verification():
+    scores = dict(zip(matching.volunteer_matrix(_users()).user_ids,
+                      matching.score_volunteers(_users(), _tasks(), 'Technology')))
+    assert 'adm' not in scores
+    assert scores['coder'] == (matching.DOMAIN_WEIGHT + 2 * matching.SKILL_WEIGHT
+                               + matching.AVAILABILITY_WEIGHT + matching.VERIFIED_WEIGHT)
+    assert scores['writer'] == matching.AVAILABILITY_WEIGHT
+    assert scores['idle'] == 0
+    assert scores['away'] == matching.INACTIVE_SCORE
+
+
+def test_open_tasks_lower_the_score():
+    users = _users()
+    free = matching.rank_volunteers(users, _tasks(), 'technology', top_k=2)
+    busy = matching.rank_volunteers(users, _tasks(['coder'] * 3 + ['writer']), 'technology', top_k=2)
+    assert free['user_id'].tolist() == ['coder', 'writer']
+    assert busy['score'].tolist() == [free['score'].iloc[0] - 3 * matching.WORKLOAD_WEIGHT,
+                                      free['score'].iloc[1] - matching.WORKLOAD_WEIGHT]
+
+
+def test_smart_match_needs_a_positive_score():
+    users = _users()
+    assert matching.smart_match_volunteer(users, _tasks(), 'technology', 'high') == 'coder'
+    nobody = users.assign(status='inactive')
+    assert matching.smart_match_volunteer(nobody, _tasks(), 'technology', 'high') == ''
+
+
+def _pair_users():
+    # ace suits both domains; tech only technology
+    return pd.DataFrame({
+        'user_id': ['ace', 'tech'], 'role': 'volunteer', 'name': ['Ace', 'Tech'], 'status': 'active',
+        'aadhar_verified': False, 'skills': ['coding,teaching', ''],
+        'domains': ['technology,education', 'technology'], 'availability': ['weekends', ''],
+    })
+
+
+def _backlog():
+    return pd.DataFrame({
+        'task_id': ['urgent', 'lesson'], 'assigned_to': [None, None], 'status': 'unassigned',
+        'domain': ['technology', 'education'], 'priority': ['high', 'medium'],
+        'due_date': ['2025-06-01', '2025-06-01'],
+    })
+
+
+def _plan(users, tasks, **kwargs):
+    plan = matching.assign_unassigned(users, tasks, **kwargs)
+    return dict(zip(plan['task_id'], plan['user_id']))
+
+
+def test_batch_assignment_beats_greedy_order(monkeypatch):
+    users, tasks = _pair_users(), _backlog()
+    assert _plan(users, tasks, capacity=1) == {'urgent': 'tech', 'lesson': 'ace'}
+    monkeypatch.setattr(matching, 'linear_sum_assignment', None)
+    # Greedy hands the urgent task to ace and leaves the lesson without anyone suitable
+    assert _plan(users, tasks, capacity=1) == {'urgent': 'ace'}
+
+
+def test_batch_assignment_respects_capacity():
+    users = _pair_users()
+    tasks = pd.concat([_backlog(), pd.DataFrame({'task_id': ['held'], 'assigned_to': ['ace'], 'status': 'pending',
+                                                 'domain': ['education'], 'priority': ['low'],
+                                                 'due_date': ['2025-06-01']})], ignore_index=True)
+    assert _plan(users, tasks, capacity=1) == {'urgent': 'tech'}
+
+
+def test_assignments_commit_together_or_not_at_all(data_dir):
+    storage.checkpoint('tasks', _backlog())
+    tasks = table_cache.get_table('tasks')
+    plan = matching.assign_unassigned(_pair_users(), tasks, capacity=1)
+    storage.update('tasks', 'lesson', {'title': 'Edited meanwhile'})
+    with pytest.raises(storage.ConflictError):
+        matching.commit_assignments(plan)
+    assert set(table_cache.get_table('tasks')['status']) == {'unassigned'}
+
+    matching.commit_assignments(matching.assign_unassigned(_pair_users(), table_cache.get_table('tasks'), capacity=1))
+    assigned = table_cache.get_table('tasks').set_index('task_id')
+    assert assigned.loc['lesson', 'assigned_to'] == 'ace'
+    assert set(assigned['status']) == {'pending'}
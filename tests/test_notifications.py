@@ -0,0 +1,143 @@
+import datetime
+import smtplib
+
+import pandas as pd
+import pytest
+
+import notifications
+
+
+class FakeTransport:
+    # Stands in for the SMTP server: keeps what was sent, or refuses some addresses
+
+    def __init__(self, refuse=(), down=False):
+        self.refuse = set(refuse)
+        self.down = down
+        self.sent = []
+        self.closed = False
+
+    def send(self, message):
+        if self.down:
+            raise ConnectionRefusedError("no server")
+        if message['To'] in self.refuse:
+            raise smtplib.SMTPRecipientsRefused({message['To']: (550, b'No such user')})
+        self.sent.append(message)
+
+    def close(self):
+        self.closed = True
+
+
+def _users():
+    return pd.DataFrame({
+        'user_id': ['vol1', 'vol2', 'vol3'],
+        'username': ['asha', 'ravi', 'meena'],
+        'name': ['Asha', 'Ravi', 'Meena'],
+        'email': ['asha@example.org', 'ravi@example.org', ''],
+    })
+
+
+@pytest.fixture
+def table(data_dir):
+    notifications.create_table()
+
+
+def _outbox():
+    return {user_id: len(keys) for user_id, keys in notifications.inbox().outbox.items() if keys}
+
+
+def test_fan_out_and_unread_counts(table):
+    assert notifications.notify(['vol1', 'vol2', 'vol1', ''], notifications.REMINDER, "Meeting at 5") == 2
+    notifications.notify_each(notifications.TASK_ASSIGNED, [('vol1', "First task"), ('vol1', "Second task")])
+    box = notifications.inbox()
+    assert (box.unread('vol1'), box.unread('vol2'), box.unread('vol3')) == (3, 1, 0)
+    assert [item['message'] for item in box.latest('vol1', 2)] == ["Second task", "First task"]
+
+    first = box.latest('vol1')[-1]['notification_id']
+    assert notifications.mark_read('vol1', [first]) == 1
+    assert notifications.inbox().unread('vol1') == 2
+    assert notifications.mark_read('vol1') == 2
+    assert notifications.inbox().unread('vol1') == 0
+    assert notifications.inbox().unread('vol2') == 1
+
+
+def test_purge_deletes_only_old_read_notifications(table):
+    notifications.notify(['vol1', 'vol2'], notifications.REMINDER, "Old news")
+    notifications.mark_read('vol1')
+    today = datetime.date.today()
+    assert notifications.purge_read(today) == 0
+    assert notifications.purge_read(today + datetime.timedelta(days=1)) == 1
+    box = notifications.inbox()
+    assert box.latest('vol1') == [] and box.unread('vol2') == 1
+
+
+def test_digests_go_out_once(table):
+    notifications.notify(['vol1', 'vol2', 'vol3'], notifications.REMINDER, "Beach cleanup on Sunday")
+    transport = FakeTransport()
+    assert notifications.send_digests(_users(), transport) == 2
+    assert transport.closed
+    assert sorted(message['To'] for message in transport.sent) == ['asha@example.org', 'ravi@example.org']
+    assert "Beach cleanup on Sunday" in transport.sent[0].get_content()
+    # Meena has no address, so hers waits in the outbox
+    assert _outbox() == {'vol3': 1}
+    assert notifications.send_digests(_users(), FakeTransport()) == 0
+
+
+def test_digest_lists_the_newest_items(table, monkeypatch):
+    monkeypatch.setattr(notifications, 'DIGEST_ITEMS', 3)
+    notifications.notify_each(notifications.REMINDER, [('vol1', f"Item {i}") for i in range(5)])
+    transport = FakeTransport()
+    notifications.send_digests(_users(), transport)
+    body = transport.sent[0].get_content()
+    assert transport.sent[0]['Subject'] == "You have 5 new notifications"
+    assert "Item 4" in body and "Item 2" in body and "Item 1" not in body
+    assert "... and 2 more" in body
+
+
+def test_undelivered_digests_are_put_back(table):
+    notifications.notify(['vol1', 'vol2'], notifications.REMINDER, "Hello")
+    assert notifications.send_digests(_users(), FakeTransport(refuse={'asha@example.org'})) == 1
+    assert _outbox() == {'vol1': 1}
+    assert notifications.send_digests(_users(), FakeTransport(down=True)) == 0
+    assert _outbox() == {'vol1': 1}
+    assert notifications.send_digests(_users(), FakeTransport()) == 1
+    assert _outbox() == {}
+
+
+def test_smtp_transport_opens_one_session(monkeypatch):
+    sessions = []
+
+    class FakeSMTP:
+        def __init__(self, host, port, timeout):
+            self.calls = [('connect', host, port)]
+            sessions.append(self)
+
+        def starttls(self):
+            self.calls.append(('starttls',))
+
+        def login(self, username, password):
+            self.calls.append(('login', username))
+
+        def send_message(self, message):
+            self.calls.append(('send', message['To']))
+
+        def quit(self):
+            raise smtplib.SMTPServerDisconnected("already gone")
+
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    transport = notifications.SmtpTransport('mail.example.org', 587, 'ngo', 'secret', starttls=True)
+    for email in ('a@example.org', 'b@example.org'):
+        transport.send(notifications._digest(email, 'A', [{'created_at': '2025-06-01T10:00', 'message': 'Hi'}]))
+    transport.close()
+    assert len(sessions) == 1
+    assert sessions[0].calls == [('connect', 'mail.example.org', 587), ('starttls',), ('login', 'ngo'),
+                                 ('send', 'a@example.org'), ('send', 'b@example.org')]
+    assert transport._smtp is None
+
+
+def test_no_transport_without_a_configured_server(monkeypatch):
+    monkeypatch.delenv('NGO_SMTP_HOST', raising=False)
+    assert notifications.default_transport() is None
+    monkeypatch.setenv('NGO_SMTP_HOST', 'mail.example.org')
+    monkeypatch.setenv('NGO_SMTP_STARTTLS', 'true')
+    transport = notifications.default_transport()
+    assert (transport.host, transport.port, transport.starttls) == ('mail.example.org', 25, True)
@@ -0,0 +1,96 @@
+import logging
+import datetime
+
+import pandas as pd
+
+import stats
+import storage
+import scheduler
+
+TODAY = datetime.date(2025, 6, 10)
+
+
+def _sweep(days_ahead=0, catch_up=False, backfill=False):
+    return scheduler.Sweep('test', days_ahead, None, None, catch_up=catch_up, backfill=backfill)
+
+
+def _day(n):
+    return TODAY + datetime.timedelta(days=n)
+
+
+def test_window_first_run():
+    assert _sweep(1).window(None, TODAY) == (_day(1), _day(1))
+    assert _sweep(-1, catch_up=True, backfill=True).window(None, TODAY) == (None, _day(-1))
+
+
+def test_window_up_to_date():
+    assert _sweep(0).window(TODAY, TODAY) is None
+    assert _sweep(1).window(_day(1), TODAY) is None
+    assert _sweep(-1).window(_day(-1), TODAY) is None
+
+
+def test_window_after_missed_days():
+    # Three days without a run: catch-up sweeps cover them, the others only the latest
+    assert _sweep(-1, catch_up=True).window(_day(-4), TODAY) == (_day(-3), _day(-1))
+    assert _sweep(1).window(_day(-2), TODAY) == (_day(1), _day(1))
+
+
+def test_leap_day_birthdays():
+    users = pd.DataFrame({'user_id': ['leap', 'eve'], 'name': ['Leap', 'Eve'], 'status': 'active',
+                          'birthday': ['1992-02-29', '1990-02-28']})
+    assert stats.birthdays_on(users, datetime.date(2025, 2, 28)) == ['eve', 'leap']
+    assert stats.birthdays_on(users, datetime.date(2024, 2, 28)) == ['eve']
+    assert stats.birthdays_on(users, datetime.date(2024, 2, 29)) == ['leap']
+
+
+def test_claimed_sweep_is_not_run_twice(data_dir):
+    sweep = _sweep(0)
+    assert scheduler._claim(sweep, TODAY) == (TODAY, TODAY)
+    assert scheduler._claim(sweep, TODAY) is None
+    scheduler._release(sweep, TODAY)
+    assert scheduler._claim(sweep, TODAY) is None
+    assert scheduler._claim(sweep, _day(1)) == (_day(1), _day(1))
+
+
+def test_history_is_scrubbed_only_after_a_secret_changes(data_dir, monkeypatch):
+    storage.checkpoint('users', pd.DataFrame({'user_id': ['vol0', 'vol1'], 'username': ['a', 'b'],
+                                              'password': ['old0', 'old1'], 'name': ['A', 'B']}))
+    scrubs = []
+    scrub_history = storage.scrub_history
+    monkeypatch.setattr(storage, 'scrub_history', lambda *args: scrubs.append(args) or scrub_history(*args))
+
+    def scrub():
+        return scheduler._scrub_secrets(scheduler._secrets_replaced(None, TODAY), TODAY)
+
+    storage.update('users', 'vol0', {'name': 'Renamed'})
+    assert scrub() == 0 and scrubs == []
+    storage.update('users', 'vol0', {'password': 'new0'})
+    assert scrub() == 1 and len(scrubs) == 1
+    assert scrub() == 0 and len(scrubs) == 1
+    storage.delete('users', 'vol1')
+    assert scrub() == 1 and len(scrubs) == 2
+
+
+def test_failures_are_logged(data_dir, monkeypatch, caplog):
+    def broken(start, end):
+        raise RuntimeError('no table')
+
+    monkeypatch.setattr(scheduler, 'SWEEPS', [scheduler.Sweep('broken', 0, broken, None)])
+    with caplog.at_level(logging.ERROR, logger='scheduler'):
+        done = scheduler.run_pending(TODAY)
+    assert isinstance(done['broken'], RuntimeError)
+    assert 'Sweep broken failed' in caplog.text
+    # Not recorded as swept, so the next run tries again
+    assert scheduler._claim(scheduler.SWEEPS[0], TODAY) == (TODAY, TODAY)
+
+    def failing_run(today=None):
+        scheduler._stop.set()
+        raise OSError('data directory is read-only')
+
+    monkeypatch.setattr(scheduler, 'run_pending', failing_run)
+    caplog.clear()
+    with caplog.at_level(logging.ERROR, logger='scheduler'):
+        scheduler._run()
+    scheduler._stop.clear()
+    storage.set_actor(None)
+    assert 'read-only' in caplog.text
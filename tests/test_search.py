@@ -0,0 +1,66 @@
+import pandas as pd
+
+import search
+import storage
+import table_cache
+
+
+def _tasks():
+    return pd.DataFrame({
+        'task_id': ['inner', 'title', 'described', 'other'],
+        'title': ['Feed the animals', 'Zebra crossing repaint', 'Count the herd', 'Beach cleanup'],
+        'description': ['Bring xzebra feed', '', 'Zebras near the lake', 'Bring gloves'],
+        'status': 'pending',
+    })
+
+
+def _search(query, **kwargs):
+    return [key for _, key, _ in search.index('tasks', table_cache.get_table('tasks')).search(query, **kwargs)]
+
+
+def test_title_and_word_starts_rank_first(data_dir):
+    storage.checkpoint('tasks', _tasks())
+    hits = search.index('tasks', table_cache.get_table('tasks')).search('zebra')
+    assert [(score, key) for score, key, _ in hits] == [
+        (search.TITLE_WEIGHT + search.WORD_START_BONUS, 'title'),
+        (search.FIELD_WEIGHT + search.WORD_START_BONUS, 'described'),
+        (search.FIELD_WEIGHT, 'inner'),
+    ]
+    assert hits[0][2] == 'Zebra crossing repaint'
+    assert _search('zebra', limit=1) == ['title']
+
+
+def test_every_word_must_match(data_dir):
+    storage.checkpoint('tasks', _tasks())
+    assert _search('bring feed') == ['inner']
+    assert _search('bring lake') == []
+    assert _search('zebra', allowed={'inner', 'other'}) == ['inner']
+
+
+def test_commits_update_the_index_without_a_rebuild(data_dir, monkeypatch):
+    storage.checkpoint('tasks', _tasks())
+    assert _search('repaint') == ['title']
+    rebuilds = []
+    rebuild = search.SearchIndex.rebuild
+    monkeypatch.setattr(search.SearchIndex, 'rebuild', lambda self, frame: rebuilds.append(1) or rebuild(self, frame))
+
+    storage.update('tasks', 'title', {'title': 'Zebra crossing survey'})
+    storage.insert('tasks', {'task_id': 'new', 'title': 'Repaint the hall', 'description': '', 'status': 'pending'})
+    storage.delete('tasks', 'other')
+    assert _search('repaint') == ['new']
+    assert _search('survey') == ['title']
+    assert _search('beach') == []
+    assert rebuilds == []
+
+
+def test_compaction_keeps_results(data_dir, monkeypatch):
+    monkeypatch.setattr(search, 'COMPACT_POSTINGS', 50)
+    storage.checkpoint('tasks', _tasks())
+    _search('zebra')
+    for i in range(20):
+        storage.insert('tasks', {'task_id': f'extra{i}', 'title': f'Zebra census {i}', 'description': '',
+                                 'status': 'pending'})
+    index = search.index('tasks', table_cache.get_table('tasks'))
+    assert index.delta_size < 50
+    assert len(index.keys_matching('zebra census')) == 20
+    assert _search('crossing') == ['title']
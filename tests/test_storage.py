@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+import storage
+import changelog
+
+
+def _tasks(n):
+    return pd.DataFrame({
+        'task_id': [f'task{i}' for i in range(n)],
+        'title': [f'Task {i}' for i in range(n)],
+        'status': 'pending',
+        'due_date': '2025-06-01',
+    })
+
+
+def _rows(frame):
+    return frame.drop(columns=storage.VERSION_COLUMN).sort_values('task_id').astype(str).values.tolist()
+
+
+def test_replay_and_checkpoint_round_trip(data_dir):
+    storage.checkpoint('tasks', _tasks(3))
+    storage.insert('tasks', {'task_id': 'task9', 'title': 'New', 'status': 'pending', 'due_date': '2025-07-01'})
+    storage.update('tasks', 'task1', {'status': 'completed'})
+    storage.delete('tasks', 'task2')
+
+    replayed = storage.load_table('tasks')
+    assert sorted(replayed['task_id']) == ['task0', 'task1', 'task9']
+    assert replayed.set_index('task_id').loc['task1', 'status'] == 'completed'
+
+    storage.checkpoint('tasks')
+    assert not (data_dir / 'tasks.wal').exists()
+    assert _rows(storage.load_table('tasks')) == _rows(replayed)
+    assert changelog.verify('tasks')
+    assert [change['op'] for change in changelog.history('tasks', 'task1')] == ['update']
+
+
+def test_versions_and_conflicts(data_dir):
+    storage.checkpoint('tasks', _tasks(1))
+    row = storage.load_table('tasks').iloc[0]
+    seen = storage.row_version(row)
+    assert storage.update('tasks', 'task0', {'title': 'First'}, seen) == seen + 1
+    with pytest.raises(storage.ConflictError) as error:
+        storage.update('tasks', 'task0', {'title': 'Second'}, seen)
+    assert error.value.keys == ['task0']
+    assert storage.load_table('tasks').iloc[0]['title'] == 'First'
+
+
+def test_torn_log_line_is_ignored(data_dir):
+    storage.checkpoint('tasks', _tasks(1))
+    storage.update('tasks', 'task0', {'title': 'Kept'})
+    with open(data_dir / 'tasks.wal', 'a') as f:
+        f.write('{"seq": 99, "ops": [')
+    assert storage.load_table('tasks').iloc[0]['title'] == 'Kept'
+    storage.update('tasks', 'task0', {'title': 'After'})
+    assert storage.load_table('tasks').iloc[0]['title'] == 'After'
+
+
+def test_history_keeps_only_the_newest_snapshots(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, 'SNAPSHOT_EVERY', 2)
+    storage.checkpoint('tasks', _tasks(2))
+    for i in range(12):
+        storage.update('tasks', 'task0', {'title': f'Edit {i}'})
+        storage.checkpoint('tasks')
+
+    taken = storage.snapshots('tasks')
+    assert len(taken) == storage.KEEP_SNAPSHOTS
+    assert all(first > taken[0][0] for first, _, _ in storage.segments('tasks'))
+    assert changelog.verify('tasks')
+    assert changelog.rebuild('tasks', taken[0][0]).set_index('task_id').loc['task0', 'title'] != 'Edit 11'
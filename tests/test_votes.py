@@ -0,0 +1,60 @@
+import datetime
+
+import pytest
+
+import votes
+import storage
+
+NOW = datetime.datetime(2025, 6, 10, 12, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def clock(data_dir, monkeypatch):
+    # Vote tables in an empty data directory, voting at a time the test moves on
+    votes.create_tables()
+    now = [NOW]
+    monkeypatch.setattr(votes, '_now', lambda: now[0])
+    return now
+
+
+def _trending(**kwargs):
+    return [idea_id for idea_id, _, _ in votes.board().trending(now=NOW, **kwargs)]
+
+
+def test_one_vote_per_user_and_idea(clock):
+    assert votes.cast('idea1', 'vol1')
+    assert not votes.cast('idea1', 'vol1')
+    assert votes.cast('idea2', 'vol1')
+    assert votes.cast('idea1', 'vol2')
+    board = votes.board()
+    assert board.count('idea1') == 2
+    assert board.counts() == {'idea1': 2, 'idea2': 1}
+    assert board.has_voted('idea2', 'vol1') and not board.has_voted('idea2', 'vol2')
+
+
+def test_recent_votes_outrank_older_ones(clock):
+    clock[0] = NOW - datetime.timedelta(days=10)
+    for user in ('vol1', 'vol2', 'vol3'):
+        votes.cast('old', user)
+    clock[0] = NOW
+    votes.cast('new', 'vol4')
+    trending = votes.board().trending(now=NOW)
+    assert [idea_id for idea_id, _, _ in trending] == ['new', 'old']
+    assert trending[0][1:] == (1, 1.0)
+    # Ten days is 3.3 half-lives: three votes are worth about 0.3 of one now
+    assert trending[1][1] == 3 and 0.2 < trending[1][2] < 0.4
+
+
+def test_ranking_follows_votes_and_clean_ups(clock):
+    votes.cast('a', 'vol1')
+    assert _trending() == ['a']
+    votes.cast('b', 'vol1')
+    votes.cast('b', 'vol2')
+    assert _trending() == ['b', 'a']
+    assert _trending(keep=lambda idea_id: idea_id != 'b') == ['a']
+
+    # An admin removing votes leaves the ranking to be worked out again
+    for user in ('vol1', 'vol2'):
+        storage.delete(votes.shard_of(user), votes.vote_id('b', user))
+    assert _trending() == ['a']
+    assert votes.board().count('b') == 0
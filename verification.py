@@ -0,0 +1,169 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from PIL import Image
+
+import schema
+import blobstore
+import table_cache
+
+THUMB_DIR = os.path.join('public', 'uploads', 'thumbs')
+THUMB_SIZE = (360, 240)
+THUMB_QUALITY = 80
+
+# Thumbnails are made off the script thread; a couple of workers keep a page's
+# worth of decoding from starving the app of CPU
+THUMB_WORKERS = 2
+
+_lock = threading.RLock()
+_pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix='thumbnail')
+_in_flight = {}  # digest -> Future
+_unreadable = set()  # digests Pillow cannot open (PDFs, corrupt uploads)
+
+
+class Queue(table_cache.DerivedView):
+    # Users waiting for Aadhaar verification: not verified and with an uploaded image.
+    # Keeps the three columns that decide membership for every user, so an update to
+    # either of them moves a user in or out without looking at the frame
+
+    def __init__(self):
+        super().__init__()
+        self.rows = {}  # user_id -> (verified, image digest, join date)
+        self.pending = set()
+        self._order = None  # sorted pending ids, rebuilt lazily after a change
+
+    def _state(self, row):
+        return (schema.to_text(row.get('aadhar_verified')).strip().lower() in schema.TRUE_VALUES,
+                schema.to_text(row.get('aadhar_image')).strip(), schema.to_text(row.get('join_date'))[:10])
+
+    def _set(self, key, state):
+        self.rows[key] = state
+        if not state[0] and state[1]:
+            self.pending.add(key)
+        else:
+            self.pending.discard(key)
+
+    def rebuild(self, frame):
+        self.rows = {}
+        self.pending = set()
+        columns = ['aadhar_verified', 'aadhar_image', 'join_date']
+        values = [frame[c].tolist() if c in frame.columns else [None] * len(frame) for c in columns]
+        for key, row in zip(frame['user_id'].astype(str), zip(*values)):
+            self._set(key, self._state(dict(zip(columns, row))))
+        self._order = None
+
+    def apply(self, ops):
+        for op in ops:
+            key = op['key']
+            if op['op'] == 'insert':
+                self._set(key, self._state(op['row']))
+            elif op['op'] == 'update':
+                old = self.rows.get(key)
+                if old is None:
+                    continue
+                row = dict(zip(['aadhar_verified', 'aadhar_image', 'join_date'], old))
+                self._set(key, self._state({**row, **op['changes']}))
+            elif op['op'] == 'delete':
+                self.rows.pop(key, None)
+                self.pending.discard(key)
+        self._order = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def user_ids(self):
+        """Pending user ids, longest-waiting members first."""
+        if self._order is None:
+            self._order = sorted(self.pending, key=lambda key: (self.rows[key][2], key))
+        return self._order
+
+    def image(self, user_id):
+        row = self.rows.get(str(user_id))
+        return row[1] if row else ''
+
+
+_queue = table_cache.derive('users', Queue(), _lock)
+
+
+def queue(users):
+    """The verification queue for this version of the users frame."""
+    with _lock:
+        return _queue.sync(users)
+
+
+def thumbnail_path(digest):
+    # Keyed by the image's content digest, so a cached thumbnail is never stale
+    return os.path.join(THUMB_DIR, digest[:2], f'{digest}.jpg')
+
+
+def _make_thumbnail(digest):
+    path = thumbnail_path(digest)
+    if os.path.exists(path):
+        return path
+    try:
+        with blobstore.open_blob(digest) as f, Image.open(f) as image:
+            # JPEGs are decoded straight at a reduced scale instead of at full resolution
+            image.draft('RGB', THUMB_SIZE)
+            image = image.convert('RGB')
+            image.thumbnail(THUMB_SIZE)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            image.save(tmp_path, 'JPEG', quality=THUMB_QUALITY)
+            os.replace(tmp_path, path)
+    except (OSError, KeyError, Image.DecompressionBombError):
+        # Not an image Pillow can read (e.g. a PDF), or the blob is missing
+        with _lock:
+            _unreadable.add(digest)
+        return None
+    return path
+
+
+def _done(digest, future):
+    with _lock:
+        if _in_flight.get(digest) is future:
+            del _in_flight[digest]
+
+
+def _submit(digest):
+    # Caller holds _lock
+    future = _in_flight.get(digest)
+    if future is None:
+        future = _in_flight[digest] = _pool.submit(_make_thumbnail, digest)
+        future.add_done_callback(lambda f, digest=digest: _done(digest, f))
+    return future
+
+
+def prefetch(digests):
+    """Start making thumbnails for digests that have none yet, without waiting."""
+    with _lock:
+        for digest in digests:
+            if blobstore.is_digest(digest) and digest not in _unreadable and not os.path.exists(thumbnail_path(digest)):
+                _submit(digest)
+
+
+def thumbnails(digests, timeout=None):
+    """digest -> thumbnail path, or None where there is no preview (yet).
+
+    Waits up to timeout seconds in total for thumbnails still being made.
+    """
+    found = {}
+    futures = {}
+    with _lock:
+        for digest in digests:
+            if not blobstore.is_digest(digest) or digest in _unreadable:
+                found[digest] = None
+            elif os.path.exists(thumbnail_path(digest)):
+                found[digest] = thumbnail_path(digest)
+            else:
+                futures[digest] = _submit(digest)
+    if futures:
+        wait(futures.values(), timeout=timeout)
+    for digest, future in futures.items():
+        found[digest] = future.result() if future.done() else None
+    return found
+
+
+def has_preview(digest):
+    # False once Pillow has failed to read the file
+    return digest not in _unreadable
@@ -0,0 +1,191 @@
+import math
+import zlib
+import heapq
+import datetime
+import threading
+from collections import Counter
+
+import pandas as pd
+
+import schema
+import storage
+import table_cache
+
+SHARDS = [f'votes_{shard}' for shard in range(schema.VOTE_SHARDS)]
+COLUMNS = [c for c in schema.SCHEMAS[SHARDS[0]] if c != storage.VERSION_COLUMN]
+
+# Trending weighs each vote by 2 ** -(age / half-life)
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_SIZE = 50  # ideas kept ranked; deleted or hidden ideas are skipped when read
+
+_lock = threading.RLock()
+_EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def shard_of(user_id):
+    # Stable across processes (unlike hash()), so all of one user's votes share a shard
+    return SHARDS[zlib.crc32(str(user_id).encode()) % len(SHARDS)]
+
+
+def vote_id(idea_id, user_id):
+    return f'{idea_id}:{user_id}'
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _log_weight(voted_at):
+    # Forward decay: a vote's weight grows with its time instead of every older vote
+    # shrinking as time passes, so rankings only change when votes arrive. Kept as a
+    # logarithm so it never overflows
+    try:
+        moment = datetime.datetime.fromisoformat(schema.to_text(voted_at))
+    except ValueError:
+        moment = _EPOCH
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return _RATE * (moment - _EPOCH).total_seconds()
+
+
+def _log_add(a, b):
+    if a is None:
+        return b
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+class Shard(table_cache.DerivedView):
+    # Vote counts per idea over one vote table, feeding its board's ranking
+
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+        self.votes = {}  # vote_id -> (idea_id, log weight)
+        self.counts = Counter()
+
+    def rebuild(self, frame):
+        self.votes = {}
+        self.counts = Counter()
+        for key, idea_id, voted_at in zip(frame['vote_id'].astype(str), frame['idea_id'].tolist(),
+                                          frame['voted_at'].tolist()):
+            self._add(key, schema.to_text(idea_id), voted_at)
+        self.board.stale = True
+
+    def _add(self, key, idea_id, voted_at):
+        if key in self.votes:
+            return None
+        self.votes[key] = (idea_id, _log_weight(voted_at))
+        self.counts[idea_id] += 1
+        return self.votes[key]
+
+    def apply(self, ops):
+        for op in ops:
+            if op['op'] == 'insert':
+                added = self._add(op['key'], schema.to_text(op['row'].get('idea_id')), op['row'].get('voted_at'))
+                if added is not None and not self.board.stale:
+                    self.board._bump(*added)
+            elif op['op'] == 'delete' and op['key'] in self.votes:
+                # Only an admin clean-up does this; rank again from scratch
+                idea_id, _ = self.votes.pop(op['key'])
+                self.counts[idea_id] -= 1
+                self.board.stale = True
+
+
+class Board:
+    # Vote totals and a forward-decayed trending ranking over all shards. Votes are
+    # only ever added, so an idea's heat only grows and it can only enter the top
+    # through a vote of its own; the ranking is kept up to date one vote at a time
+
+    def __init__(self):
+        self.shards = {name: table_cache.derive(name, Shard(self), _lock) for name in SHARDS}
+        self.heat = {}  # idea_id -> log of its summed vote weights
+        self.top = []  # up to TRENDING_SIZE idea ids, hottest first
+        self.stale = True
+
+    def _rank(self):
+        self.heat = {}
+        for shard in self.shards.values():
+            for idea_id, weight in shard.votes.values():
+                self.heat[idea_id] = _log_add(self.heat.get(idea_id), weight)
+        self.top = heapq.nlargest(TRENDING_SIZE, self.heat, key=self.heat.get)
+        self.stale = False
+
+    def _bump(self, idea_id, weight):
+        self.heat[idea_id] = _log_add(self.heat.get(idea_id), weight)
+        if idea_id not in self.top:
+            if len(self.top) < TRENDING_SIZE:
+                self.top.append(idea_id)
+            elif self.heat[idea_id] > self.heat[self.top[-1]]:
+                self.top[-1] = idea_id
+            else:
+                return
+        self.top.sort(key=self.heat.get, reverse=True)
+
+    def count(self, idea_id):
+        return sum(shard.counts.get(idea_id, 0) for shard in self.shards.values())
+
+    def counts(self):
+        total = Counter()
+        for shard in self.shards.values():
+            total.update(shard.counts)
+        return total
+
+    def has_voted(self, idea_id, user_id):
+        return vote_id(idea_id, user_id) in self.shards[shard_of(user_id)].votes
+
+    def trending(self, n=10, now=None, keep=None):
+        """Hottest ideas as (idea_id, votes, decayed votes as of now), skipping ids keep rejects."""
+        if self.stale:
+            self._rank()
+        decay = _RATE * ((now or _now()) - _EPOCH).total_seconds()
+        found = []
+        for idea_id in self.top:
+            if keep is None or keep(idea_id):
+                found.append((idea_id, self.count(idea_id), round(math.exp(self.heat[idea_id] - decay), 2)))
+                if len(found) == n:
+                    break
+        return found
+
+
+_board = Board()
+
+
+def board():
+    """Vote counts and trending ideas as of the current vote tables."""
+    # Read the tables first: commits take the storage lock before this module's
+    frames = {name: table_cache.get_table(name) for name in SHARDS}
+    with _lock:
+        for name, frame in frames.items():
+            _board.shards[name].sync(frame)
+        return _board
+
+
+def cast(idea_id, user_id):
+    """Record user_id's vote for idea_id. Returns False if they had already voted for it.
+
+    Only the voter's shard is locked, both between processes and between threads
+    of one process (storage locks each table on its own), so votes from users on
+    different shards never wait on each other and the ideas table is never written.
+    """
+    name = shard_of(user_id)
+    key = vote_id(idea_id, user_id)
+    with storage._file_lock(name):
+        # Every vote by this user goes through this lock, so the check cannot race
+        with _lock:
+            shard = _board.shards[name].sync(table_cache.get_table(name))
+            if key in shard.votes:
+                return False
+        row = {'vote_id': key, 'idea_id': str(idea_id), 'user_id': str(user_id),
+               'voted_at': _now().isoformat(timespec='seconds')}
+        storage.commit(name, [storage.insert_op(name, row)])
+    return True
+
+
+def create_tables():
+    # Empty vote tables for a new data directory
+    for name in SHARDS:
+        if not storage.table_exists(name):
+            with storage._file_lock(name):
+                storage.checkpoint(name, pd.DataFrame(columns=COLUMNS))